@@ -1,94 +1,109 @@
-from math import sin, cos, radians
+import copy
 
 from OpenGL.GL import *
 
-from terrain import terrain_height, move_world
+import glstate
+import render_queue
+from fleet import (
+    AIRPLANE_SCALE,
+    CLIMB_FACTOR,
+    MAX_ALTITUDE,
+    MAX_SPEED,
+    MIN_ALT_ABOVE_GROUND,
+    MIN_SPEED,
+    Fleet,
+)
+from meshes import cube_geometry, get_mesh, merge_geometry
+from transforms import gl_matrix, rotate_x, rotate_y, rotate_z, scale, translate
 
+_WING_COLOR = (0.90, 0.92, 0.95)
+_EDGE_COLOR = (0.75, 0.77, 0.80)
+_ENGINE_COLOR = (0.45, 0.47, 0.50)
+_INTAKE_COLOR = (0.20, 0.22, 0.25)
 
-def _draw_unit_cube():
-    glBegin(GL_QUADS)
+# Детали самолёта: (cx, cy, cz, sx, sy, sz, цвет) — параллелепипеды.
+AIRPLANE_PARTS = (
+    # фюзеляж
+    (0.0, 0.0, 0.0, 1.2, 1.2, 7.0, (0.85, 0.86, 0.90)),
+    # нос
+    (0.0, 0.0, 4.5, 0.9, 0.9, 1.8, (0.80, 0.82, 0.88)),
+    # кабина
+    (0.0, 0.35, 4.4, 0.7, 0.4, 0.8, (0.15, 0.25, 0.45)),
+    # хвост
+    (0.0, 0.0, -4.5, 0.9, 0.9, 2.5, (0.83, 0.84, 0.88)),
 
-    # Front
-    glNormal3f(0, 0, 1)
-    glVertex3f(-0.5, -0.5, 0.5)
-    glVertex3f(0.5, -0.5, 0.5)
-    glVertex3f(0.5, 0.5, 0.5)
-    glVertex3f(-0.5, 0.5, 0.5)
+    (-3.8, -0.1, 0.0, 5.5, 0.2, 2.0, _WING_COLOR),
+    (3.8, -0.1, 0.0, 5.5, 0.2, 2.0, _WING_COLOR),
 
-    # Back
-    glNormal3f(0, 0, -1)
-    glVertex3f(0.5, -0.5, -0.5)
-    glVertex3f(-0.5, -0.5, -0.5)
-    glVertex3f(-0.5, 0.5, -0.5)
-    glVertex3f(0.5, 0.5, -0.5)
+    (-6.4, -0.1, 0.0, 0.5, 0.22, 2.1, _EDGE_COLOR),
+    (6.4, -0.1, 0.0, 0.5, 0.22, 2.1, _EDGE_COLOR),
 
-    # Left
-    glNormal3f(-1, 0, 0)
-    glVertex3f(-0.5, -0.5, -0.5)
-    glVertex3f(-0.5, -0.5, 0.5)
-    glVertex3f(-0.5, 0.5, 0.5)
-    glVertex3f(-0.5, 0.5, -0.5)
+    (0.0, 0.3, -5.2, 3.0, 0.18, 1.4, _WING_COLOR),
+    (0.0, 1.6, -5.0, 0.6, 2.2, 1.2, (0.82, 0.83, 0.88)),
 
-    # Right
-    glNormal3f(1, 0, 0)
-    glVertex3f(0.5, -0.5, 0.5)
-    glVertex3f(0.5, -0.5, -0.5)
-    glVertex3f(0.5, 0.5, -0.5)
-    glVertex3f(0.5, 0.5, 0.5)
+    (-2.2, -0.9, 0.4, 0.9, 0.9, 1.8, _ENGINE_COLOR),
+    (2.2, -0.9, 0.4, 0.9, 0.9, 1.8, _ENGINE_COLOR),
+    (-2.2, -0.9, 1.4, 0.8, 0.8, 0.3, _INTAKE_COLOR),
+    (2.2, -0.9, 1.4, 0.8, 0.8, 0.3, _INTAKE_COLOR),
+)
 
-    # Top
-    glNormal3f(0, 1, 0)
-    glVertex3f(-0.5, 0.5, 0.5)
-    glVertex3f(0.5, 0.5, 0.5)
-    glVertex3f(0.5, 0.5, -0.5)
-    glVertex3f(-0.5, 0.5, -0.5)
 
-    # Bottom
-    glNormal3f(0, -1, 0)
-    glVertex3f(-0.5, -0.5, -0.5)
-    glVertex3f(0.5, -0.5, -0.5)
-    glVertex3f(0.5, -0.5, 0.5)
-    glVertex3f(-0.5, -0.5, 0.5)
+def _airplane_geometry():
+    """Вся модель самолёта одним куском геометрии с цветами по вершинам."""
+    return merge_geometry(*(
+        cube_geometry(color, center=(cx, cy, cz), size=(sx, sy, sz))
+        for (cx, cy, cz, sx, sy, sz, color) in AIRPLANE_PARTS
+    ))
 
-    glEnd()
 
+def _slot_field(name: str) -> property:
+    """Поле самолёта — ячейка массива флота (Fleet) в его слоте."""
 
-def _draw_cuboid_geom(cx, cy, cz, sx, sy, sz):
-    """Геометрия параллелепипеда БЕЗ установки цвета."""
-    glPushMatrix()
-    glTranslatef(cx, cy, cz)
-    glScalef(sx, sy, sz)
-    _draw_unit_cube()
-    glPopMatrix()
+    def get(self) -> float:
+        return float(getattr(self.fleet, name)[self.slot])
 
+    def set(self, value: float) -> None:
+        getattr(self.fleet, name)[self.slot] = value
 
-def _draw_cuboid_colored(cx, cy, cz, sx, sy, sz, color):
-    """Параллелепипед с цветом."""
-    glColor3f(*color)
-    _draw_cuboid_geom(cx, cy, cz, sx, sy, sz)
+    return property(get, set)
 
 
 class Airplane:
-    """Самолёт. Мир двигается под ним."""
-
-    def __init__(self):
-        self.x = 0.0
-        self.z = 0.0
-        self.y = 40.0
-
-        self.yaw = 0.0
-        self.pitch = 0.0
-        self.roll = 0.0
-
-        self.speed = 60.0
-        self.min_speed = 10.0
-        self.max_speed = 200.0
-
-        # минимальная высота над землёй и максимальная высота полёта
-        self.min_alt_above_ground = 20.0
-        self.max_altitude = 120.0   # самолёт выше не поднимется (солнце/луна всё равно выше)
-
-        self.climb_factor = 2.0
+    """
+    Самолёт — вид на один слот флота (fleet.Fleet). Мир двигается под ним.
+    Без флота создаётся свой, из одного самолёта игрока.
+    """
+
+    x = _slot_field("x")
+    y = _slot_field("y")
+    z = _slot_field("z")
+    yaw = _slot_field("yaw")
+    pitch = _slot_field("pitch")
+    roll = _slot_field("roll")
+    speed = _slot_field("speed")
+
+    min_speed = MIN_SPEED
+    max_speed = MAX_SPEED
+
+    # минимальная высота над землёй и максимальная высота полёта
+    min_alt_above_ground = MIN_ALT_ABOVE_GROUND
+    max_altitude = MAX_ALTITUDE
+
+    climb_factor = CLIMB_FACTOR
+
+    def __init__(self, fleet: Fleet | None = None, slot: int | None = None):
+        if fleet is None:
+            fleet = Fleet()
+            slot = int(fleet.add(y=40.0, speed=60.0, drives_world=True)[0])
+        self.fleet = fleet
+        self.slot = slot
+
+        # модель «запекается» один раз и общая для всех самолётов
+        self.mesh = get_mesh("airplane", _airplane_geometry)
+
+    def __copy__(self):
+        """Копия — тот же слот в копии флота (симуляция шагает свою)."""
+        return Airplane(copy.copy(self.fleet), self.slot)
 
     def get_position(self):
         return self.x, self.y, self.z
@@ -97,111 +112,45 @@ class Airplane:
         self.yaw = (self.yaw + delta_deg) % 360.0
 
     def change_pitch(self, delta_deg: float):
-        self.pitch += delta_deg
-        if self.pitch > 45.0:
-            self.pitch = 45.0
-        if self.pitch < -45.0:
-            self.pitch = -45.0
+        self.pitch = min(max(self.pitch + delta_deg, -45.0), 45.0)
 
     def change_roll(self, delta_deg: float):
-        self.roll += delta_deg
-        if self.roll > 60.0:
-            self.roll = 60.0
-        if self.roll < -60.0:
-            self.roll = -60.0
+        self.roll = min(max(self.roll + delta_deg, -60.0), 60.0)
 
     def change_speed(self, delta: float):
-        self.speed += delta
-        if self.speed < self.min_speed:
-            self.speed = self.min_speed
-        if self.speed > self.max_speed:
-            self.speed = self.max_speed
+        self.speed = min(max(self.speed + delta, self.min_speed), self.max_speed)
 
     def reset_orientation(self):
         self.pitch = 0.0
         self.roll = 0.0
 
     def update(self, dt: float):
-        if dt <= 0.0:
-            return
-
-        rad_yaw = radians(self.yaw)
-        rad_pitch = radians(self.pitch)
-
-        forward_x = sin(rad_yaw) * cos(rad_pitch)
-        forward_y = sin(rad_pitch)
-        forward_z = cos(rad_yaw) * cos(rad_pitch)
-
-        dx = forward_x * self.speed * dt
-        dz = forward_z * self.speed * dt
-
-        # нос вверх (pitch > 0) → самолёт набирает высоту
-        dy = -forward_y * self.speed * dt * self.climb_factor
-
-        # мир едет под самолётом
-        move_world(dx, dz)
-
-        new_y = self.y + dy
-        ground_y = terrain_height(self.x, self.z)
-        min_y = ground_y + self.min_alt_above_ground
-
-        if new_y < min_y:
-            new_y = min_y
-        if new_y > self.max_altitude:
-            new_y = self.max_altitude
-
-        self.y = new_y
-
-    # --------- геометрия самолёта ---------
-
-    def _draw_model_geom(self, colored: bool):
-        """
-        Рисуем модель самолёта.
-        colored = True  → используем цвета деталей;
-        colored = False → цвет задаётся снаружи.
-        """
-        if colored:
-            dc = _draw_cuboid_colored
-        else:
-            def dc(x, y, z, sx, sy, sz, color):
-                _draw_cuboid_geom(x, y, z, sx, sy, sz)
-
-        # фюзеляж
-        dc(0.0, 0.0, 0.0, 1.2, 1.2, 7.0, (0.85, 0.86, 0.90))
-        # нос
-        dc(0.0, 0.0, 4.5, 0.9, 0.9, 1.8, (0.80, 0.82, 0.88))
-        # кабина
-        dc(0.0, 0.35, 4.4, 0.7, 0.4, 0.8, (0.15, 0.25, 0.45))
-        # хвост
-        dc(0.0, 0.0, -4.5, 0.9, 0.9, 2.5, (0.83, 0.84, 0.88))
-
-        wing_color = (0.90, 0.92, 0.95)
-        dc(-3.8, -0.1, 0.0, 5.5, 0.2, 2.0, wing_color)
-        dc(3.8, -0.1, 0.0, 5.5, 0.2, 2.0, wing_color)
-
-        edge_color = (0.75, 0.77, 0.80)
-        dc(-6.4, -0.1, 0.0, 0.5, 0.22, 2.1, edge_color)
-        dc(6.4, -0.1, 0.0, 0.5, 0.22, 2.1, edge_color)
-
-        dc(0.0, 0.3, -5.2, 3.0, 0.18, 1.4, wing_color)
-        dc(0.0, 1.6, -5.0, 0.6, 2.2, 1.2, (0.82, 0.83, 0.88))
-
-        engine_color = (0.45, 0.47, 0.50)
-        dc(-2.2, -0.9, 0.4, 0.9, 0.9, 1.8, engine_color)
-        dc(2.2, -0.9, 0.4, 0.9, 0.9, 1.8, engine_color)
-        intake_color = (0.20, 0.22, 0.25)
-        dc(-2.2, -0.9, 1.4, 0.8, 0.8, 0.3, intake_color)
-        dc(2.2, -0.9, 1.4, 0.8, 0.8, 0.3, intake_color)
-
-    def draw(self):
+        """Шаг только этого самолёта; весь флот сразу — self.fleet.update(dt)."""
+        self.fleet.update(dt, self.slot)
+
+    def model_matrix(self):
+        """Матрица модели: позиция, yaw/pitch/roll и масштаб x2."""
+        s = AIRPLANE_SCALE
+        return (translate(self.x, self.y, self.z)
+                @ rotate_y(self.yaw)
+                @ rotate_x(self.pitch)
+                @ rotate_z(self.roll)
+                @ scale(s, s, s))
+
+    def draw_model(self):
+        """Меш в позе самолёта; состояние — материал "lit" (lighting.py)."""
         glPushMatrix()
+        glMultMatrixf(gl_matrix(self.model_matrix()))
+        self.mesh.draw()
+        glPopMatrix()
 
-        glTranslatef(self.x, self.y, self.z)
-        glRotatef(self.yaw, 0.0, 1.0, 0.0)
-        glRotatef(self.pitch, 1.0, 0.0, 0.0)
-        glRotatef(self.roll, 0.0, 0.0, 1.0)
-        glScalef(2.0, 2.0, 2.0)
-
-        self._draw_model_geom(colored=True)
+    def submit(self, eye=None):
+        """Самолёт — элементом render_queue (eye — камера, для порядка)."""
+        render_queue.submit("lit", render_queue.distance(eye, self.get_position()),
+                            self.draw_model)
 
-        glPopMatrix()
+    def draw(self):
+        glstate.enable(GL_LIGHTING)
+        glstate.disable(GL_TEXTURE_2D)
+        glstate.disable(GL_BLEND)
+        self.draw_model()
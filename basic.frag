@@ -2,37 +2,51 @@
 
 in vec3 FragPos;
 in vec3 Normal;
+in vec3 Color;
 
 out vec4 FragColor;
 
-// положение камеры
-uniform vec3 viewPos;
-
-// параметры источника света
-uniform vec3 lightPos;
-uniform vec3 lightColor;
-
-// параметры материала
+layout(std140) uniform Frame
+{
+    mat4 view;
+    mat4 projection;
+    // положение камеры
+    vec4 viewPos;
+    // параметры источника света
+    vec4 lightPos;
+    vec4 lightColor;
+    vec4 ambientColor;
+};
+
+// параметры материала (множители к цвету вершины)
 uniform vec3 matAmbient;
 uniform vec3 matDiffuse;
 uniform vec3 matSpecular;
 uniform float shininess;
+uniform float alpha;
+// 1 — без освещения (облака, солнце)
+uniform int unlit;
 
 void main()
 {
+    if (unlit != 0) {
+        FragColor = vec4(Color * matDiffuse, alpha);
+        return;
+    }
+
     vec3 norm = normalize(Normal);
-    vec3 lightDir = normalize(lightPos - FragPos);
+    vec3 lightDir = normalize(lightPos.xyz - FragPos);
 
     float diff = max(dot(norm, lightDir), 0.0);
 
-    vec3 viewDir = normalize(viewPos - FragPos);
+    vec3 viewDir = normalize(viewPos.xyz - FragPos);
     vec3 reflectDir = reflect(-lightDir, norm);
 
     float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
 
-    vec3 ambient = matAmbient * lightColor;
-    vec3 diffuse = matDiffuse * diff * lightColor;
-    vec3 specular = matSpecular * spec * lightColor;
+    vec3 ambient = Color * matAmbient * ambientColor.rgb;
+    vec3 diffuse = Color * matDiffuse * diff * lightColor.rgb;
+    vec3 specular = matSpecular * spec * lightColor.rgb;
 
-    FragColor = vec4(ambient + diffuse + specular, 1.0);
+    FragColor = vec4(ambient + diffuse + specular, alpha);
 }
@@ -2,18 +2,51 @@
 
 layout(location = 0) in vec3 aPos;
 layout(location = 1) in vec3 aNormal;
+layout(location = 2) in vec3 aColor;
+
+// на экземпляр: (x, y, z, scale), цвет-множитель и поворот (yaw, pitch,
+// roll в радианах — только у трафика, fleet.py).
+// Для обычных (не инстансных) мешей атрибуты выключены и берутся
+// постоянные значения (0, 0, 0, 1), (1, 1, 1) и (0, 0, 0) — см. renderer.py.
+layout(location = 3) in vec4 aInstance;
+layout(location = 4) in vec3 aInstanceColor;
+layout(location = 5) in vec3 aInstanceRotation;
 
 out vec3 FragPos;
 out vec3 Normal;
+out vec3 Color;
+
+// общие для всего кадра данные — один uniform buffer на кадр
+layout(std140) uniform Frame
+{
+    mat4 view;
+    mat4 projection;
+    vec4 viewPos;
+    vec4 lightPos;
+    vec4 lightColor;
+    vec4 ambientColor;
+};
 
 uniform mat4 model;
-uniform mat4 view;
-uniform mat4 projection;
+
+// тот же порядок, что в Airplane.model_matrix(): rotate_y * rotate_x * rotate_z
+mat3 instanceRotation(vec3 angles)
+{
+    vec3 c = cos(angles);
+    vec3 s = sin(angles);
+    // mat3 собирается по столбцам
+    mat3 ry = mat3(c.x, 0.0, -s.x,  0.0, 1.0, 0.0,  s.x, 0.0, c.x);
+    mat3 rx = mat3(1.0, 0.0, 0.0,  0.0, c.y, s.y,  0.0, -s.y, c.y);
+    mat3 rz = mat3(c.z, s.z, 0.0,  -s.z, c.z, 0.0,  0.0, 0.0, 1.0);
+    return ry * rx * rz;
+}
 
 void main()
 {
-    FragPos = vec3(model * vec4(aPos, 1.0));
-    Normal = mat3(transpose(inverse(model))) * aNormal;
+    mat3 rotation = instanceRotation(aInstanceRotation);
+    FragPos = vec3(model * vec4(rotation * (aPos * aInstance.w) + aInstance.xyz, 1.0));
+    Normal = mat3(transpose(inverse(model))) * (rotation * aNormal);
+    Color = aColor * aInstanceColor;
 
     gl_Position = projection * view * vec4(FragPos, 1.0);
 }
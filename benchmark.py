@@ -0,0 +1,336 @@
+# benchmark.py
+"""
+Замер времени кадра без окна и без клавиатуры.
+
+- Контекст OpenGL создаётся offscreen (EGL или OSMesa, см. offscreen.py),
+  поэтому работает и на CI-машине без GPU (Mesa llvmpipe).
+- Самолёт летит по заранее заданному маршруту (FLIGHT_PATHS) с
+  фиксированным dt: два запуска с одними параметрами летят одинаково.
+- Кадр рисуется тем же main.display(), что и в окне, только вместо
+  glutSwapBuffers — glFinish (ждём, пока GPU/llvmpipe дорисует).
+- Результат — JSON: p50/p95/p99 времени кадра и стоимость подсистем.
+- Вместо маршрута можно проиграть запись полёта (--replay, recording.py):
+  мир, seed'ы и размер сцены берутся из её заголовка.
+- Пакетный рендер: --capture каталог пишет кадры в PNG, --capture-cmd —
+  во внешний кодировщик (capture.py); в отчёт попадает, сколько кадров
+  записано и выброшено.
+
+Пример:
+    python benchmark.py --frames 600 --trees 2000 --clouds 200 --output out.json
+"""
+
+import argparse
+import json
+import math
+import time
+
+import offscreen
+
+# шаг симуляции: как будто игра идёт ровно 60 кадров в секунду
+BENCH_DT = 1.0 / 60.0
+
+
+def _path_straight(t: float):
+    """Прямо и ровно."""
+    return 0.0, 0.0, 0.0, 60.0
+
+
+def _path_orbit(t: float):
+    """Плавный вираж по кругу: видно, как меняется пейзаж со всех сторон."""
+    return (20.0 * t) % 360.0, 0.0, -25.0, 80.0
+
+
+def _path_slalom(t: float):
+    """Змейка с набором и потерей высоты на большой скорости."""
+    yaw = 40.0 * math.sin(t * 0.8)
+    pitch = 15.0 * math.sin(t * 0.5)
+    roll = -30.0 * math.cos(t * 0.8)
+    return yaw % 360.0, pitch, roll, 150.0
+
+
+# маршрут: t (секунды) -> (yaw, pitch, roll, speed)
+FLIGHT_PATHS = {
+    "straight": _path_straight,
+    "orbit": _path_orbit,
+    "slalom": _path_slalom,
+}
+
+
+def _percentiles(samples_s: list[float]) -> dict[str, float]:
+    """Сводка по выборке в миллисекундах."""
+    import numpy as np
+
+    ms = np.asarray(samples_s, dtype=np.float64) * 1000.0
+    if len(ms) == 0:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "mean": round(float(ms.mean()), 4),
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "p99": round(float(p99), 4),
+        "max": round(float(ms.max()), 4),
+    }
+
+
+def run_benchmark(args) -> dict:
+    # время до первого кадра считаем от входа сюда (создание контекста — тоже старт)
+    started_at = time.perf_counter()
+
+    # платформу PyOpenGL выбираем до первого импорта OpenGL
+    offscreen.select_platform(args.platform)
+    context = offscreen.create_context(args.width, args.height, args.platform, core=args.core)
+
+    from OpenGL.GL import GL_RENDERER, GL_VERSION, glFinish, glGetString
+
+    import capture
+    import dynres
+    import glstate
+    import governor
+    import main
+    import profiler
+    import recording
+    import render_queue
+    import scenery
+    import shader
+    import shadows
+    import simulation
+    from clouds import update_clouds
+    from scenery import update_scenery
+
+    main.use_core_profile = args.core
+    main.use_chunk_streaming = args.chunks
+    main.use_shadows = not args.no_shadows
+    scenery.USE_LOD = not args.no_lod
+    dynres.ENABLED = args.dynres
+    dynres.TARGET_FPS = args.target_fps
+    governor.ENABLED = args.governor
+    governor.TARGET_FPS = args.target_fps
+    main.shadow_map_size = args.shadow_size
+    main.present_frame = glFinish
+    main.startup_started_at = started_at
+
+    # с --governor пулы с запасом (кроме --chunks); у записи — как при записи
+    pooled = args.governor and not args.chunks
+    replay = None
+    if args.replay:
+        replay = recording.load_recording(args.replay)
+        h = replay.header
+        args.trees, args.houses, args.clouds = h.tree_count, h.house_count, h.cloud_count
+        args.chunks = main.use_chunk_streaming = h.chunks
+        args.path = "replay"
+        pooled = h.pooled
+    # при воспроизведении плотность — из записи, регулятор не рулит
+    governor.start(pooled, steer=replay is None)
+
+    if replay is not None:
+        def start_replay():
+            simulation.init_simulation(main.airplane)
+            recording.start_replay(replay)
+
+        args.fleet = h.fleet_count
+        main.init_world(h.tree_count, h.house_count, h.cloud_count, h.scenery_seed, h.cloud_seed,
+                        h.fleet_count, h.fleet_seed, lazy=True, on_world_ready=start_replay)
+    else:
+        # базовая плотность — args.trees и т. д.
+        main.init_world(governor.pool_size(args.trees, pooled),
+                        governor.pool_size(args.houses, pooled),
+                        governor.pool_size(args.clouds, pooled), fleet_count=args.fleet, lazy=True)
+    main.reshape(args.width, args.height)
+
+    # как в окне: первый кадр — до генерации мира, остальное — следом
+    main.display()
+    main.finish_startup()
+
+    if args.capture or args.capture_cmd:
+        capture.start_capture(args.capture, args.capture_cmd)
+
+    airplane = main.airplane
+    path = FLIGHT_PATHS.get(args.path)
+    ticks_per_frame = max(1, round(simulation.SIM_RATE * BENCH_DT))
+
+    if replay is None:
+        costs: dict[str, list[float]] = {
+            "frame": [], "airplane": [], "scenery": [], "clouds": [], "render": [],
+        }
+    else:
+        costs = {"frame": [], "simulation": [], "render": []}
+    clock = time.perf_counter
+    # масштаб динамического разрешения по измеряемым кадрам
+    scales: list[float] = []
+    # плотность мира (--governor) по измеряемым кадрам
+    densities: list[float] = []
+    # очередь отрисовки: draw call'ы и переключения материала за кадр
+    queue_counts: dict[str, list[int]] = {"draw_calls": [], "state_changes": [],
+                                          "unsorted_changes": []}
+
+    for i in range(args.warmup + args.frames):
+        if replay is None:
+            t = i * BENCH_DT
+            yaw, pitch, roll, speed = path(t)
+            airplane.yaw, airplane.pitch, airplane.roll, airplane.speed = yaw, pitch, roll, speed
+
+            t0 = clock()
+            # игрок и трафик — одним векторным шагом
+            airplane.fleet.update(BENCH_DT)
+            t1 = clock()
+            update_scenery(airplane.yaw)
+            t2 = clock()
+            update_clouds(airplane.yaw)
+            t3 = clock()
+            main.display()
+            t4 = clock()
+            frame_costs = {"airplane": t1 - t0, "scenery": t2 - t1, "clouds": t3 - t2}
+        else:
+            if recording.replay_done():
+                break
+            t0 = clock()
+            view_events = recording.replay_ticks(ticks_per_frame)
+            t3 = clock()
+            for action, value in view_events:
+                main.apply_view_event(action, value)
+            main.display()
+            t4 = clock()
+            frame_costs = {"simulation": t3 - t0}
+
+        if i < args.warmup:
+            # стадии display() мерим только после прогрева
+            if args.spans and i == args.warmup - 1:
+                profiler.set_enabled(True)
+            continue
+        scales.append(dynres.STATS["scale"])
+        densities.append(governor.STATS["live_density"])
+        for name, samples in queue_counts.items():
+            samples.append(render_queue.STATS[name])
+        for name, value in frame_costs.items():
+            costs[name].append(value)
+        costs["render"].append(t4 - t3)
+        costs["frame"].append(t4 - t0)
+
+    result = {
+        "config": {
+            "path": args.path,
+            "frames": args.frames,
+            "warmup": args.warmup,
+            "width": args.width,
+            "height": args.height,
+            "trees": args.trees,
+            "houses": args.houses,
+            "clouds": args.clouds,
+            "fleet": args.fleet,
+            "core": args.core,
+            "chunks": args.chunks,
+            "shadows": main.use_shadows and not args.core,
+            "shadow_size": args.shadow_size,
+            "lod": not args.no_lod,
+            "dynres": args.dynres,
+            "governor": args.governor,
+            "target_fps": args.target_fps,
+            "platform": args.platform,
+        },
+        "measured_frames": len(costs["frame"]),
+        "gl_renderer": glGetString(GL_RENDERER).decode(errors="replace"),
+        "gl_version": glGetString(GL_VERSION).decode(errors="replace"),
+        "frame_ms": _percentiles(costs["frame"]),
+        "subsystems_ms": {
+            name: _percentiles(samples)
+            for name, samples in costs.items() if name != "frame"
+        },
+    }
+    # сколько вызовов состояния GL ушло в драйвер и сколько отсёк glstate
+    result["gl_state"] = dict(glstate.STATS)
+    # сколько раз за прогон перерисованы карты теней
+    result["shadow_renders"] = dict(shadows.STATS)
+    # холодный старт: первый кадр и готовый мир (мс), попадания в кэш шейдеров
+    result["startup_ms"] = {
+        "time_to_first_frame": round(main.time_to_first_frame_ms, 2),
+        "time_to_ready": round(main.time_to_ready_ms, 2),
+    }
+    result["shader_cache"] = dict(shader.CACHE_STATS)
+    # сколько объектов на каком уровне детализации в последнем кадре
+    result["lod_last_frame"] = dict(scenery.LOD_STATS)
+    # в среднем за кадр: draw call'ы, переключения материала после
+    # сортировки очереди и сколько их было бы в порядке сдачи
+    result["render_queue"] = {
+        name: round(sum(samples) / max(1, len(samples)), 2)
+        for name, samples in queue_counts.items()
+    }
+
+    if args.dynres:
+        # как менялось разрешение сцены, чтобы уложиться в бюджет кадра
+        result["dynres"] = {
+            "final_scale": dynres.STATS["scale"],
+            "mean_scale": round(sum(scales) / max(1, len(scales)), 4),
+            "min_scale": min(scales, default=dynres.STATS["scale"]),
+            "changes": dynres.STATS["changes"],
+        }
+
+    if args.governor:
+        # к какой плотности мира пришёл регулятор и сколько объектов живо
+        result["governor"] = dict(governor.STATS)
+        result["governor"]["mean_live_density"] = round(
+            sum(densities) / max(1, len(densities)), 4)
+
+    if args.capture or args.capture_cmd:
+        result["capture"] = capture.stop_capture()
+
+    if replay is not None:
+        result["replay_matches"] = recording.replay_done() and recording.replay_matches()
+
+    if args.spans:
+        # разбивка display() по стадиям (profiler.span в main.py)
+        result["stages_ms"] = {
+            name: round(value, 4)
+            for name, value in sorted(profiler.stage_times(args.frames).items())
+        }
+        if args.trace:
+            profiler.dump_trace(args.trace)
+        profiler.set_enabled(False)
+
+    del context
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offscreen-замер времени кадра")
+    parser.add_argument("--frames", type=int, default=300, help="сколько кадров мерить")
+    parser.add_argument("--warmup", type=int, default=30, help="кадров на прогрев (не считаются)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--trees", type=int, default=260)
+    parser.add_argument("--houses", type=int, default=12)
+    parser.add_argument("--clouds", type=int, default=40)
+    parser.add_argument("--fleet", type=int, default=0, help="самолётов трафика вокруг игрока")
+    parser.add_argument("--path", choices=sorted(FLIGHT_PATHS), default="orbit")
+    parser.add_argument("--replay", help="проиграть запись полёта вместо маршрута")
+    parser.add_argument("--core", action="store_true", help="core profile + renderer.py")
+    parser.add_argument("--chunks", action="store_true", help="мир из клеток (chunks.py)")
+    parser.add_argument("--no-shadows", action="store_true", help="без карт теней")
+    parser.add_argument("--shadow-size", type=int, default=2048,
+                        help="разрешение статической карты теней")
+    parser.add_argument("--no-lod", action="store_true", help="все объекты полным мешем")
+    parser.add_argument("--dynres", action="store_true",
+                        help="динамическое разрешение сцены (dynres.py)")
+    parser.add_argument("--target-fps", type=float, default=60.0,
+                        help="бюджет кадра для --dynres / --governor")
+    parser.add_argument("--governor", action="store_true",
+                        help="плотность деревьев и облаков по времени кадра (governor.py)")
+    parser.add_argument("--platform", choices=("egl", "osmesa"), default="egl")
+    parser.add_argument("--spans", action="store_true",
+                        help="ещё и средние времена стадий display() из profiler.py")
+    parser.add_argument("--trace", help="сохранить Chrome trace последних кадров (с --spans)")
+    parser.add_argument("--capture", help="писать кадры в PNG в этот каталог")
+    parser.add_argument("--capture-cmd",
+                        help="писать сырые RGB-кадры в stdin команды ({width}, {height})")
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию — stdout)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = json.dumps(run_benchmark(args), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
@@ -2,7 +2,9 @@
 from math import sin, cos, radians
 
 from OpenGL.GL import *
-from OpenGL.GLU import *
+
+from frustum import frustum_planes
+from transforms import gl_matrix, look_at, perspective
 
 
 class Camera:
@@ -10,35 +12,64 @@ class Camera:
                  target=(0.0, 170.0, 0.0),
                  distance=160.0,
                  yaw=45.0,
-                 pitch=45.0):
+                 pitch=45.0,
+                 fov_y=60.0,
+                 near=0.1,
+                 far=5000.0):
         """
         Орбитальная камера вокруг точки target.
         yaw   — поворот по горизонту (в градусах)
         pitch — угол по вертикали (в градусах)
+        fov_y / near / far — параметры перспективы (aspect задаёт reshape)
         """
         self.target_x, self.target_y, self.target_z = target
         self.distance = distance
         self.yaw = yaw
         self.pitch = pitch
 
-    def apply(self):
-        """
-        Вычисляет позицию камеры по yaw/pitch/distance и вызывает gluLookAt.
-        Вызывать в начале кадра перед рендером сцены.
-        """
+        self.fov_y = fov_y
+        self.near = near
+        self.far = far
+        self.aspect = 16.0 / 9.0
+
+    def eye_position(self) -> tuple[float, float, float]:
+        """Позиция камеры по yaw/pitch/distance."""
         rh = radians(self.yaw)
         rv = radians(self.pitch)
 
         cam_x = self.target_x + self.distance * cos(rv) * sin(rh)
         cam_y = self.target_y + self.distance * sin(rv)
         cam_z = self.target_z + self.distance * cos(rv) * cos(rh)
+        return cam_x, cam_y, cam_z
 
-        glMatrixMode(GL_MODELVIEW)
-        glLoadIdentity()
+    def view_matrix(self):
+        """Видовая матрица (NumPy 4x4), как у gluLookAt."""
+        return look_at(self.eye_position(),
+                       (self.target_x, self.target_y, self.target_z),
+                       (0.0, 1.0, 0.0))
 
-        gluLookAt(cam_x, cam_y, cam_z,
-                  self.target_x, self.target_y, self.target_z,
-                  0.0, 1.0, 0.0)
+    def projection_matrix(self):
+        """Матрица перспективы (NumPy 4x4), как у gluPerspective."""
+        return perspective(self.fov_y, self.aspect, self.near, self.far)
+
+    def frustum(self):
+        """
+        Плоскости пирамиды видимости (6 x 4) — с теми же fov/aspect/near/far,
+        что уходят в проекцию. Координаты — локальные, как у всей сцены.
+        """
+        return frustum_planes(self.projection_matrix() @ self.view_matrix())
+
+    def set_aspect(self, aspect: float):
+        """Соотношение сторон окна (вызывается из reshape)."""
+        self.aspect = aspect
+
+    def apply(self):
+        """
+        Загружает видовую матрицу камеры в GL_MODELVIEW.
+        Вызывать в начале кадра перед рендером сцены.
+        """
+        glMatrixMode(GL_MODELVIEW)
+        glLoadMatrixf(gl_matrix(self.view_matrix()))
 
     def orbit(self, d_yaw: float, d_pitch: float):
         """Повернуть камеру вокруг цели."""
@@ -0,0 +1,306 @@
+# capture.py
+"""
+Запись полёта в кадры: последовательность PNG или сырые кадры во внешний
+кодировщик (например, ffmpeg) — без стороннего грабера экрана.
+
+- Кадр читается асинхронно: glReadPixels пишет в один из CAPTURE_RING
+  pixel buffer object'ов (GL_PIXEL_PACK_BUFFER) и сразу возвращается,
+  а отображаем (glMapBufferRange) буфер, только когда его fence сработал —
+  обычно через кадр-другой. Конвейер на чтении не останавливается; если
+  кольцо кончилось раньше, чем GPU дописал, ждём и считаем STATS["stalls"].
+- read_frame() — до показа кадра (после glutSwapBuffers задний буфер
+  не определён), collect_frames() — после: забирает готовые буферы.
+- Кодирование — в пуле потоков: PNG через zlib (zlib отпускает GIL,
+  потоки жмут параллельно) или сырые RGB-кадры в stdin кодировщика —
+  тут поток один, кадры должны идти по порядку.
+- Очередь к кодировщику ограничена (CAPTURE_QUEUE): не успевает — кадр
+  выбрасываем (STATS["dropped"]), игра не тормозит и память не растёт.
+- Читаем текущий framebuffer, поэтому работает и в окне GLUT, и в
+  offscreen-контексте (benchmark.py --capture, пакетный рендер).
+"""
+
+import ctypes
+import os
+import queue
+import shlex
+import struct
+import subprocess
+import threading
+import zlib
+from collections import deque
+
+import numpy as np
+from OpenGL.GL import *
+
+# сколько PBO в кольце: кадр забираем через CAPTURE_RING - 1 кадров
+CAPTURE_RING = 3
+
+# сколько кадров может ждать кодировщика; больше — выбрасываем
+CAPTURE_QUEUE = 8
+
+# потоков, сжимающих PNG (в кодировщик пишет всегда один)
+CAPTURE_WORKERS = 2
+
+# степень сжатия PNG: 1 — быстро, 9 — мелко
+PNG_LEVEL = 3
+
+# прочитано кадров, записано, выброшено (очередь полна), ожиданий GPU
+STATS = {"frames": 0, "written": 0, "dropped": 0, "stalls": 0}
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_active = False
+_directory: str | None = None
+_command: str | None = None
+_process: subprocess.Popen | None = None
+
+_size: tuple[int, int] | None = None
+_pbos: list[int] = []
+# прочитанные, но ещё не забранные кадры: (PBO, fence или None, номер кадра)
+_pending: deque = deque()
+_next_slot = 0
+_use_fences = False
+
+_queue: queue.Queue | None = None
+_workers: list[threading.Thread] = []
+_stats_lock = threading.Lock()
+_failed = threading.Event()
+
+
+def start_capture(directory: str | None = None, command: str | None = None) -> None:
+    """
+    Начать запись: PNG в каталог directory (frame_000000.png, ... — номер
+    кадра записи, выброшенные кадры видны по пропускам) или сырые RGB-кадры
+    в stdin команды command. В command можно подставить {width}, {height}:
+        ffmpeg -f rawvideo -pix_fmt rgb24 -s {width}x{height} -r 60 -i - flight.mp4
+    Кодировщик запускается с первым кадром, когда известен его размер.
+    """
+    global _active, _directory, _command, _queue, _use_fences
+
+    if (directory is None) == (command is None):
+        raise ValueError("нужен ровно один из directory / command")
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+
+    _directory, _command = directory, command
+    _use_fences = bool(glFenceSync)
+    STATS.update(frames=0, written=0, dropped=0, stalls=0)
+    _failed.clear()
+
+    workers = CAPTURE_WORKERS if directory is not None else 1
+    _queue = queue.Queue(maxsize=CAPTURE_QUEUE)
+    for i in range(workers):
+        thread = threading.Thread(target=_encode_loop, name=f"capture-{i}", daemon=True)
+        thread.start()
+        _workers.append(thread)
+    _active = True
+
+
+def capturing() -> bool:
+    return _active
+
+
+def read_frame(width: int, height: int) -> None:
+    """Поставить чтение текущего кадра в PBO (до показа кадра, не ждёт GPU)."""
+    global _next_slot
+
+    if not _active:
+        return
+    if _failed.is_set():
+        stop_capture()
+        return
+
+    if _size != (width, height):
+        if not _resize(width, height):
+            return
+
+    # свободного PBO нет — забираем самый старый, даже если придётся ждать
+    if len(_pending) == len(_pbos):
+        _collect_oldest(wait=True)
+
+    pbo = _pbos[_next_slot]
+    _next_slot = (_next_slot + 1) % len(_pbos)
+
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+    glReadPixels(0, 0, width, height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+    fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0) if _use_fences else None
+
+    _pending.append((pbo, fence, STATS["frames"]))
+    STATS["frames"] += 1
+
+
+def collect_frames() -> None:
+    """Забрать кадры, которые GPU уже дописал, и отдать их кодировщику."""
+    while _pending:
+        _, fence, _ = _pending[0]
+        if fence is None:
+            # без fence'ов верим кольцу: кадр двухкадровой давности готов
+            if len(_pending) < len(_pbos) - 1:
+                return
+        elif glClientWaitSync(fence, 0, 0) not in (GL_ALREADY_SIGNALED,
+                                                   GL_CONDITION_SATISFIED):
+            return
+        _collect_oldest(wait=False)
+
+
+def stop_capture(release_gl: bool = True) -> dict:
+    """
+    Дописать всё и остановить запись; возвращает STATS. release_gl=False —
+    контекст уже уничтожен: непрочитанные PBO считаем выброшенными.
+    """
+    global _active, _size, _queue, _process
+
+    if not _active:
+        return dict(STATS)
+    _active = False
+
+    if release_gl:
+        # в конце записи ничего не выбрасываем: ждём и GPU, и кодировщик
+        while _pending:
+            _collect_oldest(wait=True, block=True)
+        if _pbos:
+            glDeleteBuffers(len(_pbos), _pbos)
+    else:
+        STATS["dropped"] += len(_pending)
+    _pending.clear()
+    _pbos.clear()
+    _size = None
+
+    for _ in _workers:
+        _queue.put(None)
+    for thread in _workers:
+        thread.join()
+    _workers.clear()
+    _queue = None
+
+    if _process is not None:
+        try:
+            _process.stdin.close()
+        except OSError:
+            pass
+        _process.wait()
+        _process = None
+    return dict(STATS)
+
+
+# ============================================================
+#                      КОЛЬЦО PBO
+# ============================================================
+def _resize(width: int, height: int) -> bool:
+    """(Пере)создать кольцо PBO под новый размер кадра."""
+    global _size, _next_slot, _process
+
+    if _size is not None and _command is not None:
+        # у кодировщика размер кадра задан при запуске
+        print("[capture] размер окна изменился — запись в кодировщик остановлена")
+        stop_capture()
+        return False
+
+    while _pending:
+        _collect_oldest(wait=True)
+    if _pbos:
+        glDeleteBuffers(len(_pbos), _pbos)
+        _pbos.clear()
+
+    if _command is not None:
+        args = shlex.split(_command.format(width=width, height=height))
+        try:
+            _process = subprocess.Popen(args, stdin=subprocess.PIPE)
+        except OSError as exc:
+            print(f"[capture] кодировщик не запустился: {exc}")
+            stop_capture()
+            return False
+
+    nbytes = width * height * 4
+    _pbos.extend(int(b) for b in np.atleast_1d(glGenBuffers(CAPTURE_RING)))
+    for pbo in _pbos:
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        glBufferData(GL_PIXEL_PACK_BUFFER, nbytes, None, GL_STREAM_READ)
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    _size = (width, height)
+    _next_slot = 0
+    return True
+
+
+def _collect_oldest(wait: bool, block: bool = False) -> None:
+    """
+    Самый старый прочитанный кадр — из PBO в очередь кодировщика.
+    wait — ждать GPU, если fence ещё не сработал; block — ждать место в очереди.
+    """
+    pbo, fence, index = _pending.popleft()
+    if fence is not None:
+        if wait and glClientWaitSync(fence, 0, 0) == GL_TIMEOUT_EXPIRED:
+            STATS["stalls"] += 1
+            glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, GL_TIMEOUT_IGNORED)
+        glDeleteSync(fence)
+
+    # кодировщик не успевает — и копировать незачем
+    if not block and _queue.full():
+        with _stats_lock:
+            STATS["dropped"] += 1
+        return
+
+    width, height = _size
+    nbytes = width * height * 4
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+    address = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, nbytes, GL_MAP_READ_BIT)
+    pixels = np.ctypeslib.as_array((ctypes.c_ubyte * nbytes).from_address(address)).copy()
+    glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    try:
+        _queue.put((index, pixels.reshape(height, width, 4)), block=block)
+    except queue.Full:
+        with _stats_lock:
+            STATS["dropped"] += 1
+
+
+# ============================================================
+#                      КОДИРОВАНИЕ (ПОТОКИ)
+# ============================================================
+def _encode_loop() -> None:
+    """Поток пула: берёт кадры из очереди, пока не придёт None."""
+    work = _queue
+    while True:
+        item = work.get()
+        if item is None:
+            return
+        if _failed.is_set():
+            continue
+        index, pixels = item
+        # в GL строки снизу вверх, альфа окна не нужна
+        rgb = np.ascontiguousarray(pixels[::-1, :, :3])
+        try:
+            if _directory is not None:
+                path = os.path.join(_directory, f"frame_{index:06d}.png")
+                with open(path, "wb") as f:
+                    f.write(encode_png(rgb))
+            else:
+                _process.stdin.write(rgb.tobytes())
+        except OSError as exc:
+            print(f"[capture] запись остановлена: {exc}")
+            _failed.set()
+            continue
+        with _stats_lock:
+            STATS["written"] += 1
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(data, zlib.crc32(tag))
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+
+def encode_png(rgb: np.ndarray) -> bytes:
+    """PNG (RGB, 8 бит, без фильтров строк) из массива (высота, ширина, 3)."""
+    height, width, _ = rgb.shape
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = rgb.reshape(height, width * 3)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"".join((
+        _PNG_SIGNATURE,
+        _png_chunk(b"IHDR", header),
+        _png_chunk(b"IDAT", zlib.compress(rows.tobytes(), PNG_LEVEL)),
+        _png_chunk(b"IEND", b""),
+    ))
@@ -0,0 +1,116 @@
+# chunks.py
+"""
+Детерминированный мир из клеток (чанков) с LRU-кэшем.
+
+- Мир разбит на квадратные клетки CHUNK_SIZE x CHUNK_SIZE в АБСОЛЮТНЫХ
+  координатах (terrain.get_world_position()) — переносы начала отсчёта
+  (floating origin) на ключи клеток не влияют.
+- Содержимое клетки генерируется из seed, выведенного из (cx, cz) и
+  seed мира: пролетая над тем же местом, видим тот же лес.
+- Сгенерированные клетки лежат в LRU-кэше ограниченного размера:
+  давно не нужные выбрасываются, память не растёт.
+"""
+
+import math
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from terrain import terrain_height_absolute
+
+CHUNK_SIZE = 64.0
+
+# сколько клеток держим в памяти
+CHUNK_CACHE_SIZE = 256
+
+# плотность: деревьев на клетку и шанс, что в клетке есть домик
+TREES_PER_CHUNK = 14
+HOUSE_CHANCE = 0.35
+
+# виды объектов (значения в SCENERY_KIND и Chunk.kind)
+KIND_TREE = 0
+KIND_HOUSE = 1
+
+
+class Chunk(NamedTuple):
+    """Содержимое одной клетки — те же столбцы, что у scenery (x, z абсолютные)."""
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    scale: np.ndarray
+    kind: np.ndarray
+
+
+def chunk_key(x: float, z: float) -> tuple[int, int]:
+    """Клетка, в которую попадает мировая точка (x, z)."""
+    return int(math.floor(x / CHUNK_SIZE)), int(math.floor(z / CHUNK_SIZE))
+
+
+def chunks_in_radius(x: float, z: float, radius: float) -> list[tuple[int, int]]:
+    """Все клетки, квадрат которых пересекает круг радиуса radius вокруг (x, z)."""
+    cx0, cz0 = chunk_key(x - radius, z - radius)
+    cx1, cz1 = chunk_key(x + radius, z + radius)
+
+    cxs, czs = np.meshgrid(np.arange(cx0, cx1 + 1), np.arange(cz0, cz1 + 1), indexing="ij")
+    # ближайшая к центру точка каждой клетки
+    near_x = np.clip(x, cxs * CHUNK_SIZE, (cxs + 1) * CHUNK_SIZE)
+    near_z = np.clip(z, czs * CHUNK_SIZE, (czs + 1) * CHUNK_SIZE)
+    inside = (near_x - x) ** 2 + (near_z - z) ** 2 <= radius * radius
+
+    return list(zip(cxs[inside].tolist(), czs[inside].tolist()))
+
+
+def generate_chunk(cx: int, cz: int, world_seed: int) -> Chunk:
+    """Содержимое клетки (cx, cz) — всегда одно и то же для одного world_seed."""
+    # SeedSequence принимает только неотрицательные числа
+    rng = np.random.default_rng([world_seed, cx + 2 ** 31, cz + 2 ** 31])
+
+    tree_count = TREES_PER_CHUNK
+    house_count = 1 if rng.random() < HOUSE_CHANCE else 0
+    count = tree_count + house_count
+
+    x = (cx + rng.random(count)) * CHUNK_SIZE
+    z = (cz + rng.random(count)) * CHUNK_SIZE
+    scale = np.concatenate([
+        rng.uniform(0.8, 1.6, tree_count),
+        rng.uniform(1.2, 1.8, house_count),
+    ]).astype(np.float32)
+    kind = np.concatenate([
+        np.full(tree_count, KIND_TREE, dtype=np.int8),
+        np.full(house_count, KIND_HOUSE, dtype=np.int8),
+    ])
+    y = terrain_height_absolute(x, z).astype(np.float32)
+
+    return Chunk(x, y, z, scale, kind)
+
+
+class ChunkCache:
+    """LRU-кэш клеток: при переполнении выкидываем самую давно нужную."""
+
+    def __init__(self, world_seed: int, capacity: int = CHUNK_CACHE_SIZE):
+        self.world_seed = world_seed
+        self.capacity = capacity
+        self._chunks: OrderedDict[tuple[int, int], Chunk] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def get(self, key: tuple[int, int]) -> Chunk:
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            self.hits += 1
+            return chunk
+
+        self.misses += 1
+        chunk = generate_chunk(key[0], key[1], self.world_seed)
+        self._chunks[key] = chunk
+        if len(self._chunks) > self.capacity:
+            self._chunks.popitem(last=False)
+            self.evictions += 1
+        return chunk
@@ -6,18 +6,54 @@
 - храним координаты облаков в МИРОВЫХ координатах (x_world, z_world),
 - при отрисовке вычитаем WORLD_OFFSET, чтобы мир «ездил» под самолётом,
 - когда облако слишком далеко — переставляем его вперёд по курсу.
+- координаты отсчитаны от плавающего начала terrain.ORIGIN и сдвигаются
+  при его переносе (_on_rebase),
+- при симуляции в отдельном потоке рисуем неизменяемый снимок
+  (cloud_state / set_render_state), а не живые массивы.
+
+Отрисовка:
+- все видимые облака каждый кадр разворачиваются в один массив
+  треугольников (векторно, по шаблону _cloud_geometry) и уходят в
+  поточный VBO — один glDrawArrays на всё поле;
+- VBO — кольцо из CLOUD_RING_SIZE буферов: пишем в тот, который GPU
+  дочитал пару кадров назад, и не ждём его (без синхронизации);
+- полупрозрачные облака сортируются от дальних к ближним. Порядок
+  прошлого кадра сохраняется, а досортировка идёт устойчивой сортировкой
+  (timsort): почти упорядоченный массив она проходит за ~O(n). В кадре
+  всё поле — один полупрозрачный элемент render_queue (submit_clouds).
+- Живая доля поля (set_live_fraction, её двигает governor.py) — как у
+  scenery.py: переставляются и попадают в снимок только живые облака
+  (CLOUD_LIVE). Облако гаснет далеко за спиной, а оживает по
+  REVIVE_PER_TICK за тик впереди, поэтому на виду ничего не мигает.
 """
 
-import random
+import ctypes
 import math
-from typing import List, Tuple
+from typing import NamedTuple
 
+import numpy as np
 from OpenGL.GL import *
 
-from terrain import get_world_offset, terrain_height_world
-
-# (x_world, z_world, scale, height)
-CLOUDS: List[Tuple[float, float, float, float]] = []
+import glstate
+import instancing
+import render_queue
+from frustum import record, spheres_visible
+from meshes import get_mesh, merge_geometry, plane_geometry
+from terrain import (
+    get_render_offset,
+    get_world_offset,
+    register_rebase_listener,
+    terrain_height_world,
+)
+
+# Поле облаков — предвыделенные NumPy-массивы (struct-of-arrays).
+# CLOUD_HEIGHT уже «прижата» над рельефом при появлении облака,
+# поэтому при отрисовке рельеф не запрашиваем.
+CLOUD_X = np.zeros(0, dtype=np.float64)
+CLOUD_Z = np.zeros(0, dtype=np.float64)
+CLOUD_SIZE = np.zeros(0, dtype=np.float32)
+CLOUD_HEIGHT = np.zeros(0, dtype=np.float32)
+CLOUD_LIVE = np.zeros(0, dtype=bool)  # живые (рисуются) — см. set_live_fraction
 
 # радиусы зоны вокруг самолёта
 CLOUD_RADIUS_MIN = 80.0
@@ -27,135 +63,340 @@ CLOUD_RADIUS_MAX = 260.0
 CLOUD_HEIGHT_MIN = 80.0
 CLOUD_HEIGHT_MAX = 160.0
 
+# размеры облаков
+CLOUD_SIZE_MIN = 15.0
+CLOUD_SIZE_MAX = 30.0
+
 # сектор вперёд по курсу (в градусах)
 FRONT_ARC_DEG = 80.0
 
+# сколько мёртвых слотов оживает за тик, когда живая доля выросла
+REVIVE_PER_TICK = 1
+
+_rng = np.random.default_rng(2025)
+
+# живая доля поля; ранг слота i — i / count, слот живой, если ранг меньше
+# доли; сколько слотов так живёт (пока живых меньше — оживляем)
+_live_fraction = 1.0
+_rank = np.zeros(0, dtype=np.float32)
+_live_target = 0
+
+# сколько буферов в кольце поточного VBO
+CLOUD_RING_SIZE = 3
+
+# буферы кольца, их текущая вместимость в байтах и следующий на запись
+_ring: list[int] = []
+_ring_capacity: list[int] = []
+_ring_next = 0
+
+# порядок облаков «от дальних к ближним» с прошлого кадра
+_order = np.zeros(0, dtype=np.intp)
+
+# треугольники одного облака размера 1 (18 вершин x 3) — из _cloud_geometry
+_template: np.ndarray | None = None
+
+
+class CloudState(NamedTuple):
+    """Снимок живых облаков (только для чтения) — то, что рисуем."""
+    x: np.ndarray
+    z: np.ndarray
+    size: np.ndarray
+    height: np.ndarray
+    slots: np.ndarray           # номер слота поля у каждой строки
+
+
+# снимок, который рисуем (None — живые массивы CLOUD_*)
+_render_state: CloudState | None = None
+
+
+def _live_state() -> CloudState:
+    """Живые облака — копиями массивов (мёртвые слоты не копируем)."""
+    slots = np.flatnonzero(CLOUD_LIVE)
+    return CloudState(CLOUD_X[slots], CLOUD_Z[slots], CLOUD_SIZE[slots],
+                      CLOUD_HEIGHT[slots], slots)
+
+
+def cloud_state() -> CloudState:
+    """Снимок живых облаков, защищённый от записи."""
+    state = _live_state()
+    for a in state:
+        a.flags.writeable = False
+    return state
+
+
+def set_render_state(state: CloudState | None) -> None:
+    """Что рисовать: снимок из потока симуляции или None — живые массивы."""
+    global _render_state
+    _render_state = state
+
+
+def _drawn_state() -> CloudState:
+    if _render_state is not None:
+        return _render_state
+    return _live_state()
+
+
+def _cloud_geometry():
+    """
+    Простой «пух» из трёх перекрывающихся прямоугольников, size = 1,
+    в локальных координатах вокруг (0, 0, 0).
+    """
+    white = (1.0, 1.0, 1.0)
+    return merge_geometry(
+        plane_geometry(white, size=(1.0, 1.0), normal_y=-1.0),
+        plane_geometry(white, center=(-0.15, 0.0, 0.15), size=(0.7, 0.7), normal_y=-1.0),
+        plane_geometry(white, center=(0.15, 0.0, -0.1), size=(0.6, 0.6), normal_y=-1.0),
+    )
+
+
+def _visible_mask(state: CloudState, frustum, xl: np.ndarray, zl: np.ndarray) -> np.ndarray:
+    """Облака в пирамиде видимости (xl, zl — уже локальные координаты)."""
+    if frustum is None:
+        visible = np.ones(len(xl), dtype=bool)
+    else:
+        # облако — плоский «пух» size x size, сфера радиуса ~size/sqrt(2)
+        visible = spheres_visible(frustum, xl, state.height, zl, state.size * 0.71)
+
+    drawn = int(np.count_nonzero(visible))
+    record("clouds", drawn, len(visible) - drawn)
+    return visible
+
+
+def _back_to_front(state: CloudState, xl: np.ndarray, zl: np.ndarray, eye) -> np.ndarray:
+    """
+    Индексы всех облаков от дальних к ближним (eye — локальная позиция
+    камеры; None — порядок массивов). Начинаем с порядка прошлого кадра:
+    за кадр облака почти не переставляются, и устойчивая сортировка
+    (timsort находит уже упорядоченные куски) обходится почти линейно.
+    """
+    global _order
+
+    count = len(xl)
+    if eye is None:
+        return np.arange(count)
+
+    dist = ((xl - eye[0]) ** 2
+            + (state.height - eye[1]) ** 2
+            + (zl - eye[2]) ** 2)
 
-def _draw_cloud_billboard(size: float):
+    # поле облаков пересоздано или сменился живой набор — прошлого порядка нет
+    if len(_order) != count:
+        _order = np.arange(count)
+
+    # минус: по убыванию расстояния; stable — это timsort
+    _order = _order[np.argsort(-dist[_order], kind="stable")]
+    return _order
+
+
+def cloud_instances(frustum=None, eye=None):
+    """
+    Меш облака и видимые экземпляры (x, y, z, size) в локальных координатах,
+    от дальних к ближним, если задана камера eye.
     """
-    Простой «пух» из нескольких перекрывающихся прямоугольников.
-    Рисуем в локальных координатах вокруг (0,0,0).
+    state = _drawn_state()
+    wx, wz = get_render_offset()
+    xl = state.x - wx
+    zl = state.z - wz
+    visible = _visible_mask(state, frustum, xl, zl)
+    order = _back_to_front(state, xl, zl, eye)
+    order = order[visible[order]]
+    instances = instancing.make_instances(
+        xl[order], state.height[order], zl[order], state.size[order]
+    )
+    return get_mesh("cloud", _cloud_geometry), instances
+
+
+def _cloud_triangles(xs, ys, zs, sizes) -> np.ndarray:
+    """Вершины всех облаков разом: (N * 18, 3) float32, облака по порядку."""
+    global _template
+
+    if _template is None:
+        vertices, indices = _cloud_geometry()
+        _template = vertices[indices, 0:3]
+
+    tris = np.empty((len(xs), len(_template), 3), dtype=np.float32)
+    np.multiply(_template[None, :, :], sizes[:, None, None], out=tris)
+    tris[:, :, 0] += xs[:, None]
+    tris[:, :, 1] += ys[:, None]
+    tris[:, :, 2] += zs[:, None]
+    return tris.reshape(-1, 3)
+
+
+def _upload_stream(vertices: np.ndarray) -> int:
     """
-    half = size * 0.5
+    Заливаем вершины в следующий буфер кольца и возвращаем его. Буфер
+    растёт только при нехватке места, иначе — glBufferSubData.
+    """
+    global _ring_next
 
-    # основной «слой» облака
-    glBegin(GL_QUADS)
-    glNormal3f(0.0, -1.0, 0.0)
-    glVertex3f(-half, 0.0, -half)
-    glVertex3f(half, 0.0, -half)
-    glVertex3f(half, 0.0, half)
-    glVertex3f(-half, 0.0, half)
-    glEnd()
+    if not _ring:
+        _ring.extend(int(b) for b in np.atleast_1d(glGenBuffers(CLOUD_RING_SIZE)))
+        _ring_capacity.extend([0] * CLOUD_RING_SIZE)
 
-    # доп. «пухи» для объёмности
-    glPushMatrix()
-    glTranslatef(-half * 0.3, 0.0, half * 0.3)
-    glScalef(0.7, 1.0, 0.7)
-    glBegin(GL_QUADS)
-    glNormal3f(0.0, -1.0, 0.0)
-    glVertex3f(-half, 0.0, -half)
-    glVertex3f(half, 0.0, -half)
-    glVertex3f(half, 0.0, half)
-    glVertex3f(-half, 0.0, half)
-    glEnd()
-    glPopMatrix()
+    slot = _ring_next
+    _ring_next = (_ring_next + 1) % CLOUD_RING_SIZE
 
-    glPushMatrix()
-    glTranslatef(half * 0.3, 0.0, -half * 0.2)
-    glScalef(0.6, 1.0, 0.6)
-    glBegin(GL_QUADS)
-    glNormal3f(0.0, -1.0, 0.0)
-    glVertex3f(-half, 0.0, -half)
-    glVertex3f(half, 0.0, -half)
-    glVertex3f(half, 0.0, half)
-    glVertex3f(-half, 0.0, half)
-    glEnd()
-    glPopMatrix()
+    glBindBuffer(GL_ARRAY_BUFFER, _ring[slot])
+    if vertices.nbytes > _ring_capacity[slot]:
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STREAM_DRAW)
+        _ring_capacity[slot] = vertices.nbytes
+    else:
+        glBufferSubData(GL_ARRAY_BUFFER, 0, vertices.nbytes, vertices)
+    return _ring[slot]
 
 
-def _random_cloud_world(cx: float, cz: float) -> Tuple[float, float, float, float]:
+def _spawn_clouds(idx: np.ndarray, xs: np.ndarray, zs: np.ndarray) -> None:
     """
-    Случайная позиция облака в кольце вокруг (cx, cz).
+    Записываем новые облака в слоты idx (на месте, без новых списков):
+    координаты, случайный размер и высоту, сразу поднятую над рельефом.
     """
-    angle = random.uniform(0.0, 2.0 * math.pi)
-    r = math.sqrt(random.uniform(CLOUD_RADIUS_MIN ** 2, CLOUD_RADIUS_MAX ** 2))
-    x = cx + math.sin(angle) * r
-    z = cz + math.cos(angle) * r
-    scale = random.uniform(15.0, 30.0)
-    height = random.uniform(CLOUD_HEIGHT_MIN, CLOUD_HEIGHT_MAX)
-    return x, z, scale, height
+    count = idx.size
+    CLOUD_X[idx] = xs
+    CLOUD_Z[idx] = zs
+    CLOUD_SIZE[idx] = _rng.uniform(CLOUD_SIZE_MIN, CLOUD_SIZE_MAX, count)
+
+    heights = _rng.uniform(CLOUD_HEIGHT_MIN, CLOUD_HEIGHT_MAX, count)
+    ground = terrain_height_world(xs, zs)
+    CLOUD_HEIGHT[idx] = np.maximum(heights, ground + CLOUD_HEIGHT_MIN)
+
+
+def set_live_fraction(fraction: float) -> None:
+    """Какая доля поля должна жить (действует по мере перестановки облаков)."""
+    global _live_fraction, _live_target
+    _live_fraction = float(fraction)
+    _live_target = int(np.count_nonzero(_rank < _live_fraction))
 
 
-def init_clouds():
+def live_counts() -> dict[str, int]:
+    """Сколько облаков сейчас живые (в том, что рисуется) и размер пула."""
+    return {"clouds": len(_drawn_state().x), "pool": len(CLOUD_X)}
+
+
+def init_clouds(count: int = 40, seed: int = 2025):
     """
     Сгенерировать стартовое поле облаков вокруг самолёта.
     """
-    global CLOUDS
-    random.seed(2025)
-    CLOUDS = []
+    global CLOUD_X, CLOUD_Z, CLOUD_SIZE, CLOUD_HEIGHT, CLOUD_LIVE, _rng, _rank, _live_target
+    _rng = np.random.default_rng(seed)
+
+    CLOUD_X = np.zeros(count, dtype=np.float64)
+    CLOUD_Z = np.zeros(count, dtype=np.float64)
+    CLOUD_SIZE = np.zeros(count, dtype=np.float32)
+    CLOUD_HEIGHT = np.zeros(count, dtype=np.float32)
+    _rank = (np.arange(count) / max(count, 1)).astype(np.float32)
+    CLOUD_LIVE = _rank < _live_fraction
+    _live_target = int(np.count_nonzero(CLOUD_LIVE))
 
     plane_x, plane_z = get_world_offset()
 
-    count = 40
-    for _ in range(count):
-        CLOUDS.append(_random_cloud_world(plane_x, plane_z))
+    angle = _rng.uniform(0.0, 2.0 * math.pi, count)
+    r = np.sqrt(_rng.uniform(CLOUD_RADIUS_MIN ** 2, CLOUD_RADIUS_MAX ** 2, count))
+    _spawn_clouds(
+        np.arange(count),
+        plane_x + np.sin(angle) * r,
+        plane_z + np.cos(angle) * r,
+    )
 
 
-def update_clouds(plane_yaw_deg: float):
+def update_clouds(plane_yaw_deg: float) -> np.ndarray:
     """
-    Переставляем облака, которые слишком далеко от самолёта, вперёд по курсу.
+    Переставляем живые облака, которые слишком далеко от самолёта, вперёд
+    по курсу; сверх живой доли — гасим, недостающие оживляем там же.
+    Одна маска на живые и один пакетный respawn прямо в массивах.
+    Возвращает индексы изменившихся слотов.
     """
-    global CLOUDS
-
     plane_x, plane_z = get_world_offset()
+
+    live = np.flatnonzero(CLOUD_LIVE)
+    dx = CLOUD_X[live] - plane_x
+    dz = CLOUD_Z[live] - plane_z
+    far = live[dx * dx + dz * dz > CLOUD_RADIUS_MAX ** 2]
+
+    keep = _rank[far] < _live_fraction
+    dying = far[~keep]
+    idx = far[keep]
+    if len(live) - len(dying) < _live_target:
+        dead = np.flatnonzero(~CLOUD_LIVE & (_rank < _live_fraction))
+        reviving = dead[:REVIVE_PER_TICK]
+        CLOUD_LIVE[reviving] = True
+        idx = np.concatenate([idx, reviving])
+    CLOUD_LIVE[dying] = False
+
+    count = idx.size
+    if count == 0:
+        return dying
+
     yaw_rad = math.radians(plane_yaw_deg)
     front_arc_rad = math.radians(FRONT_ARC_DEG)
 
-    def respawn_in_front() -> Tuple[float, float, float, float]:
-        angle = yaw_rad + random.uniform(-front_arc_rad, front_arc_rad)
-        r = random.uniform(CLOUD_RADIUS_MIN, CLOUD_RADIUS_MAX)
-        x = plane_x + math.sin(angle) * r
-        z = plane_z + math.cos(angle) * r
-        scale = random.uniform(15.0, 30.0)
-        height = random.uniform(CLOUD_HEIGHT_MIN, CLOUD_HEIGHT_MAX)
-        return x, z, scale, height
+    angle = yaw_rad + _rng.uniform(-front_arc_rad, front_arc_rad, count)
+    r = _rng.uniform(CLOUD_RADIUS_MIN, CLOUD_RADIUS_MAX, count)
+    _spawn_clouds(idx, plane_x + np.sin(angle) * r, plane_z + np.cos(angle) * r)
 
-    new_clouds = []
-    max_r2 = CLOUD_RADIUS_MAX ** 2
-    for (x, z, s, h) in CLOUDS:
-        dx = x - plane_x
-        dz = z - plane_z
-        if dx * dx + dz * dz > max_r2:
-            new_clouds.append(respawn_in_front())
-        else:
-            new_clouds.append((x, z, s, h))
+    return np.concatenate([idx, dying])
 
-    CLOUDS = new_clouds
 
+def _on_rebase(dx: float, dz: float) -> None:
+    """Начало отсчёта переехало на (dx, dz): сдвигаем всё поле облаков."""
+    CLOUD_X[:] -= dx
+    CLOUD_Z[:] -= dz
+
+
+register_rebase_listener(_on_rebase)
 
-def draw_clouds():
-    """
-    Отрисовываем облака. Они чуть полупрозрачные и всегда выше рельефа.
-    """
-    wx, wz = get_world_offset()
 
-    glPushAttrib(GL_ENABLE_BIT | GL_CURRENT_BIT)
-    glEnable(GL_BLEND)
-    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+def _visible_triangles(frustum, eye) -> tuple[np.ndarray, float] | None:
+    """Вершины видимых облаков от дальних к ближним и глубина самого дальнего."""
+    state = _drawn_state()
+    wx, wz = get_render_offset()
+    xl = state.x - wx
+    zl = state.z - wz
+    visible = _visible_mask(state, frustum, xl, zl)
+    order = _back_to_front(state, xl, zl, eye)
+    order = order[visible[order]]
+    if len(order) == 0:
+        return None
 
-    glDisable(GL_LIGHTING)
+    # уже в локальных координатах (мировые минус WORLD_OFFSET)
+    vertices = _cloud_triangles(xl[order], state.height[order], zl[order], state.size[order])
+    first = order[0]
+    depth = render_queue.distance(eye, (xl[first], state.height[first], zl[first]))
+    return vertices, depth
 
-    for (xw, zw, size, height) in CLOUDS:
-        # гарантируем, что облако выше рельефа
-        y = max(height, terrain_height_world(xw, zw) + CLOUD_HEIGHT_MIN)
 
-        glPushMatrix()
-        # из мировых координат -> в локальные (как в scenery)
-        glTranslatef(xw - wx, y, zw - wz)
+def _setup_material() -> None:
+    """Состояние через кэш glstate, без glPushAttrib: что уже стоит — не трогаем."""
+    glstate.use_program(0)
+    glstate.enable(GL_BLEND)
+    glstate.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
-        glColor4f(1.0, 1.0, 1.0, 0.8)
-        _draw_cloud_billboard(size)
+    glstate.disable(GL_LIGHTING)
+    glstate.disable(GL_TEXTURE_2D)
 
-        glPopMatrix()
+    # цвет у всех облаков общий — ставим один раз
+    glstate.color(1.0, 1.0, 1.0, 0.8)
 
-    glPopAttrib()
+
+render_queue.register_material("clouds", _setup_material, transparent=True)
+
+
+def _draw_triangles(vertices: np.ndarray) -> None:
+    _upload_stream(vertices)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+    glDrawArrays(GL_TRIANGLES, 0, len(vertices))
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+
+def submit_clouds(frustum=None, eye=None) -> None:
+    """
+    Облака — одним полупрозрачным элементом render_queue. Они чуть
+    полупрозрачные и всегда выше рельефа (высота посчитана заранее, в
+    _spawn_clouds). frustum — плоскости Camera.frustum(): невидимые облака
+    не сдаём; eye — позиция камеры: облака от дальних к ближним.
+    """
+    prepared = _visible_triangles(frustum, eye)
+    if prepared is not None:
+        vertices, depth = prepared
+        render_queue.submit("clouds", depth, _draw_triangles, vertices)
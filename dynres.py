@@ -0,0 +1,278 @@
+# dynres.py
+"""
+Динамическое разрешение: 3D-сцена рисуется в FBO с долей scale от
+размера окна и растягивается на экран (glBlitFramebuffer, GL_LINEAR).
+
+- FBO выделяется под полный размер окна (resize() из main.reshape);
+  меньший масштаб — меньший viewport в том же FBO, поэтому шаг
+  контроллера ничего не перевыделяет. HUD рисуется уже после растяжения,
+  в полном разрешении.
+- Контроллер держит время кадра в бюджете 1000 / TARGET_FPS мс. От
+  разрешения зависит только работа GPU, поэтому меряем её запросом
+  GL_TIME_ELAPSED (результат забираем кадром позже — не ждём). Если
+  таймеров нет или растеризатор программный (llvmpipe: «GPU» — те же
+  ядра CPU, а таймеры у него врут) — время CPU кадра до показа
+  (frame_cost): ожидание vsync в него не входит, иначе при TARGET_FPS,
+  равном частоте экрана, кадр всегда выглядел бы «на пределе».
+- Это же время frame_done() отдаёт дальше — по нему плотность мира
+  двигает governor.py, когда масштаб упёрся в границу.
+- Гистерезис: сглаженное время выше бюджета * DOWNSCALE_AT — уменьшаем
+  масштаб, ниже бюджета * UPSCALE_AT — увеличиваем, между ними — держим.
+  После каждого шага выжидаем SETTLE_FRAMES кадров, пока новое время
+  не попадёт в среднее; иначе масштаб «дребезжит».
+- Без FBO / glBlitFramebuffer available() вернёт False, и кадр рисуется
+  прямо в окно, как раньше.
+"""
+
+import math
+import time
+
+from OpenGL.GL import *
+from OpenGL.error import GLError
+
+# включается ключом --dynres [FPS] в main.py / benchmark.py
+ENABLED: bool = False
+TARGET_FPS = 60.0
+
+# границы и шаг масштаба (доля стороны окна)
+MIN_SCALE = 0.5
+MAX_SCALE = 1.0
+SCALE_QUANTUM = 0.05
+MAX_SCALE_STEP = 0.15
+
+# гистерезис: доли бюджета кадра
+DOWNSCALE_AT = 0.95
+UPSCALE_AT = 0.75
+SETTLE_FRAMES = 8
+
+# сглаживание времени кадра (экспоненциальное среднее)
+SMOOTHING = 0.15
+
+# текущий масштаб, сглаженное время (мс) и сколько раз масштаб менялся
+STATS = {"scale": 1.0, "frame_ms": 0.0, "changes": 0}
+
+_window_size = (1, 1)
+_target_size = (0, 0)
+_fbo = None
+_color_rb = None
+_depth_rb = None
+_failed = False
+
+# программные растеризаторы: таймерам GL не верим
+_SOFTWARE_RENDERERS = (b"llvmpipe", b"softpipe", b"swrast")
+
+# два запроса-таймера по очереди: пока один идёт, читаем другой
+_queries: list[int] = []
+_query_index = 0
+_query_pending = [False, False]
+
+_active = False
+_settle = 0
+# растеризатор программный (None — ещё не спрашивали)
+_software: bool | None = None
+
+
+def available() -> bool:
+    """Есть ли FBO и blit (при первом вызове проверяем и готовим таймеры)."""
+    global _failed, _queries
+
+    if _fbo is not None:
+        return True
+    if _failed:
+        return False
+    if not bool(glGenFramebuffers) or not bool(glBlitFramebuffer):
+        print("[dynres] отключено: нет FBO / glBlitFramebuffer")
+        _failed = True
+        return False
+    if bool(glGenQueries) and not _is_software() and not _queries:
+        try:
+            _queries = [int(q) for q in glGenQueries(2)]
+        except GLError:
+            _queries = []
+    return _allocate(*_window_size)
+
+
+def _is_software() -> bool:
+    global _software
+    if _software is None:
+        renderer = glGetString(GL_RENDERER) or b""
+        _software = any(name in renderer for name in _SOFTWARE_RENDERERS)
+    return _software
+
+
+def resize(width: int, height: int) -> None:
+    """Окно поменяло размер: цели рендера перевыделим под него."""
+    global _window_size
+    _window_size = (max(1, width), max(1, height))
+    if _fbo is not None and _target_size != _window_size:
+        _allocate(*_window_size)
+
+
+def render_size() -> tuple[int, int]:
+    """Размер, в котором рисуется сцена при текущем масштабе."""
+    width, height = _window_size
+    scale = STATS["scale"]
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def begin_frame() -> bool:
+    """
+    Перед 3D-сценой: переключиться на FBO с уменьшенным viewport'ом.
+    False — динамическое разрешение выключено, рисуем прямо в окно.
+    """
+    global _active
+
+    _active = ENABLED and available()
+    if not _active:
+        return False
+
+    if _queries:
+        glBeginQuery(GL_TIME_ELAPSED, _queries[_query_index])
+
+    glBindFramebuffer(GL_FRAMEBUFFER, _fbo)
+    glViewport(0, 0, *render_size())
+    return True
+
+
+def end_frame() -> None:
+    """После 3D-сцены: растянуть её на окно (HUD рисуется уже поверх)."""
+    if not _active:
+        return
+
+    width, height = _window_size
+    render_w, render_h = render_size()
+    glBindFramebuffer(GL_READ_FRAMEBUFFER, _fbo)
+    glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+    glBlitFramebuffer(0, 0, render_w, render_h, 0, 0, width, height,
+                      GL_COLOR_BUFFER_BIT, GL_LINEAR)
+    glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    glViewport(0, 0, width, height)
+
+    if _queries:
+        glEndQuery(GL_TIME_ELAPSED)
+        _query_pending[_query_index] = True
+
+
+def frame_cost(started: float) -> float:
+    """
+    Время CPU кадра (мс) от started (perf_counter) до сих пор — звать до
+    показа кадра. Программный растеризатор рисует теми же ядрами CPU и
+    откладывает работу до показа: сначала даём ему дорисовать (glFinish).
+    """
+    if _is_software():
+        glFinish()
+    return (time.perf_counter() - started) * 1000.0
+
+
+def frame_done(cpu_ms: float) -> float | None:
+    """
+    Кадр показан, cpu_ms — его frame_cost(). Пересчитываем масштаб и
+    возвращаем время кадра, по которому он считался: GPU по таймеру (кадр
+    назад) или cpu_ms. None — результата таймера ещё нет.
+    """
+    global _query_index, _active
+
+    if not _active:
+        return cpu_ms
+    _active = False
+
+    if not _queries:
+        _update_scale(cpu_ms)
+        return cpu_ms
+
+    # результат прошлого кадра: готов — берём, нет — пропускаем кадр
+    _query_index = 1 - _query_index
+    cost_ms = _read_query(_query_index)
+    if cost_ms is not None:
+        _update_scale(cost_ms)
+    return cost_ms
+
+
+def can_shrink() -> bool:
+    """Есть ли ещё куда уменьшать масштаб (контроллер включён и работает)."""
+    return ENABLED and _fbo is not None and STATS["scale"] > MIN_SCALE
+
+
+def can_grow() -> bool:
+    """Есть ли ещё куда увеличивать масштаб."""
+    return ENABLED and _fbo is not None and STATS["scale"] < MAX_SCALE
+
+
+def _read_query(index: int) -> float | None:
+    """Время GPU (мс) по запросу index, если результат уже есть."""
+    if not _query_pending[index]:
+        return None
+    query = _queries[index]
+    if not glGetQueryObjectiv(query, GL_QUERY_RESULT_AVAILABLE):
+        return None
+    _query_pending[index] = False
+    elapsed = GLuint64(0)
+    glGetQueryObjectui64v(query, GL_QUERY_RESULT, elapsed)
+    return elapsed.value / 1.0e6
+
+
+def _update_scale(cost_ms: float) -> None:
+    """Контроллер: масштаб по сглаженному времени кадра, с гистерезисом."""
+    global _settle
+
+    if STATS["frame_ms"] == 0.0:
+        STATS["frame_ms"] = cost_ms
+    else:
+        STATS["frame_ms"] += (cost_ms - STATS["frame_ms"]) * SMOOTHING
+
+    if _settle > 0:
+        _settle -= 1
+        return
+
+    budget = 1000.0 / TARGET_FPS
+    frame_ms = STATS["frame_ms"]
+    if UPSCALE_AT * budget <= frame_ms <= DOWNSCALE_AT * budget:
+        return
+
+    # работа GPU ~ числу пикселей ~ scale^2: целимся в середину полосы
+    scale = STATS["scale"]
+    goal = 0.5 * (UPSCALE_AT + DOWNSCALE_AT) * budget
+    wanted = scale * math.sqrt(goal / max(frame_ms, 1e-3))
+    wanted = min(max(wanted, scale - MAX_SCALE_STEP), scale + MAX_SCALE_STEP)
+    wanted = round(round(wanted / SCALE_QUANTUM) * SCALE_QUANTUM, 4)
+    wanted = min(max(wanted, MIN_SCALE), MAX_SCALE)
+    if abs(wanted - scale) < 1e-6:
+        return
+
+    STATS["scale"] = wanted
+    STATS["changes"] += 1
+    # среднее прошлых кадров — от старого масштаба: пересчитываем пропорционально
+    STATS["frame_ms"] = frame_ms * (wanted / scale) ** 2
+    _settle = SETTLE_FRAMES
+
+
+def _allocate(width: int, height: int) -> bool:
+    """(Пере)создать FBO с цветом и глубиной под полный размер окна."""
+    global _fbo, _color_rb, _depth_rb, _target_size, _failed
+
+    if _fbo is None:
+        _fbo = glGenFramebuffers(1)
+        _color_rb, _depth_rb = (int(rb) for rb in glGenRenderbuffers(2))
+
+    glBindRenderbuffer(GL_RENDERBUFFER, _color_rb)
+    glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+    glBindRenderbuffer(GL_RENDERBUFFER, _depth_rb)
+    glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+    glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+    glBindFramebuffer(GL_FRAMEBUFFER, _fbo)
+    glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, _color_rb)
+    glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, _depth_rb)
+    status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+    glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    if status != GL_FRAMEBUFFER_COMPLETE:
+        print(f"[dynres] отключено: FBO неполный (0x{int(status):x})")
+        glDeleteFramebuffers(1, [_fbo])
+        glDeleteRenderbuffers(2, [_color_rb, _depth_rb])
+        _fbo = None
+        _failed = True
+        return False
+
+    _target_size = (width, height)
+    return True
@@ -0,0 +1,415 @@
+# fleet.py
+"""
+Много самолётов сразу: позы в NumPy-массивах (struct-of-arrays).
+
+- Fleet хранит yaw/pitch/roll/speed и позицию N самолётов, слот — индекс
+  в массивах. Airplane (airplane.py) — вид на один слот.
+- Fleet.update(dt) шагает все самолёты одним векторным проходом, с теми же
+  ограничениями высоты (над рельефом и потолок), что и у одного самолёта.
+- Самолёт игрока «везёт мир» (drives_world): он стоит около локального
+  нуля, а его перемещение уходит в terrain.move_world. Остальные (трафик)
+  хранят АБСОЛЮТНЫЕ координаты (float64): переносы начала отсчёта им не
+  страшны, в локальные они переводятся только при отрисовке.
+- Трафик летит на автопилоте (вираж с постоянной угловой скоростью) и не
+  отходит от игрока дальше FLEET_RADIUS: вылетевший из квадрата
+  появляется с противоположной стороны.
+- Отрисовка — инстансингом меша самолёта (fleet.vert поворачивает каждый
+  экземпляр): один draw call на весь видимый трафик (материал "traffic"
+  очереди render_queue, экземпляры — от ближних к дальним).
+- Симуляция шагает свою копию флота, а кадр рисует снимок трафика
+  (traffic_state / set_render_state), интерполированный между тиками.
+"""
+
+import math
+from typing import NamedTuple
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.error import GLError
+
+import glstate
+import instancing
+import render_queue
+from frustum import record, spheres_visible
+from meshes import ATTRIB_LOCATIONS, Mesh
+from shader import create_program
+from terrain import (
+    get_origin,
+    get_render_offset,
+    get_render_origin,
+    get_world_offset,
+    get_world_position,
+    move_world,
+    terrain_height_absolute,
+    terrain_height_noise,
+)
+from transforms import gl_matrix, rotate_x, rotate_y, rotate_z, scale, translate
+
+# ограничения самолёта (раньше — поля Airplane)
+MIN_SPEED = 10.0
+MAX_SPEED = 200.0
+MIN_ALT_ABOVE_GROUND = 20.0
+MAX_ALTITUDE = 120.0   # выше самолёт не поднимется (солнце/луна всё равно выше)
+CLIMB_FACTOR = 2.0
+
+# модель самолёта рисуется в масштабе x2
+AIRPLANE_SCALE = 2.0
+
+# трафик держится в квадрате ±FLEET_RADIUS вокруг игрока
+FLEET_RADIUS = 1500.0
+
+# радиус сферы самолёта для отсечения (размах крыльев ~13 x AIRPLANE_SCALE)
+FLEET_CULL_RADIUS = 15.0
+
+# сфера самолёта для столкновений (scenery.sphere_contacts): полразмаха
+AIRCRAFT_RADIUS = 6.65 * AIRPLANE_SCALE
+
+# трафик: высоты, скорости и угловые скорости виража (град/с)
+TRAFFIC_HEIGHT_MIN = 55.0
+TRAFFIC_HEIGHT_MAX = 115.0
+TRAFFIC_SPEED_MIN = 40.0
+TRAFFIC_SPEED_MAX = 110.0
+TRAFFIC_TURN_MAX = 8.0
+
+# раскраски трафика (множитель к цветам вершин)
+TRAFFIC_LIVERIES = np.array([
+    (1.00, 1.00, 1.00),
+    (1.00, 0.55, 0.45),
+    (0.55, 0.70, 1.00),
+    (1.00, 0.90, 0.45),
+    (0.60, 0.95, 0.60),
+], dtype=np.float32)
+
+_FIELDS = ("x", "y", "z", "yaw", "pitch", "roll", "speed", "turn_rate")
+
+
+class FleetState(NamedTuple):
+    """Снимок трафика (только для чтения): абсолютные x/z, углы в градусах."""
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    yaw: np.ndarray
+    pitch: np.ndarray
+    roll: np.ndarray
+    color: np.ndarray
+
+
+_EMPTY_STATE = FleetState(*(np.zeros(0) for _ in range(6)),
+                          np.zeros((0, 3), dtype=np.float32))
+
+
+class Fleet:
+    """
+    Самолёты в параллельных массивах. x/z у самолёта, который везёт мир, —
+    локальные (около нуля), у остальных — абсолютные.
+    """
+
+    def __init__(self, capacity: int = 1):
+        self.count = 0
+        for name in _FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.float64))
+        self.color = np.ones((capacity, 3), dtype=np.float32)
+        self.drives_world = np.zeros(capacity, dtype=bool)
+        # слоты трафика (все, кроме везущего мир) — для снимков
+        self._traffic = np.zeros(0, dtype=np.intp)
+
+    def _reserve(self, capacity: int) -> None:
+        """Вместимость не меньше capacity (массивы растут вдвое)."""
+        old = len(self.x)
+        if capacity <= old:
+            return
+        size = max(capacity, old * 2)
+        for name in (*_FIELDS, "color", "drives_world"):
+            a = getattr(self, name)
+            grown = np.zeros((size, *a.shape[1:]), dtype=a.dtype)
+            grown[:old] = a
+            setattr(self, name, grown)
+
+    def add(self, count: int = 1, *, x=0.0, y=40.0, z=0.0, yaw=0.0, pitch=0.0,
+            roll=0.0, speed=60.0, turn_rate=0.0, color=(1.0, 1.0, 1.0),
+            drives_world: bool = False) -> np.ndarray:
+        """Добавить count самолётов (поля — числа или массивы). Возвращает их слоты."""
+        start = self.count
+        self._reserve(start + count)
+        new = slice(start, start + count)
+        values = dict(x=x, y=y, z=z, yaw=yaw, pitch=pitch, roll=roll,
+                      speed=speed, turn_rate=turn_rate)
+        for name, value in values.items():
+            getattr(self, name)[new] = value
+        self.color[new] = color
+        self.drives_world[new] = drives_world
+        self.count += count
+        self._traffic = np.flatnonzero(~self.drives_world[:self.count])
+        return np.arange(start, start + count)
+
+    def __copy__(self) -> "Fleet":
+        """Независимая копия массивов (симуляция шагает свою)."""
+        other = Fleet(0)
+        other.count = self.count
+        for name in (*_FIELDS, "color", "drives_world", "_traffic"):
+            setattr(other, name, getattr(self, name).copy())
+        return other
+
+    def world_positions(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """x, y, z всех самолётов в мировых координатах (от terrain.ORIGIN)."""
+        n = self.count
+        drives = self.drives_world[:n]
+        ox, oz = get_origin()
+        wx, wz = get_world_offset()
+        xs = self.x[:n] + np.where(drives, wx, -ox)
+        zs = self.z[:n] + np.where(drives, wz, -oz)
+        return xs, self.y[:n].copy(), zs
+
+    def update(self, dt: float, slots=None) -> None:
+        """
+        Шаг всех самолётов (или только slots) одним векторным проходом.
+        Нос вверх (pitch > 0) — набор высоты; высота прижата к рельефу
+        снизу и к MAX_ALTITUDE сверху.
+        """
+        if dt <= 0.0 or self.count == 0:
+            return
+        sel = slice(0, self.count) if slots is None else np.atleast_1d(slots)
+
+        # автопилот трафика: вираж (у игрока turn_rate = 0)
+        turn = self.turn_rate[sel]
+        if turn.any():
+            self.yaw[sel] = (self.yaw[sel] + turn * dt) % 360.0
+
+        rad_yaw = np.radians(self.yaw[sel])
+        rad_pitch = np.radians(self.pitch[sel])
+        speed = self.speed[sel]
+        cos_pitch = np.cos(rad_pitch)
+        dx = np.sin(rad_yaw) * cos_pitch * speed * dt
+        dz = np.cos(rad_yaw) * cos_pitch * speed * dt
+        # нос вверх (pitch > 0) → самолёт набирает высоту
+        dy = -np.sin(rad_pitch) * speed * dt * CLIMB_FACTOR
+
+        drives = self.drives_world[sel]
+        traffic = ~drives
+        has_traffic = bool(traffic.any())
+        if has_traffic:
+            self.x[sel] += np.where(traffic, dx, 0.0)
+            self.z[sel] += np.where(traffic, dz, 0.0)
+        # мир едет под самолётом игрока (перенос начала — уже внутри)
+        for i in np.flatnonzero(drives):
+            move_world(float(dx[i]), float(dz[i]))
+
+        # рельеф под каждым: игрок — в локальных, трафик — в абсолютных;
+        # трафик разбросан на километры — ему высоты прямо по шуму, без тайлов
+        px, pz = get_world_position()
+        ax = self.x[sel] + np.where(drives, px, 0.0)
+        az = self.z[sel] + np.where(drives, pz, 0.0)
+        ground = np.empty(len(ax))
+        if drives.any():
+            ground[drives] = terrain_height_absolute(ax[drives], az[drives])
+        if has_traffic:
+            ground[traffic] = terrain_height_noise(ax[traffic], az[traffic])
+        min_y = ground + MIN_ALT_ABOVE_GROUND
+        self.y[sel] = np.minimum(np.maximum(self.y[sel] + dy, min_y), MAX_ALTITUDE)
+
+        if has_traffic:
+            self._wrap(sel, traffic, px, pz)
+
+    def _wrap(self, sel, traffic: np.ndarray, px: float, pz: float) -> None:
+        """Трафик, вылетевший из квадрата вокруг игрока, — на другую сторону."""
+        size = 2.0 * FLEET_RADIUS
+        for name, center in (("x", px), ("z", pz)):
+            a = getattr(self, name)
+            values = a[sel]
+            wrapped = center + (values - center + FLEET_RADIUS) % size - FLEET_RADIUS
+            a[sel] = np.where(traffic, wrapped, values)
+
+
+# ============================================================
+#                      ТРАФИК ВОКРУГ ИГРОКА
+# ============================================================
+
+# флот, чей трафик рисуем без симуляции (benchmark.py шагает его сам)
+_live_fleet: Fleet | None = None
+
+# снимок, который рисуем (None — живой флот)
+_render_state: FleetState | None = None
+
+_program = None
+_failed = False
+
+
+def init_traffic(fleet: Fleet, count: int, seed: int = 77) -> np.ndarray:
+    """
+    Добавить во флот игрока count самолётов на автопилоте вокруг него
+    (детерминированно из seed). Возвращает их слоты.
+    """
+    global _live_fleet
+    _live_fleet = fleet
+    if count <= 0:
+        return np.zeros(0, dtype=np.intp)
+
+    rng = np.random.default_rng(seed)
+    px, pz = get_world_position()
+    turn = rng.uniform(-TRAFFIC_TURN_MAX, TRAFFIC_TURN_MAX, count)
+    return fleet.add(
+        count,
+        x=px + rng.uniform(-FLEET_RADIUS, FLEET_RADIUS, count),
+        z=pz + rng.uniform(-FLEET_RADIUS, FLEET_RADIUS, count),
+        y=rng.uniform(TRAFFIC_HEIGHT_MIN, TRAFFIC_HEIGHT_MAX, count),
+        yaw=rng.uniform(0.0, 360.0, count),
+        speed=rng.uniform(TRAFFIC_SPEED_MIN, TRAFFIC_SPEED_MAX, count),
+        turn_rate=turn,
+        # в вираж влево (yaw растёт) — крен на левое крыло
+        roll=np.clip(-3.0 * turn, -30.0, 30.0),
+        color=TRAFFIC_LIVERIES[rng.integers(0, len(TRAFFIC_LIVERIES), count)],
+    )
+
+
+def traffic_state(fleet: Fleet | None) -> FleetState:
+    """Копия поз трафика флота (без самолёта игрока), защищённая от записи."""
+    if fleet is None or len(fleet._traffic) == 0:
+        return _EMPTY_STATE
+    idx = fleet._traffic
+    arrays = [getattr(fleet, name)[idx] for name in ("x", "y", "z", "yaw", "pitch", "roll")]
+    arrays.append(fleet.color[idx])
+    for a in arrays:
+        a.flags.writeable = False
+    return FleetState(*arrays)
+
+
+def lerp_state(previous: FleetState, latest: FleetState, t: float) -> FleetState:
+    """
+    Поза трафика между двумя снимками. Самолёт, перепрыгнувший на другую
+    сторону квадрата, берём из последнего снимка (иначе он пролетел бы
+    через весь квадрат за кадр).
+    """
+    if previous is latest or len(previous.x) != len(latest.x):
+        return latest
+
+    def lerp(a, b):
+        return a + (b - a) * t
+
+    def lerp_angle(a, b):
+        return (a + ((b - a + 180.0) % 360.0 - 180.0) * t) % 360.0
+
+    jumped = (np.abs(latest.x - previous.x) > FLEET_RADIUS) | \
+             (np.abs(latest.z - previous.z) > FLEET_RADIUS)
+    return FleetState(
+        np.where(jumped, latest.x, lerp(previous.x, latest.x)),
+        lerp(previous.y, latest.y),
+        np.where(jumped, latest.z, lerp(previous.z, latest.z)),
+        lerp_angle(previous.yaw, latest.yaw),
+        lerp(previous.pitch, latest.pitch),
+        lerp(previous.roll, latest.roll),
+        latest.color,
+    )
+
+
+def set_render_state(state: FleetState | None) -> None:
+    """Что рисовать: снимок из потока симуляции или None — живой флот."""
+    global _render_state
+    _render_state = state
+
+
+def _drawn_state() -> FleetState:
+    if _render_state is not None:
+        return _render_state
+    return traffic_state(_live_fleet)
+
+
+def traffic_instances(frustum=None) -> np.ndarray:
+    """
+    Видимый трафик — экземпляры (N, 10) для инстансинга: локальные x, y, z,
+    масштаб, цвет, yaw/pitch/roll в радианах (instancing.INSTANCE_ROTATED_FLOATS).
+    """
+    state = _drawn_state()
+    ox, oz = get_render_origin()
+    wx, wz = get_render_offset()
+    xs = state.x - (ox + wx)
+    zs = state.z - (oz + wz)
+    ys = state.y
+
+    total = len(xs)
+    if frustum is not None and total:
+        visible = spheres_visible(frustum, xs, ys, zs, FLEET_CULL_RADIUS)
+        record("fleet", int(visible.sum()), total - int(visible.sum()))
+        xs, ys, zs = xs[visible], ys[visible], zs[visible]
+        state = FleetState(xs, ys, zs, state.yaw[visible], state.pitch[visible],
+                           state.roll[visible], state.color[visible])
+
+    instances = np.empty((len(xs), instancing.INSTANCE_ROTATED_FLOATS), dtype=np.float32)
+    instances[:, 0] = xs
+    instances[:, 1] = ys
+    instances[:, 2] = zs
+    instances[:, 3] = AIRPLANE_SCALE
+    instances[:, 4:7] = state.color
+    instances[:, 7] = np.radians(state.yaw)
+    instances[:, 8] = np.radians(state.pitch)
+    instances[:, 9] = np.radians(state.roll)
+    return instances
+
+
+def available() -> bool:
+    """Готов ли инстансинг трафика (при первом вызове собирает шейдер)."""
+    global _program, _failed
+
+    if _program is not None:
+        return True
+    if _failed or not instancing.available():
+        _failed = True
+        return False
+
+    try:
+        _program = create_program("fleet.vert", "instanced.frag", ATTRIB_LOCATIONS)
+    except (RuntimeError, GLError) as exc:
+        print(f"[fleet] инстансинг трафика отключён, рисуем по одному: {exc}")
+        _failed = True
+        return False
+    return True
+
+
+def _setup_material() -> None:
+    glstate.use_program(_program)
+    glstate.disable(GL_BLEND)
+
+
+render_queue.register_material("traffic", _setup_material)
+
+
+def _draw_instances(mesh: Mesh, instances: np.ndarray) -> None:
+    """Экземпляры одним draw call (программа трафика уже привязана)."""
+    mesh.bind_attribs()
+    instancing.bind_instances(instances)
+    mesh.draw_instanced(len(instances))
+    instancing.unbind_instances()
+    mesh.unbind_attribs()
+    glstate.invalidate_color()
+
+
+def _draw_one(mesh: Mesh, instance: list[float]) -> None:
+    """Один самолёт фиксированным конвейером (строка экземпляра (10,))."""
+    x, y, z, s, _, _, _, yaw, pitch, roll = instance
+    glPushMatrix()
+    glMultMatrixf(gl_matrix(translate(x, y, z)
+                            @ rotate_y(math.degrees(yaw))
+                            @ rotate_x(math.degrees(pitch))
+                            @ rotate_z(math.degrees(roll))
+                            @ scale(s, s, s)))
+    mesh.draw()
+    glPopMatrix()
+
+
+def submit_traffic(mesh: Mesh, frustum=None, eye=None) -> None:
+    """
+    Видимый трафик — в render_queue: одна пачка от ближних к дальним
+    (без инстансинга — по элементу "lit" на самолёт). eye — камера.
+    """
+    instances = traffic_instances(frustum)
+    if len(instances) == 0:
+        return
+
+    if available():
+        instances = render_queue.front_to_back(instances, eye)
+        render_queue.submit("traffic", render_queue.nearest_depth(instances, eye),
+                            _draw_instances, mesh, instances)
+        return
+
+    for instance in instances.tolist():
+        render_queue.submit("lit", render_queue.distance(eye, instance[0:3]),
+                            _draw_one, mesh, instance)
@@ -0,0 +1,45 @@
+#version 120
+
+// Трафик (fleet.py): как instanced.vert, но каждый экземпляр ещё и
+// повёрнут — yaw, pitch, roll в радианах, в том же порядке, что
+// Airplane.model_matrix(): rotate_y * rotate_x * rotate_z.
+
+attribute vec3 aPos;
+attribute vec3 aNormal;
+attribute vec3 aColor;
+
+// на экземпляр: (x, y, z, scale), цвет-множитель и (yaw, pitch, roll)
+attribute vec4 aInstance;
+attribute vec3 aInstanceColor;
+attribute vec3 aInstanceRotation;
+
+varying vec4 vColor;
+
+mat3 instanceRotation(vec3 angles)
+{
+    vec3 c = cos(angles);
+    vec3 s = sin(angles);
+    // mat3 собирается по столбцам
+    mat3 ry = mat3(c.x, 0.0, -s.x,  0.0, 1.0, 0.0,  s.x, 0.0, c.x);
+    mat3 rx = mat3(1.0, 0.0, 0.0,  0.0, c.y, s.y,  0.0, -s.y, c.y);
+    mat3 rz = mat3(c.z, s.z, 0.0,  -s.z, c.z, 0.0,  0.0, 0.0, 1.0);
+    return ry * rx * rz;
+}
+
+void main()
+{
+    mat3 rotation = instanceRotation(aInstanceRotation);
+    vec3 world = rotation * (aPos * aInstance.w) + aInstance.xyz;
+    vec4 eyePos = gl_ModelViewMatrix * vec4(world, 1.0);
+    vec3 normal = normalize(gl_NormalMatrix * (rotation * aNormal));
+
+    vec3 lightDir = normalize(gl_LightSource[0].position.xyz - eyePos.xyz);
+    float diff = max(dot(normal, lightDir), 0.0);
+
+    vec3 base = aColor * aInstanceColor;
+    vec3 ambient = base * (gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb);
+    vec3 diffuse = base * gl_LightSource[0].diffuse.rgb * diff;
+
+    vColor = vec4(ambient + diffuse, 1.0);
+    gl_Position = gl_ProjectionMatrix * eyePos;
+}
@@ -0,0 +1,63 @@
+# frustum.py
+"""
+Отсечение по пирамиде видимости (view frustum culling).
+
+- Плоскости пирамиды достаём прямо из матрицы projection @ view
+  (метод Gribb/Hartmann), нормали смотрят внутрь.
+- Проверка «сфера против пирамиды» векторная: сразу для всех объектов,
+  до любых вызовов OpenGL.
+- CULL_STATS хранит, сколько объектов в последнем кадре нарисовано и
+  сколько отброшено (по подсистемам) — чтобы было видно, что это работает.
+"""
+
+import numpy as np
+
+# подсистема -> (нарисовано, отброшено) за последний кадр
+CULL_STATS: dict[str, tuple[int, int]] = {}
+
+
+def frustum_planes(view_proj: np.ndarray) -> np.ndarray:
+    """
+    Шесть плоскостей (a, b, c, d): a*x + b*y + c*z + d >= 0 — внутри.
+    Порядок: left, right, bottom, top, near, far. Нормали единичные.
+    """
+    m = np.asarray(view_proj, dtype=np.float64)
+    planes = np.array([
+        m[3] + m[0],
+        m[3] - m[0],
+        m[3] + m[1],
+        m[3] - m[1],
+        m[3] + m[2],
+        m[3] - m[2],
+    ])
+    planes /= np.linalg.norm(planes[:, 0:3], axis=1)[:, None]
+    return planes
+
+
+def spheres_visible(
+    planes: np.ndarray,
+    xs: np.ndarray, ys: np.ndarray, zs: np.ndarray,
+    radii,
+) -> np.ndarray:
+    """
+    Маска сфер, которые хоть частично внутри пирамиды.
+    Сфера отброшена, если целиком лежит за любой из шести плоскостей.
+    """
+    dist = (np.outer(planes[:, 0], xs)
+            + np.outer(planes[:, 1], ys)
+            + np.outer(planes[:, 2], zs)
+            + planes[:, 3:4])
+    return np.all(dist >= -np.asarray(radii), axis=0)
+
+
+def record(name: str, drawn: int, culled: int) -> None:
+    """Запоминаем статистику отсечения подсистемы за этот кадр."""
+    CULL_STATS[name] = (int(drawn), int(culled))
+
+
+def format_cull_stats() -> str:
+    """Строка вида 'scenery 120/272, clouds 14/40' (нарисовано/всего)."""
+    return ", ".join(
+        f"{name} {drawn}/{drawn + culled}"
+        for name, (drawn, culled) in sorted(CULL_STATS.items())
+    )
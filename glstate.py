@@ -0,0 +1,201 @@
+# glstate.py
+"""
+Теневая копия состояния OpenGL: не дёргаем драйвер, если ничего не меняется.
+
+- Каждый вызов PyOpenGL — это заметный оверхед Python, а сцена каждый кадр
+  заново выставляет одно и то же (свет, цвет, blend, текстуры).
+- Здесь помним, что уже выставлено: glEnable/glDisable, glBlendFunc,
+  привязанные текстуры и программу, параметры света, текущий цвет,
+  цвет очистки. Повторный вызов с тем же значением пропускается.
+- STATS считает, сколько вызовов ушло в драйвер и сколько пропущено.
+- Всё, что меняет состояние в обход этого модуля, должно сбросить копию:
+  invalidate() целиком или invalidate_color() после отрисовки массивов
+  с цветом вершин (после неё текущий цвет GL не определён).
+- GL_POSITION света сюда не входит: она умножается на текущую modelview,
+  так что одно и то же значение при другой камере — другой свет.
+"""
+
+from OpenGL.GL import *
+
+# issued — ушло в драйвер, skipped — пропущено как лишнее
+STATS = {"issued": 0, "skipped": 0}
+
+# то же, но с начала кадра (take_frame_stats обнуляет)
+_frame_issued = 0
+_frame_skipped = 0
+
+_enabled: dict[int, bool] = {}
+_textures: dict[int, int] = {}
+_light: dict[tuple[int, int], tuple] = {}
+_light_model: dict[int, tuple] = {}
+_blend_func: tuple[int, int] | None = None
+_program: int | None = None
+_color: tuple | None = None
+_clear_color: tuple | None = None
+_color_material: tuple[int, int] | None = None
+_shade_model: int | None = None
+
+
+def _issued() -> None:
+    global _frame_issued
+    STATS["issued"] += 1
+    _frame_issued += 1
+
+
+def _skipped() -> None:
+    global _frame_skipped
+    STATS["skipped"] += 1
+    _frame_skipped += 1
+
+
+def invalidate() -> None:
+    """Забыть всё: следующее выставление каждого состояния уйдёт в драйвер."""
+    global _blend_func, _program, _color, _clear_color, _color_material, _shade_model
+    _enabled.clear()
+    _textures.clear()
+    _light.clear()
+    _light_model.clear()
+    _blend_func = None
+    _program = None
+    _color = None
+    _clear_color = None
+    _color_material = None
+    _shade_model = None
+
+
+def invalidate_color() -> None:
+    """Текущий цвет GL поменялся в обход кэша (массив цветов, glColor*)."""
+    global _color
+    _color = None
+
+
+def take_frame_stats() -> tuple[int, int]:
+    """(issued, skipped) с прошлого вызова — для HUD."""
+    global _frame_issued, _frame_skipped
+    result = (_frame_issued, _frame_skipped)
+    _frame_issued = _frame_skipped = 0
+    return result
+
+
+# --------- glEnable / glDisable ---------
+
+
+def enable(cap: int) -> None:
+    if _enabled.get(cap) is True:
+        _skipped()
+        return
+    glEnable(cap)
+    _enabled[cap] = True
+    _issued()
+
+
+def disable(cap: int) -> None:
+    if _enabled.get(cap) is False:
+        _skipped()
+        return
+    glDisable(cap)
+    _enabled[cap] = False
+    _issued()
+
+
+def set_enabled(cap: int, on: bool) -> None:
+    if on:
+        enable(cap)
+    else:
+        disable(cap)
+
+
+# --------- прочее состояние ---------
+
+
+def blend_func(sfactor: int, dfactor: int) -> None:
+    global _blend_func
+    if _blend_func == (sfactor, dfactor):
+        _skipped()
+        return
+    glBlendFunc(sfactor, dfactor)
+    _blend_func = (sfactor, dfactor)
+    _issued()
+
+
+def bind_texture(target: int, texture: int) -> None:
+    if _textures.get(target) == texture:
+        _skipped()
+        return
+    glBindTexture(target, texture)
+    _textures[target] = texture
+    _issued()
+
+
+def use_program(program: int) -> None:
+    global _program
+    if _program == program:
+        _skipped()
+        return
+    glUseProgram(program)
+    _program = program
+    _issued()
+
+
+def color(r: float, g: float, b: float, a: float = 1.0) -> None:
+    global _color
+    value = (r, g, b, a)
+    if _color == value:
+        _skipped()
+        return
+    glColor4f(r, g, b, a)
+    _color = value
+    _issued()
+
+
+def clear_color(r: float, g: float, b: float, a: float = 1.0) -> None:
+    global _clear_color
+    value = (r, g, b, a)
+    if _clear_color == value:
+        _skipped()
+        return
+    glClearColor(r, g, b, a)
+    _clear_color = value
+    _issued()
+
+
+def light(light_id: int, pname: int, values) -> None:
+    """glLightfv (кроме GL_POSITION — см. описание модуля)."""
+    value = tuple(values)
+    key = (light_id, pname)
+    if _light.get(key) == value:
+        _skipped()
+        return
+    glLightfv(light_id, pname, value)
+    _light[key] = value
+    _issued()
+
+
+def light_model(pname: int, values) -> None:
+    value = tuple(values)
+    if _light_model.get(pname) == value:
+        _skipped()
+        return
+    glLightModelfv(pname, value)
+    _light_model[pname] = value
+    _issued()
+
+
+def color_material(face: int, mode: int) -> None:
+    global _color_material
+    if _color_material == (face, mode):
+        _skipped()
+        return
+    glColorMaterial(face, mode)
+    _color_material = (face, mode)
+    _issued()
+
+
+def shade_model(mode: int) -> None:
+    global _shade_model
+    if _shade_model == mode:
+        _skipped()
+        return
+    glShadeModel(mode)
+    _shade_model = mode
+    _issued()
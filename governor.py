@@ -0,0 +1,153 @@
+# governor.py
+"""
+Регулятор плотности мира: сколько деревьев, домов и облаков живёт —
+по измеренному времени кадра, а не по зашитым в init числам.
+
+- Плотность 1.0 — базовые счётчики (260 деревьев, 12 домов, 40 облаков
+  или что задано). Чтобы было куда расти, пулы scenery.py / clouds.py
+  создаются с запасом: pool_size() = базовый счётчик * MAX_DENSITY, а
+  живёт из них доля density / MAX_DENSITY (set_live_fraction). Мир из
+  клеток (--chunks) пулы не раздувает — ни деревьев, ни облаков, — и
+  плотность там не выше 1.0.
+- Раз в кадр frame_done(frame_ms): сглаженное время кадра против бюджета
+  1000 / TARGET_FPS. Выше бюджета * SHRINK_AT — плотность на шаг вниз,
+  ниже бюджета * GROW_AT — на шаг вверх, между — держим (гистерезис).
+- Время кадра — то же, что у dynres.py (dynres.frame_done: без ожидания
+  vsync). Первым отвечает разрешение: плотность снижаем, только когда
+  масштаб уже на минимуме, и растим, когда он вернулся к полному, —
+  иначе на одну перегрузку сжимались бы оба.
+- Новую плотность frame_done() не ставит сам, а возвращает: main.py
+  отдаёт её симуляции действием "density" (как рули), та применяет её
+  тиком (apply_density) и пишет в запись полёта. Воспроизведение
+  получает плотность из записи, регулятор там не рулит (start(steer=False)).
+- Новая плотность доходит до экрана через беговую дорожку: объекты
+  умирают, уходя за спину, и оживают по нескольку за тик впереди.
+  Поэтому после шага ждём, пока живых станет почти столько, сколько
+  заказано (или SETTLE_MAX_FRAMES кадров, если самолёт стоит на месте).
+- STATS — заказанная и фактическая плотность, бюджет, время кадра, живые
+  объекты по видам: для HUD (main.py) и отчёта benchmark.py.
+"""
+
+import math
+
+import clouds
+import dynres
+import scenery
+
+# включается ключом --governor в main.py / benchmark.py
+ENABLED: bool = False
+TARGET_FPS = 60.0
+
+# границы и шаг плотности (доля базовых счётчиков)
+MIN_DENSITY = 0.25
+MAX_DENSITY = 2.0
+DENSITY_STEP = 0.125
+
+# гистерезис: доли бюджета кадра
+SHRINK_AT = 0.95
+GROW_AT = 0.7
+SMOOTHING = 0.05
+
+# после шага: ждём, пока фактическая плотность подойдёт к заказанной
+SETTLE_TOLERANCE = 0.5 * DENSITY_STEP
+SETTLE_MAX_FRAMES = 600
+
+STATS = {
+    "density": 1.0,         # заказанная плотность
+    "live_density": 1.0,    # фактическая: живых / базовый счётчик
+    "budget_ms": 1000.0 / TARGET_FPS,
+    "frame_ms": 0.0,
+    "trees": 0,
+    "houses": 0,
+    "clouds": 0,
+    "changes": 0,
+}
+
+# во сколько раз пулы больше базовых счётчиков (1.0 — мир из клеток,
+# пулы не раздуты); это же и потолок плотности
+_pool_factor = 1.0
+_settle = 0
+# False — плотность задаёт запись полёта, регулятор только считает STATS
+_steer = True
+
+
+def pool_size(count: int, pooled: bool) -> int:
+    """
+    Размер пула под базовый счётчик count: с запасом, если pooled
+    (регулятор включён и мир не из клеток; у записи — RecordingHeader.pooled).
+    """
+    return math.ceil(count * MAX_DENSITY) if pooled else count
+
+
+def start(pooled: bool, steer: bool = True) -> None:
+    """
+    Перед init_world, и с выключенным регулятором тоже: pooled — пулы
+    созданы с запасом, живёт их доля (1 / MAX_DENSITY при плотности 1.0).
+    steer = False — воспроизведение: плотность придёт из записи.
+    """
+    global _pool_factor, _settle, _steer
+
+    _pool_factor = MAX_DENSITY if pooled else 1.0
+    _settle = 0
+    _steer = steer
+    STATS.update(frame_ms=0.0, changes=0, budget_ms=1000.0 / TARGET_FPS, live_density=1.0)
+    apply_density(1.0)
+
+
+def apply_density(density: float) -> None:
+    """Поставить плотность (действие симуляции "density" или без симуляции)."""
+    STATS["density"] = density
+    scenery.set_live_fraction(density / _pool_factor)
+    clouds.set_live_fraction(density / _pool_factor)
+
+
+def frame_done(frame_ms: float) -> float | None:
+    """
+    Кадр закончен за frame_ms: обновить статистику. Возвращает новую
+    плотность, если её пора сменить (применяет её apply_density), иначе None.
+    """
+    global _settle
+
+    if not ENABLED:
+        return None
+
+    objects = scenery.live_counts()
+    sky = clouds.live_counts()
+    STATS.update(trees=objects["trees"], houses=objects["houses"], clouds=sky["clouds"])
+    live = objects["trees"] + objects["houses"] + sky["clouds"]
+    base = (objects["pool"] + sky["pool"]) / _pool_factor
+    STATS["live_density"] = live / max(base, 1.0)
+
+    if STATS["frame_ms"] == 0.0:
+        STATS["frame_ms"] = frame_ms
+    else:
+        STATS["frame_ms"] += (frame_ms - STATS["frame_ms"]) * SMOOTHING
+    if not _steer:
+        return None
+
+    density = STATS["density"]
+    if _settle > 0:
+        _settle -= 1
+        # беговая дорожка ещё не довела живых до заказанного
+        if abs(STATS["live_density"] - density) > SETTLE_TOLERANCE:
+            return None
+        _settle = 0
+
+    budget = 1000.0 / TARGET_FPS
+    STATS["budget_ms"] = budget
+    frame_ms = STATS["frame_ms"]
+    if frame_ms > budget * SHRINK_AT and not dynres.can_shrink():
+        wanted = density - DENSITY_STEP
+    elif frame_ms < budget * GROW_AT and not dynres.can_grow():
+        wanted = density + DENSITY_STEP
+    else:
+        return None
+    wanted = min(max(wanted, MIN_DENSITY), _pool_factor)
+    if wanted == density:
+        return None
+
+    # заказанная — сразу: следующие кадры сравнивают живых уже с ней
+    STATS["density"] = wanted
+    STATS["changes"] += 1
+    _settle = SETTLE_MAX_FRAMES
+    return wanted
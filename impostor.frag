@@ -0,0 +1,16 @@
+#version 120
+
+// В атласе — цвета без освещения; прозрачный фон отбрасываем.
+
+uniform sampler2D uAtlas;
+
+varying vec2 vTexCoord;
+varying vec3 vLight;
+
+void main()
+{
+    vec4 texel = texture2D(uAtlas, vTexCoord);
+    if (texel.a < 0.5)
+        discard;
+    gl_FragColor = vec4(min(texel.rgb * vLight, 1.0), 1.0);
+}
@@ -0,0 +1,40 @@
+#version 120
+
+// Импостор: квадрат с картинкой объекта из атласа, повёрнутый к камере
+// вокруг вертикальной оси (цилиндрический билборд) — каждый экземпляр
+// смотрит на камеру сам. Свет по вершинам, как в instanced.vert, но
+// нормаль одна на квадрат: к камере и чуть вверх (как у боков кроны).
+
+// угол квадрата: x в [-1, 1], y в [0, 1]
+attribute vec3 aPos;
+
+// на экземпляр: (x, y, z, scale) и цвет-множитель
+attribute vec4 aInstance;
+attribute vec3 aInstanceColor;
+
+uniform vec3 uEye;      // камера, локальные координаты
+uniform vec3 uShape;    // полуширина, низ, высота — в единицах scale
+uniform vec2 uCell;     // левый край клетки в атласе и её ширина (по u)
+
+varying vec2 vTexCoord;
+varying vec3 vLight;
+
+void main()
+{
+    vec2 toEye = uEye.xz - aInstance.xz;
+    float len = length(toEye);
+    vec2 dir = len > 1e-4 ? toEye / len : vec2(0.0, 1.0);
+    vec3 right = vec3(dir.y, 0.0, -dir.x);
+
+    vec3 offset = right * (aPos.x * uShape.x) + vec3(0.0, uShape.y + aPos.y * uShape.z, 0.0);
+    vec4 eyePos = gl_ModelViewMatrix * vec4(aInstance.xyz + offset * aInstance.w, 1.0);
+
+    vec3 normal = normalize(gl_NormalMatrix * normalize(vec3(dir.x, 0.3, dir.y)));
+    vec3 lightDir = normalize(gl_LightSource[0].position.xyz - eyePos.xyz);
+    float diff = max(dot(normal, lightDir), 0.0);
+
+    vLight = aInstanceColor * (gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb
+                               + gl_LightSource[0].diffuse.rgb * diff);
+    vTexCoord = vec2(uCell.x + (aPos.x * 0.5 + 0.5) * uCell.y, aPos.y);
+    gl_Position = gl_ProjectionMatrix * eyePos;
+}
@@ -0,0 +1,227 @@
+# impostors.py
+"""
+Импосторы: далёкий объект рисуется одним квадратом с его картинкой.
+
+- Картинки лежат в одном атласе (IMPOSTOR_SLOTS клеток IMPOSTOR_CELL x
+  IMPOSTOR_CELL в ряд). Клетка запекается один раз — на старте
+  (prepare(), см. scenery.init_impostors) или при первой отрисовке
+  меша: вид сбоку и чуть сверху (IMPOSTOR_PITCH), ортографическая проекция по габаритам меша, без
+  освещения (в атласе — чистые цвета вершин) и с прозрачным фоном.
+- Рисуем инстансингом (тот же поточный VBO экземпляров, что и в
+  instancing.py): один draw call на вид объектов. Квадрат каждого
+  экземпляра повёрнут к камере вокруг вертикали (impostor.vert), свет
+  считается в шейдере от GL_LIGHT0 — поэтому ночь и закат работают
+  без перезапекания.
+- Если инстансинг, FBO или шейдер недоступны, available() вернёт False
+  и вызывающий код рисует объект упрощённым мешем.
+- Материал "impostors" очереди render_queue: программа и атлас — один
+  раз на все пачки импосторов кадра.
+"""
+
+import math
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.error import GLError
+
+import glstate
+import instancing
+import render_queue
+from meshes import ATTRIB_LOCATIONS, VERTEX_FLOATS, Mesh, get_mesh
+from shader import create_program
+from transforms import gl_matrix, orthographic, rotate_x
+
+IMPOSTOR_CELL = 128
+IMPOSTOR_SLOTS = 4
+
+# с какой высоты (градусы над горизонтом) снимаем картинку — камера
+# по умолчанию смотрит сверху под 30°, и крыши должно быть видно
+IMPOSTOR_PITCH = 20.0
+
+# мелкие mip-уровни смешали бы соседние клетки — дальше 8x8 не уменьшаем
+_MAX_MIP_LEVEL = int(math.log2(IMPOSTOR_CELL)) - 3
+
+_program = None
+_uniforms: dict[str, int] = {}
+_atlas = None
+_fbo = None
+_depth_rb = None
+_failed = False
+
+# меш -> (номер клетки, (полуширина, низ, высота))
+_cells: dict[Mesh, tuple[int, tuple[float, float, float]]] = {}
+
+
+def _quad_geometry():
+    """Квадрат импостора: x в [-1, 1], y в [0, 1] (остальное — в шейдере)."""
+    vertices = np.zeros((4, VERTEX_FLOATS), dtype=np.float32)
+    vertices[:, 0:2] = ((-1.0, 0.0), (1.0, 0.0), (1.0, 1.0), (-1.0, 1.0))
+    vertices[:, 4] = 1.0
+    vertices[:, 6:9] = 1.0
+    indices = np.array((0, 1, 2, 0, 2, 3), dtype=np.uint32)
+    return vertices, indices
+
+
+def available() -> bool:
+    """Готовы ли импосторы (при первом вызове собирает шейдер и атлас)."""
+    global _program, _atlas, _fbo, _depth_rb, _failed
+
+    if _program is not None:
+        return True
+    if _failed:
+        return False
+
+    if not instancing.available() or not bool(glGenFramebuffers):
+        _failed = True
+        return False
+
+    try:
+        program = create_program("impostor.vert", "impostor.frag", ATTRIB_LOCATIONS)
+    except (RuntimeError, GLError) as exc:
+        print(f"[impostors] отключены, дальние объекты — упрощённым мешем: {exc}")
+        _failed = True
+        return False
+
+    for name in ("uEye", "uShape", "uCell", "uAtlas"):
+        _uniforms[name] = glGetUniformLocation(program, name)
+
+    width = IMPOSTOR_CELL * IMPOSTOR_SLOTS
+    _atlas = glGenTextures(1)
+    glstate.bind_texture(GL_TEXTURE_2D, _atlas)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, IMPOSTOR_CELL, 0,
+                 GL_RGBA, GL_UNSIGNED_BYTE, None)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, _MAX_MIP_LEVEL)
+
+    _depth_rb = glGenRenderbuffers(1)
+    glBindRenderbuffer(GL_RENDERBUFFER, _depth_rb)
+    glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, IMPOSTOR_CELL)
+    glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+    _fbo = glGenFramebuffers(1)
+    glBindFramebuffer(GL_FRAMEBUFFER, _fbo)
+    glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, _atlas, 0)
+    glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, _depth_rb)
+    status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+    if status == GL_FRAMEBUFFER_COMPLETE:
+        # весь атлас прозрачный, клетки дорисовываются по мере надобности;
+        # цвет очистки кадра возвращаем как был
+        clear_color = glGetFloatv(GL_COLOR_CLEAR_VALUE)
+        glstate.clear_color(0.0, 0.0, 0.0, 0.0)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glstate.clear_color(*[float(c) for c in clear_color])
+    glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    if status != GL_FRAMEBUFFER_COMPLETE:
+        print(f"[impostors] отключены: FBO атласа неполный (0x{int(status):x})")
+        glDeleteFramebuffers(1, [_fbo])
+        glDeleteRenderbuffers(1, [_depth_rb])
+        glDeleteTextures([_atlas])
+        _failed = True
+        return False
+
+    _program = program
+    return True
+
+
+def prepare(mesh: Mesh) -> tuple[int, tuple[float, float, float]]:
+    """Клетка меша в атласе (запекаем, если её ещё нет): (клетка, габариты)."""
+    cell = _cells.get(mesh)
+    if cell is None:
+        cell = _bake(mesh)
+    return cell
+
+
+def _bake(mesh: Mesh) -> tuple[int, tuple[float, float, float]]:
+    """Запекаем меш в свободную клетку атласа."""
+    slot = len(_cells)
+    if slot >= IMPOSTOR_SLOTS:
+        raise RuntimeError("в атласе импосторов нет свободных клеток")
+
+    # габариты: вокруг вертикали объект может повернуться любой стороной,
+    # а сверху его видно под IMPOSTOR_PITCH — по вертикали картинка выше
+    positions = mesh.vertices[:, 0:3]
+    half_width = float(np.hypot(positions[:, 0], positions[:, 2]).max())
+    cos_p = math.cos(math.radians(IMPOSTOR_PITCH))
+    sin_p = math.sin(math.radians(IMPOSTOR_PITCH))
+    low = float(positions[:, 1].min()) * cos_p - half_width * sin_p
+    high = float(positions[:, 1].max()) * cos_p + half_width * sin_p
+    depth = half_width + float(np.abs(positions[:, 1]).max()) + 1.0
+
+    # квадрат импостора вертикальный: под тем же углом он сожмётся в cos_p
+    shape = (half_width, low / cos_p, (high - low) / cos_p)
+
+    viewport = glGetIntegerv(GL_VIEWPORT)
+    framebuffer = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+    glBindFramebuffer(GL_FRAMEBUFFER, _fbo)
+    glViewport(slot * IMPOSTOR_CELL, 0, IMPOSTOR_CELL, IMPOSTOR_CELL)
+
+    glMatrixMode(GL_PROJECTION)
+    glPushMatrix()
+    glLoadMatrixf(gl_matrix(orthographic(-half_width, half_width, low, high, -depth, depth)))
+    glMatrixMode(GL_MODELVIEW)
+    glPushMatrix()
+    glLoadMatrixf(gl_matrix(rotate_x(IMPOSTOR_PITCH)))
+
+    # в атлас — чистые цвета: свет добавит шейдер импостора
+    glstate.use_program(0)
+    glstate.disable(GL_LIGHTING)
+    glstate.disable(GL_TEXTURE_2D)
+    glstate.disable(GL_BLEND)
+    mesh.draw()
+
+    glMatrixMode(GL_PROJECTION)
+    glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
+    glPopMatrix()
+
+    glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+    glViewport(*viewport)
+
+    glstate.bind_texture(GL_TEXTURE_2D, _atlas)
+    glGenerateMipmap(GL_TEXTURE_2D)
+
+    _cells[mesh] = (slot, shape)
+    return slot, shape
+
+
+def draw_impostors(mesh: Mesh, instances: np.ndarray, eye) -> None:
+    """
+    Все экземпляры instances (формат instancing.make_instances) — квадратами
+    с картинкой mesh, одним draw call. eye — позиция камеры (локальная).
+    Программа остаётся привязанной, как в instancing.draw_instanced.
+    """
+    count = len(instances)
+    if count == 0:
+        return
+
+    slot, shape = prepare(mesh)
+
+    glstate.use_program(_program)
+    glstate.bind_texture(GL_TEXTURE_2D, _atlas)
+    glUniform3f(_uniforms["uEye"], *eye)
+    glUniform3f(_uniforms["uShape"], *shape)
+    glUniform2f(_uniforms["uCell"], slot / IMPOSTOR_SLOTS, 1.0 / IMPOSTOR_SLOTS)
+    glUniform1i(_uniforms["uAtlas"], 0)
+
+    quad = get_mesh("impostor_quad", _quad_geometry)
+    quad.bind_attribs()
+    instancing.bind_instances(instances)
+
+    quad.draw_instanced(count)
+
+    instancing.unbind_instances()
+    quad.unbind_attribs()
+    glstate.invalidate_color()
+
+
+def _setup_material() -> None:
+    glstate.use_program(_program)
+    glstate.bind_texture(GL_TEXTURE_2D, _atlas)
+    glstate.disable(GL_BLEND)
+
+
+render_queue.register_material("impostors", _setup_material)
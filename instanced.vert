@@ -0,0 +1,31 @@
+#version 120
+
+// Инстансинг поверх фиксированного конвейера: матрицы и GL_LIGHT0
+// берём из встроенных gl_* переменных, поэтому освещение совпадает
+// с immediate-mode отрисовкой (свет по вершинам, как GL_SMOOTH).
+
+attribute vec3 aPos;
+attribute vec3 aNormal;
+attribute vec3 aColor;
+
+// на экземпляр: (x, y, z, scale) и цвет-множитель
+attribute vec4 aInstance;
+attribute vec3 aInstanceColor;
+
+varying vec4 vColor;
+
+void main()
+{
+    vec4 eyePos = gl_ModelViewMatrix * vec4(aPos * aInstance.w + aInstance.xyz, 1.0);
+    vec3 normal = normalize(gl_NormalMatrix * aNormal);
+
+    vec3 lightDir = normalize(gl_LightSource[0].position.xyz - eyePos.xyz);
+    float diff = max(dot(normal, lightDir), 0.0);
+
+    vec3 base = aColor * aInstanceColor;
+    vec3 ambient = base * (gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb);
+    vec3 diffuse = base * gl_LightSource[0].diffuse.rgb * diff;
+
+    vColor = vec4(ambient + diffuse, 1.0);
+    gl_Position = gl_ProjectionMatrix * eyePos;
+}
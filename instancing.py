@@ -0,0 +1,151 @@
+# instancing.py
+"""
+Аппаратный инстансинг: много одинаковых объектов за один draw call.
+
+- Один шейдер (instanced.vert / instanced.frag) на все инстансные меши.
+- Данные экземпляров — float32 массив (N, 7): x, y, z, scale, r, g, b.
+  Повёрнутые экземпляры (трафик, fleet.py) — (N, 10): ещё yaw, pitch,
+  roll в радианах.
+  Каждый кадр заливаются в поточный VBO; перед записью буфер
+  «осиротняем» (glBufferData с None), чтобы не ждать, пока GPU
+  дочитает прошлый кадр.
+- Если шейдер не собрался или драйвер не умеет инстансинг,
+  available() вернёт False, и вызывающий код рисует по-старому.
+- Материал "instanced" очереди render_queue: пачки draw_instanced
+  подряд, с одной привязкой программы.
+"""
+
+import ctypes
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.error import GLError
+
+import glstate
+import render_queue
+from meshes import (
+    ATTRIB_INSTANCE,
+    ATTRIB_INSTANCE_COLOR,
+    ATTRIB_INSTANCE_ROTATION,
+    ATTRIB_LOCATIONS,
+    Mesh,
+)
+from shader import create_program
+
+INSTANCE_FLOATS = 7
+INSTANCE_STRIDE = INSTANCE_FLOATS * 4
+INSTANCE_ROTATED_FLOATS = 10
+
+_program = None
+_instance_vbo = None
+_failed = False
+
+
+def available() -> bool:
+    """Готов ли инстансинг (при первом вызове собирает шейдер)."""
+    global _program, _failed
+
+    if _program is not None:
+        return True
+    if _failed:
+        return False
+
+    if not (bool(glDrawElementsInstanced) and bool(glVertexAttribDivisor)):
+        _failed = True
+        return False
+
+    try:
+        _program = create_program("instanced.vert", "instanced.frag", ATTRIB_LOCATIONS)
+    except (RuntimeError, GLError) as exc:
+        print(f"[instancing] отключён, рисуем по-старому: {exc}")
+        _failed = True
+        return False
+
+    return True
+
+
+def make_instances(
+    xs: np.ndarray, ys: np.ndarray, zs: np.ndarray,
+    scales: np.ndarray,
+    color: tuple[float, float, float] = (1.0, 1.0, 1.0),
+) -> np.ndarray:
+    """Собираем массив экземпляров (N, 7) из отдельных столбцов."""
+    instances = np.empty((len(xs), INSTANCE_FLOATS), dtype=np.float32)
+    instances[:, 0] = xs
+    instances[:, 1] = ys
+    instances[:, 2] = zs
+    instances[:, 3] = scales
+    instances[:, 4:7] = color
+    return instances
+
+
+def bind_instances(instances: np.ndarray) -> None:
+    """
+    Заливаем экземпляры в поточный VBO и подключаем их к атрибутам 3 и 4
+    (divisor = 1: одно значение на экземпляр, а не на вершину); у
+    повёрнутых экземпляров (N, 10) — ещё и к атрибуту 5.
+    """
+    global _instance_vbo
+
+    rotated = instances.shape[1] == INSTANCE_ROTATED_FLOATS
+    stride = instances.shape[1] * 4
+
+    if _instance_vbo is None:
+        _instance_vbo = glGenBuffers(1)
+
+    glBindBuffer(GL_ARRAY_BUFFER, _instance_vbo)
+    glBufferData(GL_ARRAY_BUFFER, instances.nbytes, None, GL_STREAM_DRAW)
+    glBufferSubData(GL_ARRAY_BUFFER, 0, instances.nbytes, instances)
+
+    glEnableVertexAttribArray(ATTRIB_INSTANCE)
+    glVertexAttribPointer(ATTRIB_INSTANCE, 4, GL_FLOAT, GL_FALSE,
+                          stride, ctypes.c_void_p(0))
+    glVertexAttribDivisor(ATTRIB_INSTANCE, 1)
+
+    glEnableVertexAttribArray(ATTRIB_INSTANCE_COLOR)
+    glVertexAttribPointer(ATTRIB_INSTANCE_COLOR, 3, GL_FLOAT, GL_FALSE,
+                          stride, ctypes.c_void_p(16))
+    glVertexAttribDivisor(ATTRIB_INSTANCE_COLOR, 1)
+
+    if rotated:
+        glEnableVertexAttribArray(ATTRIB_INSTANCE_ROTATION)
+        glVertexAttribPointer(ATTRIB_INSTANCE_ROTATION, 3, GL_FLOAT, GL_FALSE,
+                              stride, ctypes.c_void_p(28))
+        glVertexAttribDivisor(ATTRIB_INSTANCE_ROTATION, 1)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+
+def unbind_instances() -> None:
+    for loc in (ATTRIB_INSTANCE, ATTRIB_INSTANCE_COLOR, ATTRIB_INSTANCE_ROTATION):
+        glVertexAttribDivisor(loc, 0)
+        glDisableVertexAttribArray(loc)
+
+
+def draw_instanced(mesh: Mesh, instances: np.ndarray) -> None:
+    """
+    Рисуем mesh во всех позициях instances одним glDrawElementsInstanced.
+    Программа остаётся привязанной (следующая пачка её не перепривязывает),
+    вернуть фиксированный конвейер — glstate.use_program(0).
+    """
+    count = len(instances)
+    if count == 0:
+        return
+
+    glstate.use_program(_program)
+    mesh.bind_attribs()
+    bind_instances(instances)
+
+    mesh.draw_instanced(count)
+
+    unbind_instances()
+    mesh.unbind_attribs()
+    # на части драйверов атрибуты 3/4 совпадают с gl_Color и т.п.
+    glstate.invalidate_color()
+
+
+def _setup_material() -> None:
+    glstate.use_program(_program)
+    glstate.disable(GL_BLEND)
+
+
+render_queue.register_material("instanced", _setup_material)
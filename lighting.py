@@ -1,7 +1,10 @@
 # lighting.py
+import numpy as np
 from OpenGL.GL import *
-from OpenGL.GLU import *
-from OpenGL.GLUT import *
+
+import glstate
+import render_queue
+from frustum import record, spheres_visible
 
 # 0 - полдень, 1 - восход, 2 - закат, 3 - ночь
 time_of_day: int = 0
@@ -9,6 +12,40 @@ time_of_day: int = 0
 # Позиция солнца / луны (источник света)
 SUN_POS = [0.0, 300.0, 0.0]
 
+# Пресеты по времени суток:
+# (позиция светила, ambient, diffuse, specular, цвет фона)
+LIGHT_PRESETS = (
+    # 0 — полдень: высокое яркое солнце
+    ((0.0, 300.0, 0.0),
+     (0.30, 0.30, 0.35, 1.0), (1.0, 1.0, 0.95, 1.0), (0.8, 0.8, 0.7, 1.0),
+     (0.47, 0.73, 1.0, 1.0)),
+    # 1 — восход: солнце ниже, тёплый свет
+    ((-250.0, 180.0, 160.0),
+     (0.25, 0.18, 0.18, 1.0), (1.0, 0.7, 0.4, 1.0), (0.9, 0.8, 0.6, 1.0),
+     (0.90, 0.60, 0.40, 1.0)),
+    # 2 — закат: с другой стороны, тоже низко
+    ((250.0, 180.0, -160.0),
+     (0.22, 0.16, 0.20, 1.0), (1.0, 0.6, 0.5, 1.0), (0.9, 0.7, 0.7, 1.0),
+     (0.85, 0.45, 0.50, 1.0)),
+    # 3 — ночь: луна высоко, холодный свет
+    ((0.0, 260.0, 0.0),
+     (0.06, 0.06, 0.12, 1.0), (0.30, 0.30, 0.55, 1.0), (0.50, 0.50, 0.80, 1.0),
+     (0.02, 0.02, 0.07, 1.0)),
+)
+
+# Глобальный фоновый свет
+LIGHT_MODEL_AMBIENT = (0.15, 0.15, 0.20, 1.0)
+
+# Светило — плоский билборд, всегда повёрнутый к камере: диск радиуса
+# SUN_RADIUS и мягкое свечение вокруг (текстура с альфой, строится один раз)
+SUN_RADIUS = 10.0
+SUN_GLOW_SCALE = 2.2     # половина стороны квадрата = SUN_RADIUS * SUN_GLOW_SCALE
+_glow_texture: int | None = None
+
+# Цвет самого светила
+SUN_COLOR = (1.0, 0.9, 0.4)
+MOON_COLOR = (0.9, 0.9, 1.0)
+
 
 def set_time_of_day(idx: int) -> None:
     """
@@ -19,12 +56,26 @@ def set_time_of_day(idx: int) -> None:
       3 — ночь
     Любое число за пределами 0..3 будет обрезано.
     """
-    global time_of_day
+    global time_of_day, SUN_POS
     if idx < 0:
         idx = 0
     if idx > 3:
         idx = 3
     time_of_day = idx
+    SUN_POS = list(LIGHT_PRESETS[idx][0])
+
+
+def get_light_params():
+    """
+    Параметры света для текущего времени суток, без вызовов OpenGL:
+    (позиция светила, ambient, diffuse, specular, цвет фона).
+    """
+    return LIGHT_PRESETS[time_of_day]
+
+
+def get_light_body_color() -> tuple[float, float, float]:
+    """Цвет самого светила: ночью — луна, иначе — солнце."""
+    return MOON_COLOR if time_of_day == 3 else SUN_COLOR
 
 
 def get_sun_position() -> tuple[float, float, float]:
@@ -38,57 +89,37 @@ def setup_lighting() -> None:
     """
     Настраиваем GL_LIGHT0 как солнце/луну + фон по текущему времени суток.
     Вызывать минимум один раз при инициализации и затем каждый кадр (на случай,
-    если время суток поменялось).
+    если время суток поменялось). Всё идёт через glstate: если время суток
+    то же, в драйвер не уходит ни одного вызова.
+    Позицию света ставит apply_light_position() — после камеры.
     """
-    global time_of_day, SUN_POS
+    global SUN_POS
 
-    glEnable(GL_LIGHTING)
-    glEnable(GL_LIGHT0)
-    glEnable(GL_COLOR_MATERIAL)
-
-    glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
-    glShadeModel(GL_SMOOTH)
-
-    if time_of_day == 0:
-        # Полдень — высокое яркое солнце
-        SUN_POS = [0.0, 300.0, 0.0]
-        ambient = (0.30, 0.30, 0.35, 1.0)
-        diffuse = (1.0, 1.0, 0.95, 1.0)
-        specular = (0.8, 0.8, 0.7, 1.0)
-        glClearColor(0.47, 0.73, 1.0, 1.0)
-
-    elif time_of_day == 1:
-        # Восход — солнце ниже, тёплый свет
-        SUN_POS = [-250.0, 180.0, 160.0]
-        ambient = (0.25, 0.18, 0.18, 1.0)
-        diffuse = (1.0, 0.7, 0.4, 1.0)
-        specular = (0.9, 0.8, 0.6, 1.0)
-        glClearColor(0.90, 0.60, 0.40, 1.0)
-
-    elif time_of_day == 2:
-        # Закат — с другой стороны, тоже низко
-        SUN_POS = [250.0, 180.0, -160.0]
-        ambient = (0.22, 0.16, 0.20, 1.0)
-        diffuse = (1.0, 0.6, 0.5, 1.0)
-        specular = (0.9, 0.7, 0.7, 1.0)
-        glClearColor(0.85, 0.45, 0.50, 1.0)
+    glstate.enable(GL_LIGHTING)
+    glstate.enable(GL_LIGHT0)
+    glstate.enable(GL_COLOR_MATERIAL)
 
-    else:
-        # Ночь — луна высоко, холодный свет
-        SUN_POS = [0.0, 260.0, 0.0]
-        ambient = (0.06, 0.06, 0.12, 1.0)
-        diffuse = (0.30, 0.30, 0.55, 1.0)
-        specular = (0.50, 0.50, 0.80, 1.0)
-        glClearColor(0.02, 0.02, 0.07, 1.0)
-
-    light_pos = (SUN_POS[0], SUN_POS[1], SUN_POS[2], 1.0)
-    glLightfv(GL_LIGHT0, GL_POSITION, light_pos)
-    glLightfv(GL_LIGHT0, GL_AMBIENT, ambient)
-    glLightfv(GL_LIGHT0, GL_DIFFUSE, diffuse)
-    glLightfv(GL_LIGHT0, GL_SPECULAR, specular)
+    glstate.color_material(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
+    glstate.shade_model(GL_SMOOTH)
+
+    sun_pos, ambient, diffuse, specular, clear_color = get_light_params()
+    SUN_POS = list(sun_pos)
+    glstate.clear_color(*clear_color)
+
+    glstate.light(GL_LIGHT0, GL_AMBIENT, ambient)
+    glstate.light(GL_LIGHT0, GL_DIFFUSE, diffuse)
+    glstate.light(GL_LIGHT0, GL_SPECULAR, specular)
 
     # Глобальный фоновый свет
-    glLightModelfv(GL_LIGHT_MODEL_AMBIENT, (0.15, 0.15, 0.20, 1.0))
+    glstate.light_model(GL_LIGHT_MODEL_AMBIENT, LIGHT_MODEL_AMBIENT)
+
+
+def apply_light_position() -> None:
+    """
+    Позиция GL_LIGHT0 в мировых координатах. OpenGL умножает её на текущую
+    modelview, поэтому вызывать каждый кадр сразу после camera.apply().
+    """
+    glLightfv(GL_LIGHT0, GL_POSITION, (SUN_POS[0], SUN_POS[1], SUN_POS[2], 1.0))
 
 
 def init_lighting() -> None:
@@ -99,28 +130,111 @@ def init_lighting() -> None:
     setup_lighting()
 
 
-def draw_sun_or_moon() -> None:
+def _create_glow_texture(size: int = 64) -> int:
     """
-    Рисуем светило:
-      - днём/закат/восход — жёлтоватое солнце;
-      - ночью — белёсая луна.
+    Белая текстура светила: непрозрачный диск с мягким краем и свечение,
+    затухающее к краю квадрата. Цвет даёт glColor (GL_MODULATE).
     """
-    global SUN_POS, time_of_day
+    coords = (np.arange(size) + 0.5) / size * 2.0 - 1.0
+    r = np.hypot(coords[:, None], coords[None, :])   # 0 в центре, 1 — край квадрата
+
+    disc_edge = 1.0 / SUN_GLOW_SCALE
+    disc = np.clip((disc_edge - r) * size * 0.5 + 0.5, 0.0, 1.0)   # ~1 пиксель сглаживания
+    glow = np.clip(1.0 - r, 0.0, 1.0) ** 2 * 0.6
+    alpha = np.maximum(disc, glow)
+
+    image = np.empty((size, size, 4), dtype=np.uint8)
+    image[..., 0:3] = 255
+    image[..., 3] = (alpha * 255.0).astype(np.uint8)
+
+    tex_id = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, tex_id)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, size, size, 0, GL_RGBA, GL_UNSIGNED_BYTE, image)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    return tex_id
+
+
+def sun_visible(frustum) -> bool:
+    """Попадает ли светило (вместе со свечением) в пирамиду видимости."""
+    if frustum is None:
+        return True
+    radius = SUN_RADIUS * SUN_GLOW_SCALE * 1.42   # описанная сфера квадрата
+    visible = bool(spheres_visible(
+        frustum, np.array([SUN_POS[0]]), np.array([SUN_POS[1]]), np.array([SUN_POS[2]]), radius
+    )[0])
+    record("sun", int(visible), int(not visible))
+    return visible
+
+
+def _sun_corners(camera) -> tuple:
+    """Углы квадрата светила, повёрнутого к камере (camera — для осей билборда)."""
+    # оси экрана в мировых координатах — первые две строки видовой матрицы
+    if camera is not None:
+        view = camera.view_matrix()
+        right = view[0, 0:3] * (SUN_RADIUS * SUN_GLOW_SCALE)
+        up = view[1, 0:3] * (SUN_RADIUS * SUN_GLOW_SCALE)
+    else:
+        right = np.array([SUN_RADIUS * SUN_GLOW_SCALE, 0.0, 0.0])
+        up = np.array([0.0, SUN_RADIUS * SUN_GLOW_SCALE, 0.0])
+    center = np.asarray(SUN_POS, dtype=np.float64)
+    return (center - right - up, center + right - up,
+            center + right + up, center - right + up)
 
-    glPushAttrib(GL_ENABLE_BIT | GL_CURRENT_BIT | GL_LIGHTING_BIT)
-    glDisable(GL_LIGHTING)
 
-    glPushMatrix()
-    glTranslatef(SUN_POS[0], SUN_POS[1], SUN_POS[2])
+def _setup_sun() -> None:
+    """Светило не освещается; состояние — через кэш, без glPushAttrib."""
+    global _glow_texture
 
-    if time_of_day == 3:
-        # ночь — луна
-        glColor3f(0.9, 0.9, 1.0)
-    else:
-        # солнце
-        glColor3f(1.0, 0.9, 0.4)
+    if _glow_texture is None:
+        _glow_texture = _create_glow_texture()
+
+    glstate.use_program(0)
+    glstate.disable(GL_LIGHTING)
+    glstate.enable(GL_TEXTURE_2D)
+    glstate.bind_texture(GL_TEXTURE_2D, _glow_texture)
+    glstate.enable(GL_BLEND)
+    glstate.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+
+def _draw_glow(corners) -> None:
+    # ночью — луна, иначе — солнце
+    glstate.color(*get_light_body_color())
 
-    glutSolidSphere(10.0, 24, 24)
-    glPopMatrix()
+    # свечение прозрачное: в буфер глубины не пишем, чтобы не резать облака
+    glDepthMask(GL_FALSE)
+    glBegin(GL_QUADS)
+    for (u, v), corner in zip(((0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)), corners):
+        glTexCoord2f(u, v)
+        glVertex3f(*corner)
+    glEnd()
+    glDepthMask(GL_TRUE)
 
-    glPopAttrib()
+
+def _setup_lit() -> None:
+    """Непрозрачное без текстуры со светом фиксированного конвейера (самолёт и т.п.)."""
+    glstate.use_program(0)
+    glstate.enable(GL_LIGHTING)
+    glstate.disable(GL_TEXTURE_2D)
+    glstate.disable(GL_BLEND)
+
+
+render_queue.register_material("lit", _setup_lit)
+render_queue.register_material("sun", _setup_sun, transparent=True)
+
+
+def submit_sun_or_moon(camera=None, frustum=None) -> None:
+    """
+    Светило — полупрозрачным элементом render_queue: днём, на закате и
+    восходе — желтоватое солнце, ночью — белёсая луна. Один
+    текстурированный квадрат лицом к камере (camera — для осей билборда);
+    вне пирамиды frustum не сдаём вообще.
+    """
+    if not sun_visible(frustum):
+        return
+    eye = camera.eye_position() if camera is not None else None
+    render_queue.submit("sun", render_queue.distance(eye, SUN_POS),
+                        _draw_glow, _sun_corners(camera))
@@ -1,27 +1,43 @@
 # main.py
+import math
+import time
+
+# отсюда считаем время до первого кадра: импорт OpenGL и NumPy — тоже старт
+startup_started_at = time.perf_counter()
+
+import sys
+
 from OpenGL.GL import *
-from OpenGL.GLU import *
 from OpenGL.GLUT import *
 
 from shader import create_program
 
 from camera import Camera
-from terrain import init_terrain, draw_terrain
-from scenery import (
-    init_scenery,
-    draw_scenery,
-    update_scenery,
-    # draw_scenery_shadows,  # если когда-нибудь вернёшь тени
-)
+from terrain import init_terrain, draw_ground_mesh, reset_world
+from scenery import init_scenery, init_impostors, submit_scenery
 from airplane import Airplane
 from lighting import (
     init_lighting,
     setup_lighting,
-    draw_sun_or_moon,
+    apply_light_position,
+    submit_sun_or_moon,
     set_time_of_day,
-    get_sun_position,
 )
-from clouds import init_clouds, update_clouds, draw_clouds
+from clouds import init_clouds, submit_clouds
+from fleet import init_traffic, submit_traffic
+from frustum import format_cull_stats
+from profiler import span
+import profiler
+from transforms import gl_matrix, perspective
+import capture
+import dynres
+import glstate
+import governor
+import recording
+import render_queue
+import renderer
+import shadows
+import simulation
 
 window_width = 1280
 window_height = 720
@@ -29,15 +45,54 @@ window_height = 720
 camera: Camera | None = None
 airplane: Airplane | None = None
 _last_time_ms: int = 0
-shader_program = None  # ID шейдерной программы (пока не используем в рендере)
+shader_program = None  # ID шейдерной программы (basic.vert / basic.frag), только в core profile
+
+# True — core profile 3.3 и renderer.py вместо фиксированного конвейера
+# (включается ключом --core в командной строке)
+use_core_profile: bool = False
+
+# True — детерминированный мир из клеток (ключ --chunks)
+use_chunk_streaming: bool = False
+
+# тени по карте глубины (фиксированный конвейер); выключаются ключом
+# --no-shadows или клавишей 'h', разрешение карты — --shadow-size
+use_shadows: bool = True
+shadow_map_size: int = shadows.SHADOW_MAP_SIZE
+
+# True — симуляция в своём потоке; False (ключ --sync-sim) — те же
+# фиксированные тики, но из idle()
+use_sim_thread: bool = True
+
+# воспроизведение записи (--replay файл): во сколько раз быстрее реального
+# времени (--replay-speed) и сколько реального времени уже проиграно
+replay_speed: float = 1.0
+_replay_time: float = 0.0
+
+# чем показывать готовый кадр; без окна (benchmark.py) — glFinish
+present_frame = glutSwapBuffers
+
+# куда клавиша 't' сохраняет trace последних кадров
+TRACE_PATH = "trace.json"
+
+# шаги запуска после первого кадра (см. init_world): idle() делает по
+# одному за вызов, а окно тем временем уже рисуется
+_startup_steps: list[tuple[str, object]] = []
+
+# когда начался текущий кадр (perf_counter) — время кадра для dynres.py и governor.py
+_frame_started: float = 0.0
+
+# от старта процесса (startup_started_at) до первого показанного кадра
+# и до конца отложенной инициализации, мс
+time_to_first_frame_ms: float | None = None
+time_to_ready_ms: float | None = None
 
 
 # ============================================================
 #                   ИНИЦИАЛИЗАЦИЯ OPENGL
 # ============================================================
 def init_gl():
-    glEnable(GL_DEPTH_TEST)
-    glDisable(GL_CULL_FACE)
+    glstate.enable(GL_DEPTH_TEST)
+    glstate.disable(GL_CULL_FACE)
 
     # солнце, луна, свет (пока через фиксированный конвейер)
     init_lighting()
@@ -47,11 +102,22 @@ def init_gl():
 #                      ОТРИСОВКА КАДРА
 # ============================================================
 def display():
+    global _frame_started
+    _frame_started = time.perf_counter()
+
+    if use_core_profile:
+        display_core()
+        return
+
+    # сцена — в FBO уменьшенного разрешения (если включено --dynres)
+    dynres.begin_frame()
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
     # обновляем свет под выбранный режим дня
     setup_lighting()
 
+    _present_simulation()
+
     yaw = 0.0
     if camera is not None and airplane is not None:
         ax, ay, az = airplane.get_position()
@@ -59,30 +125,158 @@ def display():
         yaw = airplane.yaw
 
     # применяем камеру
+    frustum = None
+    eye = None
     if camera is not None:
         camera.apply()
+        frustum = camera.frustum()
+        eye = camera.eye_position()
+
+    # позиция света — в мировых координатах, поэтому после камеры
+    apply_light_position()
 
-    # === земля ===
-    draw_terrain(yaw)
+    # === карты теней (перерисовываются, только если что-то поменялось) ===
+    if use_shadows:
+        with span("shadows"):
+            profiler.count("shadow.static", int(shadows.update_shadows(airplane, yaw)))
 
-    # === тени для деревьев (если когда-нибудь включишь) ===
-    # sun_pos = get_sun_position()
-    # draw_scenery_shadows(sun_pos)
+    # === земля: закрыта почти всем остальным — последней из непрозрачного ===
+    render_queue.submit("terrain", math.inf, _draw_ground, yaw)
 
     # === деревья и дома ===
-    draw_scenery()
+    with span("scenery"):
+        submit_scenery(frustum, eye)
 
     # === облака ===
-    draw_clouds()
+    with span("clouds"):
+        submit_clouds(frustum, eye)
 
     # === солнце / луна ===
-    draw_sun_or_moon()
+    with span("sun"):
+        submit_sun_or_moon(camera, frustum)
 
-    # === самолёт ===
+    # === самолёт и трафик вокруг ===
     if airplane is not None:
-        airplane.draw()
+        with span("fleet"):
+            submit_traffic(airplane.mesh, frustum, eye)
+        airplane.submit(eye)
+
+    # === всё сданное: по материалам, непрозрачное от ближних к дальним,
+    # полупрозрачное — от дальних к ближним (стадии "draw.<материал>") ===
+    render_queue.execute()
+    # HUD и следующий кадр — с фиксированного конвейера
+    glstate.use_program(0)
+    _count_queue()
+
+    # растягиваем сцену на окно; HUD — уже в полном разрешении
+    with span("upscale"):
+        dynres.end_frame()
 
-    glutSwapBuffers()
+    profiler.draw_hud(window_height)
+
+    _present()
+    _end_frame()
+    _mark_first_frame()
+
+
+def display_core():
+    """Тот же кадр, но через шейдеры basic.vert / basic.frag (core profile)."""
+    _present_simulation()
+
+    yaw = 0.0
+    if camera is not None and airplane is not None:
+        ax, ay, az = airplane.get_position()
+        camera.set_target(ax, ay + 15.0, az)
+        yaw = airplane.yaw
+
+    if camera is not None:
+        dynres.begin_frame()
+        with span("render"):
+            renderer.draw_frame(camera, airplane, yaw)
+        _count_queue()
+        with span("upscale"):
+            dynres.end_frame()
+
+    # в core profile нет растрового шрифта GLUT — HUD пишем в заголовок окна
+    if profiler.HUD_VISIBLE:
+        glutSetWindowTitle(" | ".join(profiler.hud_lines()[:4]).encode())
+
+    _present()
+    _end_frame()
+    _mark_first_frame()
+
+
+def _draw_ground(yaw: float) -> None:
+    """Элемент очереди "terrain": земля, с тенями — шейдером shadows.py."""
+    receiving = use_shadows and shadows.bind_receiver()
+    draw_ground_mesh(yaw)
+    if receiving:
+        shadows.unbind_receiver()
+
+
+def _count_queue():
+    """Сколько draw call'ов и переключений материала было в кадре."""
+    stats = render_queue.STATS
+    profiler.count("queue.draws", stats["draw_calls"])
+    profiler.count("queue.states", stats["state_changes"])
+
+
+def _present():
+    """Показать кадр; при записи (--capture) — прочитать его, не дожидаясь GPU."""
+    reading = capture.capturing()
+    if reading:
+        with span("capture.read"):
+            capture.read_frame(window_width, window_height)
+
+    # время кадра меряем до показа: ожидание vsync в него не входит
+    cpu_ms = dynres.frame_cost(_frame_started)
+    with span("present"):
+        present_frame()
+    # контроллеру разрешения (масштаб на следующий кадр), а то время, по
+    # которому он считал, — регулятору плотности
+    frame_ms = dynres.frame_done(cpu_ms)
+    if dynres.ENABLED:
+        profiler.count("dynres.scale_pct", round(dynres.STATS["scale"] * 100))
+    # пока мир строится, время кадра о плотности ничего не говорит
+    if frame_ms is not None and not _startup_steps:
+        density = governor.frame_done(frame_ms)
+        if density is not None:
+            _set_density(density)
+    if governor.ENABLED:
+        profiler.count("density_pct", round(governor.STATS["density"] * 100))
+        profiler.count("live_density_pct", round(governor.STATS["live_density"] * 100))
+
+    if reading:
+        with span("capture.collect"):
+            capture.collect_frames()
+        profiler.count("capture.dropped", capture.STATS["dropped"])
+
+
+def _mark_first_frame():
+    """Запоминаем, когда первый кадр ушёл на экран."""
+    global time_to_first_frame_ms
+    if time_to_first_frame_ms is None:
+        time_to_first_frame_ms = (time.perf_counter() - startup_started_at) * 1000.0
+
+
+def _end_frame():
+    """Закрыть кадр профайлера (вместе со счётчиками вызовов GL)."""
+    issued, skipped = glstate.take_frame_stats()
+    profiler.count("gl.issued", issued)
+    profiler.count("gl.skipped", skipped)
+    profiler.end_frame()
+
+
+def _present_simulation():
+    """Рисуем интерполяцию двух последних тиков симуляции (если она есть)."""
+    if airplane is None or not simulation.active():
+        return
+    simulation.present(airplane)
+    stats = simulation.SIM_STATS
+    profiler.count("sim.ticks", stats["ticks"])
+    profiler.count("sim.dropped", stats["dropped"])
+    profiler.count("sim.tick_us", stats["tick_ms"] * 1000.0)
+    profiler.count("sim.contacts", stats["contacts"])
 
 
 # ============================================================
@@ -94,10 +288,22 @@ def reshape(w, h):
     window_height = max(1, h)
 
     glViewport(0, 0, window_width, window_height)
+    # FBO динамического разрешения — под новый размер окна
+    dynres.resize(window_width, window_height)
+
+    aspect = float(window_width) / float(window_height)
+    if camera is not None:
+        camera.set_aspect(aspect)
+        projection = camera.projection_matrix()
+    else:
+        projection = perspective(60.0, aspect, 0.1, 5000.0)
+
+    # в core profile матрицы уходят в шейдер, стека матриц нет
+    if use_core_profile:
+        return
 
     glMatrixMode(GL_PROJECTION)
-    glLoadIdentity()
-    gluPerspective(60.0, float(window_width) / float(window_height), 0.1, 5000.0)
+    glLoadMatrixf(gl_matrix(projection))
 
     glMatrixMode(GL_MODELVIEW)
     glLoadIdentity()
@@ -113,24 +319,46 @@ def special_keys(key, x, y):
         return
 
     if key == GLUT_KEY_LEFT:
-        camera.orbit(-3.0, 0.0)
+        _view("orbit_yaw", -3.0)
     elif key == GLUT_KEY_RIGHT:
-        camera.orbit(3.0, 0.0)
+        _view("orbit_yaw", 3.0)
     elif key == GLUT_KEY_UP:
-        camera.orbit(0.0, 3.0)
+        _view("orbit_pitch", 3.0)
     elif key == GLUT_KEY_DOWN:
-        camera.orbit(0.0, -3.0)
+        _view("orbit_pitch", -3.0)
     elif key == GLUT_KEY_PAGE_UP:
-        camera.zoom(-5.0)
+        _view("zoom", -5.0)
     elif key == GLUT_KEY_PAGE_DOWN:
-        camera.zoom(5.0)
+        _view("zoom", 5.0)
+
+
+def _view(action: str, value: float):
+    """Камера и время суток: пишем в запись полёта и применяем."""
+    if recording.replaying():
+        return
+    recording.record_event(simulation.current_tick(), action, value)
+    apply_view_event(action, value)
+
+
+def apply_view_event(action: str, value: float):
+    """Событие вида — из клавиатуры или из воспроизводимой записи."""
+    if action == "time_of_day":
+        set_time_of_day(int(value))
+    elif camera is None:
+        return
+    elif action == "orbit_yaw":
+        camera.orbit(value, 0.0)
+    elif action == "orbit_pitch":
+        camera.orbit(0.0, value)
+    elif action == "zoom":
+        camera.zoom(value)
 
 
 # ============================================================
 #               УПРАВЛЕНИЕ САМОЛЁТОМ (WASD)
 # ============================================================
 def keyboard(key, x, y):
-    global airplane, camera
+    global airplane, camera, use_shadows
 
     # ESC — выход
     if key == b'\x1b':
@@ -139,16 +367,40 @@ def keyboard(key, x, y):
 
     # время суток
     if key == b'1':
-        set_time_of_day(0)  # полдень
+        _view("time_of_day", 0)  # полдень
         return
     elif key == b'2':
-        set_time_of_day(1)  # восход
+        _view("time_of_day", 1)  # восход
         return
     elif key == b'3':
-        set_time_of_day(2)  # закат
+        _view("time_of_day", 2)  # закат
         return
     elif key == b'4':
-        set_time_of_day(3)  # ночь
+        _view("time_of_day", 3)  # ночь
+        return
+
+    # статистика отсечения по пирамиде видимости (нарисовано/всего)
+    if key in (b'i', b'I'):
+        print("culling:", format_cull_stats())
+        return
+
+    # HUD профайлера (FPS, мс по стадиям) и сохранение trace
+    if key in (b'p', b'P'):
+        profiler.toggle_hud()
+        return
+    if key in (b't', b'T'):
+        frames = profiler.dump_trace(TRACE_PATH)
+        print(f"trace: {frames} кадров -> {TRACE_PATH}")
+        return
+
+    # тени вкл/выкл
+    if key in (b'h', b'H'):
+        use_shadows = not use_shadows
+        return
+
+    # динамическое разрешение вкл/выкл
+    if key in (b'r', b'R'):
+        dynres.ENABLED = not dynres.ENABLED
         return
 
     if airplane is None:
@@ -156,41 +408,58 @@ def keyboard(key, x, y):
 
     # === управление самолётом ===
     if key in (b'a', b'A'):
-        airplane.change_yaw(3.0)        # влево
+        _steer("yaw", 3.0)              # влево
     elif key in (b'd', b'D'):
-        airplane.change_yaw(-3.0)       # вправо
+        _steer("yaw", -3.0)             # вправо
     elif key in (b'w', b'W'):
-        airplane.change_pitch(3.0)      # нос вверх
+        _steer("pitch", 3.0)            # нос вверх
     elif key in (b's', b'S'):
-        airplane.change_pitch(-3.0)     # нос вниз
+        _steer("pitch", -3.0)           # нос вниз
     elif key in (b'q', b'Q'):
-        airplane.change_roll(3.0)
+        _steer("roll", 3.0)
     elif key in (b'e', b'E'):
-        airplane.change_roll(-3.0)
+        _steer("roll", -3.0)
 
     elif key in (b'+', b'='):
         # скорость + (ускоряемся)
-        airplane.change_speed(5.0)
+        _steer("speed", 5.0)
         # одновременно приближаем камеру
-        if camera is not None:
-            camera.zoom(-5.0)
+        _view("zoom", -5.0)
 
     elif key in (b'-', b'_'):
         # скорость - (замедляемся)
-        airplane.change_speed(-5.0)
+        _steer("speed", -5.0)
         # отдаляем камеру
-        if camera is not None:
-            camera.zoom(5.0)
+        _view("zoom", 5.0)
 
     elif key == b' ':
-        airplane.reset_orientation()
+        _steer("reset")
+
+
+def _steer(action: str, value: float = 0.0):
+    """Рули самолёта: через очередь симуляции, если она запущена."""
+    # пока мир не достроен, симуляции ещё нет — рули не трогаем
+    if recording.replaying() or _startup_steps:
+        return
+    if simulation.active():
+        simulation.post_input(action, value)
+    elif airplane is not None:
+        simulation.apply_input(airplane, action, value)
+
+
+def _set_density(density: float):
+    """Плотность мира от governor.py: тиком симуляции — так она попадает в запись."""
+    if simulation.active():
+        simulation.post_input("density", density)
+    else:
+        governor.apply_density(density)
 
 
 # ============================================================
 #                    ОБНОВЛЕНИЕ ЛОГИКИ
 # ============================================================
 def idle():
-    global _last_time_ms, airplane
+    global _last_time_ms, _replay_time, airplane
 
     now = glutGet(GLUT_ELAPSED_TIME)
     if _last_time_ms == 0:
@@ -199,26 +468,55 @@ def idle():
         dt = (now - _last_time_ms) / 1000.0
     _last_time_ms = now
 
-    if airplane is not None:
-        airplane.update(dt)
-        update_scenery(airplane.yaw)
-        update_clouds(airplane.yaw)
+    # сначала первый кадр, потом по одному шагу отложенного запуска
+    if _startup_steps:
+        if time_to_first_frame_ms is not None:
+            _run_startup_step()
+        glutPostRedisplay()
+        return
+
+    if recording.replaying():
+        _replay_time += dt * replay_speed
+        _idle_replay()
+    # в своём потоке симуляция тикает сама; иначе — фиксированные тики отсюда
+    elif airplane is not None and not simulation.running():
+        with span("update"):
+            simulation.advance_simulation(dt)
 
     glutPostRedisplay()
 
 
+def _idle_replay():
+    """Догоняем запись до _replay_time; в конце сверяем мир и выходим."""
+    due = int(_replay_time * simulation.SIM_RATE) - simulation.current_tick()
+    with span("update"):
+        for action, value in recording.replay_ticks(max(0, due)):
+            apply_view_event(action, value)
+
+    if recording.replay_done():
+        verdict = "совпадает" if recording.replay_matches() else "НЕ совпадает"
+        print(f"replay: {simulation.current_tick()} тиков, мир {verdict} с записью")
+        glutLeaveMainLoop()
+
+
 # ============================================================
 #                      СТАРТ ПРОГРАММЫ
 # ============================================================
-def main():
-    global shader_program
-    global camera, airplane, _last_time_ms
-
-    # GLUT и окно (контекст OpenGL должен быть создан ДО create_program)
-    glutInit()
-    glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
-    glutInitWindowSize(window_width, window_height)
-    glutCreateWindow(b"Kursach: flying airplane with clouds")
+def init_world(tree_count: int = 260, house_count: int = 12, cloud_count: int = 40,
+               scenery_seed: int = 1234, cloud_seed: int = 2025,
+               fleet_count: int = 0, fleet_seed: int = 77,
+               lazy: bool = False, on_world_ready=None):
+    """
+    Камера, самолёт и все подсистемы OpenGL. Контекст уже должен быть создан
+    (окном GLUT в main() или без окна — в benchmark.py).
+
+    lazy = True — сразу готовим только то, без чего не нарисовать кадр
+    (камера, самолёт, земля, свет); карты теней, атлас импосторов,
+    деревья, дома, облака и трафик достраиваются после первого кадра, по шагу
+    за idle(). on_world_ready() вызывается последним шагом, когда мир
+    уже сгенерирован (тут main() запускает симуляцию).
+    """
+    global shader_program, camera, airplane, _last_time_ms
 
     # камера
     camera = Camera(
@@ -233,14 +531,149 @@ def main():
     _last_time_ms = 0
 
     # OpenGL subsystems
-    init_gl()
-    init_terrain()
-    init_scenery()
-    init_clouds()
+    if use_core_profile:
+        # шейдерная программа: в core profile через неё рисуется весь кадр
+        shader_program = create_program("basic.vert", "basic.frag")
+        renderer.init_renderer(shader_program)
+    else:
+        init_gl()
+        init_terrain()
+    # новый полёт начинается из абсолютного нуля (и с нулевым началом отсчёта)
+    reset_world()
+
+    _startup_steps.clear()
+    if not use_core_profile:
+        _startup_steps.append(("shadows", lambda: shadows.init_shadows(shadow_map_size)))
+        # картинки дальних деревьев и домов — один раз на старте
+        _startup_steps.append(("impostors", init_impostors))
+    # мир генерируется детерминированно из seed'ов, поэтому порядок шагов
+    # и момент старта симуляции (после них) на запись полёта не влияют
+    _startup_steps.append(("scenery", lambda: init_scenery(
+        tree_count, house_count, scenery_seed, streaming=use_chunk_streaming)))
+    _startup_steps.append(("clouds", lambda: init_clouds(cloud_count, cloud_seed)))
+    # fleet_count самолётов на автопилоте — в тот же флот, что и игрок
+    _startup_steps.append(("fleet", lambda: init_traffic(airplane.fleet, fleet_count, fleet_seed)))
+    if on_world_ready is not None:
+        _startup_steps.append(("world_ready", on_world_ready))
+
+    if not lazy:
+        finish_startup()
+
+
+def _run_startup_step():
+    """Один отложенный шаг запуска; после последнего запоминаем время готовности."""
+    global time_to_ready_ms
+
+    name, step = _startup_steps.pop(0)
+    with span(f"startup.{name}"):
+        step()
+    if not _startup_steps:
+        time_to_ready_ms = (time.perf_counter() - startup_started_at) * 1000.0
+
+
+def finish_startup():
+    """Доделать все отложенные шаги запуска сразу."""
+    while _startup_steps:
+        _run_startup_step()
+
+
+def _on_close():
+    """Окно закрывается (контекст ещё текущий): дописываем запись кадров."""
+    if capture.capturing():
+        stats = capture.stop_capture()
+        print(f"capture: {stats['written']} кадров записано, "
+              f"{stats['dropped']} выброшено, {stats['stalls']} ожиданий GPU")
+
+
+def _arg_value(name: str, default=None):
+    """Значение ключа вида `--name значение` из командной строки."""
+    if name in sys.argv:
+        i = sys.argv.index(name)
+        if i + 1 < len(sys.argv):
+            return sys.argv[i + 1]
+    return default
+
+
+def main():
+    global use_core_profile, use_chunk_streaming, use_sim_thread, replay_speed
+    global use_shadows, shadow_map_size
+
+    use_core_profile = "--core" in sys.argv
+    use_chunk_streaming = "--chunks" in sys.argv
+    use_shadows = "--no-shadows" not in sys.argv
+    shadow_map_size = int(_arg_value("--shadow-size", shadow_map_size))
+    use_sim_thread = "--sync-sim" not in sys.argv
+    # сцена в уменьшенном разрешении и/или плотность мира (--governor),
+    # чтобы держать --target-fps
+    dynres.ENABLED = "--dynres" in sys.argv
+    governor.ENABLED = "--governor" in sys.argv
+    target_fps = float(_arg_value("--target-fps", dynres.TARGET_FPS))
+    dynres.TARGET_FPS = governor.TARGET_FPS = target_fps
+
+    # запись полёта (--record файл) или её воспроизведение (--replay файл)
+    record_path = _arg_value("--record")
+    replay_path = _arg_value("--replay")
+    replay_speed = float(_arg_value("--replay-speed", 1.0))
+
+    # запись кадров: PNG в каталог (--capture) или в кодировщик (--capture-cmd)
+    capture_dir = _arg_value("--capture")
+    capture_cmd = _arg_value("--capture-cmd")
+
+    # --fleet N: сколько самолётов трафика летает вокруг игрока;
+    # с --governor пулы объектов — с запасом на рост плотности (кроме --chunks)
+    pooled = governor.ENABLED and not use_chunk_streaming
+    header = recording.RecordingHeader(
+        simulation.SIM_RATE, 1234, 2025, governor.pool_size(260, pooled),
+        governor.pool_size(12, pooled), governor.pool_size(40, pooled),
+        use_chunk_streaming, int(_arg_value("--fleet", 0)), pooled=pooled,
+    )
+    replay = None
+    if replay_path is not None:
+        replay = recording.load_recording(replay_path)
+        header = replay.header
+        if header.sim_rate != simulation.SIM_RATE:
+            raise ValueError(f"запись сделана при {header.sim_rate} тиках/с, "
+                             f"а симуляция идёт на {simulation.SIM_RATE}")
+        use_chunk_streaming = header.chunks
+        # воспроизведение шагает само из idle(), поток не нужен
+        use_sim_thread = False
 
-    # создаём шейдерную программу (пока не используем её в отрисовке,
-    # но она есть в проекте для отчёта и дальнейшего развития)
-    shader_program = create_program("basic.vert", "basic.frag")
+    # GLUT и окно (контекст OpenGL должен быть создан ДО create_program)
+    glutInit()
+    if use_core_profile:
+        glutInitContextVersion(3, 3)
+        glutInitContextProfile(GLUT_CORE_PROFILE)
+    glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
+    glutInitWindowSize(window_width, window_height)
+    glutCreateWindow(b"Kursach: flying airplane with clouds")
+    # после glutLeaveMainLoop() хотим вернуться из glutMainLoop (дописать запись)
+    glutSetOption(GLUT_ACTION_ON_WINDOW_CLOSE, GLUT_ACTION_GLUTMAINLOOP_RETURNS)
+
+    if capture_dir is not None or capture_cmd is not None:
+        capture.start_capture(capture_dir, capture_cmd)
+
+    def start_simulation():
+        # симуляция с фиксированным шагом (120 Гц), отдельно от кадров
+        simulation.init_simulation(airplane)
+        if replay is not None:
+            recording.start_replay(replay)
+        elif record_path is not None:
+            recording.start_recording(record_path, header)
+        if use_sim_thread:
+            simulation.start_simulation()
+        ready_ms = (time.perf_counter() - startup_started_at) * 1000.0
+        print(f"старт: первый кадр через {time_to_first_frame_ms:.0f} мс, "
+              f"мир готов через {ready_ms:.0f} мс")
+
+    # живая доля пулов — по заголовку: запись с --governor проигрывается
+    # тем же миром и без него (плотность — из записи, регулятор не рулит)
+    governor.start(header.pooled, steer=replay is None)
+
+    # первый кадр — как можно раньше, мир и симуляция — следом (из idle)
+    init_world(header.tree_count, header.house_count, header.cloud_count,
+               header.scenery_seed, header.cloud_seed,
+               header.fleet_count, header.fleet_seed,
+               lazy=True, on_world_ready=start_simulation)
 
     # callbacks
     glutDisplayFunc(display)
@@ -248,8 +681,14 @@ def main():
     glutIdleFunc(idle)
     glutSpecialFunc(special_keys)
     glutKeyboardFunc(keyboard)
+    # окно закрывается — контекст ещё жив: дочитываем кольцо PBO записи
+    glutCloseFunc(_on_close)
 
     glutMainLoop()
+    simulation.stop_simulation()
+    recording.stop_recording()
+    # если запись не закрыли в _on_close, контекста уже нет
+    capture.stop_capture(release_gl=False)
 
 
 if __name__ == "__main__":
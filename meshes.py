@@ -0,0 +1,278 @@
+# meshes.py
+"""
+Статические меши в видеопамяти.
+
+- Геометрию собираем на CPU в NumPy: массив вершин + индексы треугольников.
+- Формат вершины общий для всех мешей:
+      позиция (3 float) | нормаль (3 float) | цвет (3 float)
+- Mesh один раз заливает данные в VBO/IBO (лениво, при первой отрисовке),
+  дальше объект рисуется одним glDrawElements*.
+- get_mesh() — общий кэш: один и тот же меш (самолёт, дерево, дом)
+  собирается и хранится в одном экземпляре на всю программу.
+- draw_unit_cube() — общий immediate-mode куб для запасных путей отрисовки.
+"""
+
+import ctypes
+import math
+
+import numpy as np
+from OpenGL.GL import *
+
+import glstate
+
+VERTEX_FLOATS = 9
+VERTEX_STRIDE = VERTEX_FLOATS * 4
+
+# Номера вершинных атрибутов — одинаковые во всех шейдерах проекта
+# (привязываются при линковке, см. shader.create_program).
+ATTRIB_POSITION = 0
+ATTRIB_NORMAL = 1
+ATTRIB_COLOR = 2
+ATTRIB_INSTANCE = 3          # (x, y, z, scale) на экземпляр
+ATTRIB_INSTANCE_COLOR = 4    # (r, g, b) на экземпляр
+ATTRIB_INSTANCE_ROTATION = 5  # (yaw, pitch, roll) на экземпляр, радианы
+
+ATTRIB_LOCATIONS = {
+    "aPos": ATTRIB_POSITION,
+    "aNormal": ATTRIB_NORMAL,
+    "aColor": ATTRIB_COLOR,
+    "aInstance": ATTRIB_INSTANCE,
+    "aInstanceColor": ATTRIB_INSTANCE_COLOR,
+    "aInstanceRotation": ATTRIB_INSTANCE_ROTATION,
+}
+
+# Грани единичного куба [-0.5, 0.5]^3: нормаль + 4 вершины (против часовой).
+_CUBE_FACES = (
+    ((0, 0, 1), ((-0.5, -0.5, 0.5), (0.5, -0.5, 0.5), (0.5, 0.5, 0.5), (-0.5, 0.5, 0.5))),
+    ((0, 0, -1), ((0.5, -0.5, -0.5), (-0.5, -0.5, -0.5), (-0.5, 0.5, -0.5), (0.5, 0.5, -0.5))),
+    ((-1, 0, 0), ((-0.5, -0.5, -0.5), (-0.5, -0.5, 0.5), (-0.5, 0.5, 0.5), (-0.5, 0.5, -0.5))),
+    ((1, 0, 0), ((0.5, -0.5, 0.5), (0.5, -0.5, -0.5), (0.5, 0.5, -0.5), (0.5, 0.5, 0.5))),
+    ((0, 1, 0), ((-0.5, 0.5, 0.5), (0.5, 0.5, 0.5), (0.5, 0.5, -0.5), (-0.5, 0.5, -0.5))),
+    ((0, -1, 0), ((-0.5, -0.5, -0.5), (0.5, -0.5, -0.5), (0.5, -0.5, 0.5), (-0.5, -0.5, 0.5))),
+)
+
+
+def draw_unit_cube():
+    """Единичный куб [-0.5, 0.5]^3 в immediate mode (цвет задаётся снаружи)."""
+    glBegin(GL_QUADS)
+    for normal, corners in _CUBE_FACES:
+        glNormal3f(*normal)
+        for corner in corners:
+            glVertex3f(*corner)
+    glEnd()
+
+
+def cube_geometry(
+    color: tuple[float, float, float],
+    center: tuple[float, float, float] = (0.0, 0.0, 0.0),
+    size: tuple[float, float, float] = (1.0, 1.0, 1.0),
+) -> tuple[np.ndarray, np.ndarray]:
+    """Параллелепипед: единичный куб, растянутый до size и сдвинутый в center."""
+    vertices = np.zeros((24, VERTEX_FLOATS), dtype=np.float32)
+    indices = np.zeros(36, dtype=np.uint32)
+
+    for face, (normal, corners) in enumerate(_CUBE_FACES):
+        for k, corner in enumerate(corners):
+            v = vertices[face * 4 + k]
+            v[0:3] = [center[i] + corner[i] * size[i] for i in range(3)]
+            v[3:6] = normal
+            v[6:9] = color
+        base = face * 4
+        indices[face * 6:face * 6 + 6] = (base, base + 1, base + 2, base, base + 2, base + 3)
+
+    return vertices, indices
+
+
+def cylinder_geometry(
+    color: tuple[float, float, float],
+    radius: float = 0.5,
+    height: float = 1.0,
+    slices: int = 12,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Боковая поверхность цилиндра от y=0 до y=height (без крышек)."""
+    a = np.arange(slices + 1) * (2.0 * math.pi / float(slices))
+    nx = np.cos(a)
+    nz = np.sin(a)
+
+    vertices = np.zeros((slices + 1, 2, VERTEX_FLOATS), dtype=np.float32)
+    vertices[:, :, 0] = (radius * nx)[:, None]
+    vertices[:, 1, 1] = height
+    vertices[:, :, 2] = (radius * nz)[:, None]
+    vertices[:, :, 3] = nx[:, None]
+    vertices[:, :, 5] = nz[:, None]
+    vertices[:, :, 6:9] = color
+
+    # пара соседних «рёбер» образует квад = 2 треугольника
+    i = np.arange(slices, dtype=np.uint32) * 2
+    indices = np.stack([i, i + 2, i + 3, i, i + 3, i + 1], axis=1).ravel()
+
+    return vertices.reshape(-1, VERTEX_FLOATS), indices
+
+
+def plane_geometry(
+    color: tuple[float, float, float],
+    center: tuple[float, float, float] = (0.0, 0.0, 0.0),
+    size: tuple[float, float] = (1.0, 1.0),
+    normal_y: float = 1.0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Горизонтальный прямоугольник size=(по x, по z); нормаль вверх или вниз."""
+    cx, cy, cz = center
+    hx, hz = size[0] * 0.5, size[1] * 0.5
+    vertices = np.zeros((4, VERTEX_FLOATS), dtype=np.float32)
+    vertices[:, 0:3] = (
+        (cx - hx, cy, cz - hz),
+        (cx + hx, cy, cz - hz),
+        (cx + hx, cy, cz + hz),
+        (cx - hx, cy, cz + hz),
+    )
+    vertices[:, 4] = normal_y
+    vertices[:, 6:9] = color
+    indices = np.array((0, 1, 2, 0, 2, 3), dtype=np.uint32)
+    return vertices, indices
+
+
+def sphere_geometry(
+    color: tuple[float, float, float],
+    radius: float = 1.0,
+    slices: int = 24,
+    stacks: int = 24,
+) -> tuple[np.ndarray, np.ndarray]:
+    """UV-сфера (аналог glutSolidSphere)."""
+    theta = np.linspace(0.0, math.pi, stacks + 1)[:, None]
+    phi = np.linspace(0.0, 2.0 * math.pi, slices + 1)[None, :]
+
+    nx = np.sin(theta) * np.cos(phi)
+    ny = np.cos(theta) * np.ones_like(phi)
+    nz = np.sin(theta) * np.sin(phi)
+
+    vertices = np.zeros((stacks + 1, slices + 1, VERTEX_FLOATS), dtype=np.float32)
+    vertices[..., 3] = nx
+    vertices[..., 4] = ny
+    vertices[..., 5] = nz
+    vertices[..., 0:3] = vertices[..., 3:6] * radius
+    vertices[..., 6:9] = color
+
+    row = slices + 1
+    i = (np.arange(stacks)[:, None] * row + np.arange(slices)[None, :]).ravel().astype(np.uint32)
+    indices = np.stack([i, i + row, i + row + 1, i, i + row + 1, i + 1], axis=1).ravel()
+
+    return vertices.reshape(-1, VERTEX_FLOATS), indices
+
+
+def merge_geometry(*parts: tuple[np.ndarray, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """Склеиваем несколько кусков геометрии в один (индексы сдвигаем)."""
+    vertices = []
+    indices = []
+    offset = 0
+    for v, i in parts:
+        vertices.append(v)
+        indices.append(i + offset)
+        offset += len(v)
+    return np.concatenate(vertices), np.concatenate(indices).astype(np.uint32)
+
+
+class Mesh:
+    """Меш в VBO/IBO. Данные на CPU готовы сразу, в GPU заливаются лениво."""
+
+    def __init__(self, vertices: np.ndarray, indices: np.ndarray):
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint32)
+        self.index_count = int(self.indices.size)
+        self.vbo = None
+        self.ibo = None
+
+    def upload(self) -> None:
+        """Заливаем вершины и индексы в видеопамять (один раз)."""
+        if self.vbo is not None:
+            return
+
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.ibo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def update_vertices(self, vertices: np.ndarray) -> None:
+        """
+        Заменяем вершины (того же размера) — для мешей, которые меняются
+        каждый кадр. Буфер «осиротняем», чтобы не ждать GPU.
+        """
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        if self.vbo is None:
+            return
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, None, GL_DYNAMIC_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, self.vertices.nbytes, self.vertices)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, colored: bool = True) -> None:
+        """
+        Рисуем меш через фиксированный конвейер (клиентские массивы из VBO).
+        colored = False → цвет вершин не подключаем, он задаётся снаружи.
+        """
+        self.upload()
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(0))
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glNormalPointer(GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(12))
+        if colored:
+            glEnableClientState(GL_COLOR_ARRAY)
+            glColorPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(24))
+
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, None)
+
+        if colored:
+            glDisableClientState(GL_COLOR_ARRAY)
+            # после массива цветов текущий цвет GL не определён
+            glstate.invalidate_color()
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def bind_attribs(self) -> None:
+        """Подключаем VBO к вершинным атрибутам шейдера (0, 1, 2) и IBO."""
+        self.upload()
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        for loc, offset in ((ATTRIB_POSITION, 0), (ATTRIB_NORMAL, 12), (ATTRIB_COLOR, 24)):
+            glEnableVertexAttribArray(loc)
+            glVertexAttribPointer(loc, 3, GL_FLOAT, GL_FALSE, VERTEX_STRIDE, ctypes.c_void_p(offset))
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+
+    def unbind_attribs(self) -> None:
+        for loc in (ATTRIB_POSITION, ATTRIB_NORMAL, ATTRIB_COLOR):
+            glDisableVertexAttribArray(loc)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw_bound(self) -> None:
+        """Один вызов glDrawElements (атрибуты должны быть подключены)."""
+        glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, None)
+
+    def draw_instanced(self, instance_count: int) -> None:
+        """Один вызов на все экземпляры (атрибуты должны быть подключены)."""
+        glDrawElementsInstanced(
+            GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, None, instance_count
+        )
+
+
+_MESH_CACHE: dict[str, Mesh] = {}
+
+
+def get_mesh(name: str, build) -> Mesh:
+    """
+    Меш из общего кэша. build() — функция, возвращающая (vertices, indices);
+    вызывается только один раз, при первом запросе этого имени.
+    """
+    mesh = _MESH_CACHE.get(name)
+    if mesh is None:
+        mesh = Mesh(*build())
+        _MESH_CACHE[name] = mesh
+    return mesh
@@ -0,0 +1,108 @@
+# offscreen.py
+"""
+Контекст OpenGL без окна — для замеров и пакетного рендера на машинах
+без GPU и без X (Mesa llvmpipe).
+
+- EGL (surfaceless / pbuffer) или OSMesa, выбирается параметром platform.
+- ВАЖНО: PyOpenGL выбирает платформу при первом импорте OpenGL, поэтому
+  select_platform() надо вызвать ДО импорта остальных модулей проекта.
+"""
+
+import ctypes
+import os
+
+
+def select_platform(platform: str = "egl") -> None:
+    """Сказать PyOpenGL, через что создавать контекст (до импорта OpenGL!)."""
+    os.environ["PYOPENGL_PLATFORM"] = platform
+    if platform == "egl":
+        # без X-сервера: Mesa умеет EGL вообще без оконной системы
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+
+def create_context(width: int, height: int, platform: str = "egl", core: bool = False):
+    """
+    Создаём контекст и делаем его текущим. Возвращаем объект-«хэндл»,
+    который надо держать живым, пока идёт рендер.
+    """
+    if platform == "egl":
+        return _create_egl_context(width, height, core)
+    if platform == "osmesa":
+        return _create_osmesa_context(width, height, core)
+    raise ValueError(f"неизвестная платформа: {platform}")
+
+
+def _create_egl_context(width: int, height: int, core: bool):
+    from OpenGL import EGL
+
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise RuntimeError("eglInitialize не удался")
+
+    config_attribs = [
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RED_SIZE, 8,
+        EGL.EGL_GREEN_SIZE, 8,
+        EGL.EGL_BLUE_SIZE, 8,
+        EGL.EGL_ALPHA_SIZE, 8,
+        EGL.EGL_DEPTH_SIZE, 24,
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+        EGL.EGL_NONE,
+    ]
+    config = EGL.EGLConfig()
+    count = EGL.EGLint()
+    EGL.eglChooseConfig(
+        display, (EGL.EGLint * len(config_attribs))(*config_attribs),
+        ctypes.pointer(config), 1, ctypes.pointer(count),
+    )
+    if count.value == 0:
+        raise RuntimeError("нет подходящей EGL-конфигурации")
+
+    surface_attribs = [EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE]
+    surface = EGL.eglCreatePbufferSurface(
+        display, config, (EGL.EGLint * len(surface_attribs))(*surface_attribs)
+    )
+
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context_attribs = None
+    if core:
+        attribs = [
+            EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+            EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE,
+        ]
+        context_attribs = (EGL.EGLint * len(attribs))(*attribs)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, context_attribs)
+    if not context:
+        raise RuntimeError("eglCreateContext не удался")
+
+    EGL.eglMakeCurrent(display, surface, surface, context)
+    return display, surface, context
+
+
+def _create_osmesa_context(width: int, height: int, core: bool):
+    import numpy as np
+    from OpenGL import GL, osmesa
+
+    if core:
+        attribs = [
+            osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+            osmesa.OSMESA_DEPTH_BITS, 24,
+            osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+            osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 3,
+            osmesa.OSMESA_CONTEXT_MINOR_VERSION, 3,
+            0,
+        ]
+        context = osmesa.OSMesaCreateContextAttribs(attribs, None)
+    else:
+        context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+    if not context:
+        raise RuntimeError("OSMesaCreateContext не удался")
+
+    # OSMesa рисует прямо в наш буфер в памяти
+    buffer = np.zeros((height, width, 4), dtype=np.uint8)
+    if not osmesa.OSMesaMakeCurrent(context, buffer, GL.GL_UNSIGNED_BYTE, width, height):
+        raise RuntimeError("OSMesaMakeCurrent не удался")
+    return context, buffer
@@ -0,0 +1,185 @@
+# profiler.py
+"""
+Замер времени по стадиям кадра (named spans).
+
+- Стадия оборачивается в `with span("terrain"):` — время пишется в текущий
+  кадр, end_frame() закрывает кадр и кладёт его в кольцевой буфер
+  последних TRACE_FRAMES кадров.
+- HUD: FPS, средние миллисекунды по стадиям и счётчики объектов
+  (hud_lines / draw_hud), включается клавишей в main.py.
+- dump_trace() пишет последние кадры в формате Chrome trace events —
+  файл открывается в chrome://tracing или ui.perfetto.dev.
+- Выключенный профайлер почти ничего не стоит: span() отдаёт один и тот же
+  пустой контекст, end_frame() сразу выходит.
+"""
+
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from OpenGL.GL import *
+from OpenGL.GLUT import *
+
+from frustum import format_cull_stats
+
+# включён ли сбор времени (и отдельно — показывается ли HUD)
+ENABLED: bool = False
+HUD_VISIBLE: bool = False
+
+# сколько последних кадров держим (для HUD и для trace)
+TRACE_FRAMES = 600
+
+# по скольким кадрам усредняем цифры на HUD
+HUD_AVERAGE_FRAMES = 60
+
+# кадр: (начало в нс, [(имя, начало нс, длительность нс), ...], счётчики)
+_frames: deque = deque(maxlen=TRACE_FRAMES)
+_current: list = []
+_counters: dict[str, int] = {}
+_frame_start_ns: int = 0
+
+_clock_ns = time.perf_counter_ns
+
+# общий «пустой» span, когда профайлер выключен
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = _clock_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _current.append((self.name, self.start, _clock_ns() - self.start))
+        return False
+
+
+def span(name: str):
+    """Контекст для замера стадии: `with span("clouds"): submit_clouds(frustum, eye)`."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def count(name: str, value: int) -> None:
+    """Счётчик кадра (сколько объектов, вызовов и т.п.)."""
+    if ENABLED:
+        _counters[name] = int(value)
+
+
+def set_enabled(enabled: bool) -> None:
+    """Включить/выключить сбор. При включении начинаем с чистого буфера."""
+    global ENABLED, _frame_start_ns
+    ENABLED = enabled
+    _frames.clear()
+    _current.clear()
+    _counters.clear()
+    _frame_start_ns = _clock_ns()
+
+
+def toggle_hud() -> None:
+    """HUD без замеров бессмысленен, поэтому включаем их вместе."""
+    global HUD_VISIBLE
+    HUD_VISIBLE = not HUD_VISIBLE
+    if HUD_VISIBLE != ENABLED:
+        set_enabled(HUD_VISIBLE)
+
+
+def end_frame() -> None:
+    """Закрыть кадр: всё, что намеряли с прошлого end_frame(), — в буфер."""
+    global _current, _frame_start_ns
+    if not ENABLED:
+        return
+    _frames.append((_frame_start_ns, _current, dict(_counters)))
+    _current = []
+    _frame_start_ns = _clock_ns()
+
+
+def stage_times(frames: int = HUD_AVERAGE_FRAMES) -> dict[str, float]:
+    """Среднее время стадий (мс на кадр) за последние frames кадров."""
+    recent = list(_frames)[-frames:]
+    totals: dict[str, int] = {}
+    for _, spans, _ in recent:
+        for name, _, duration in spans:
+            totals[name] = totals.get(name, 0) + duration
+    n = max(1, len(recent))
+    return {name: total / n / 1e6 for name, total in totals.items()}
+
+
+def frame_time_ms(frames: int = HUD_AVERAGE_FRAMES) -> float:
+    """Среднее время от кадра до кадра (мс)."""
+    recent = list(_frames)[-frames:]
+    if len(recent) < 2:
+        return 0.0
+    return (recent[-1][0] - recent[0][0]) / (len(recent) - 1) / 1e6
+
+
+def hud_lines() -> list[str]:
+    """Текст HUD построчно."""
+    ms = frame_time_ms()
+    fps = 1000.0 / ms if ms > 0.0 else 0.0
+    lines = [f"FPS {fps:6.1f}  ({ms:6.2f} ms)"]
+    for name, value in sorted(stage_times().items(), key=lambda item: -item[1]):
+        lines.append(f"{name:<12}{value:7.3f} ms")
+    if _frames:
+        for name, value in sorted(_frames[-1][2].items()):
+            lines.append(f"{name:<12}{value:7d}")
+    cull = format_cull_stats()
+    if cull:
+        lines.append(cull)
+    return lines
+
+
+def draw_hud(height: int) -> None:
+    """HUD растровым шрифтом GLUT поверх кадра (фиксированный конвейер)."""
+    if not HUD_VISIBLE:
+        return
+
+    glPushAttrib(GL_ENABLE_BIT | GL_CURRENT_BIT)
+    glDisable(GL_LIGHTING)
+    glDisable(GL_DEPTH_TEST)
+    glDisable(GL_TEXTURE_2D)
+    glColor3f(1.0, 1.0, 1.0)
+
+    y = height - 18
+    for line in hud_lines():
+        glWindowPos2i(10, y)
+        for ch in line.encode("ascii", errors="replace"):
+            glutBitmapCharacter(GLUT_BITMAP_8_BY_13, ch)
+        y -= 15
+
+    glPopAttrib()
+
+
+def dump_trace(path: str = "trace.json") -> int:
+    """Последние кадры в формате Chrome trace events. Возвращает число кадров."""
+    events = []
+    origin = _frames[0][0] if _frames else 0
+    for index, (frame_start, spans, counters) in enumerate(_frames):
+        events.append({
+            "name": f"frame {index}", "ph": "i", "s": "g",
+            "ts": (frame_start - origin) / 1000.0, "pid": 1, "tid": 1,
+        })
+        for name, start, duration in spans:
+            events.append({
+                "name": name, "ph": "X",
+                "ts": (start - origin) / 1000.0, "dur": duration / 1000.0,
+                "pid": 1, "tid": 1,
+            })
+        if counters:
+            events.append({
+                "name": "counts", "ph": "C",
+                "ts": (frame_start - origin) / 1000.0, "pid": 1,
+                "args": counters,
+            })
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(_frames)
@@ -0,0 +1,224 @@
+# recording.py
+"""
+Запись и воспроизведение полёта — чтобы тормоза, замеченные в полёте,
+можно было повторить.
+
+- Симуляция идёт фиксированными тиками (simulation.py), поэтому
+  «последовательность dt» — это просто номера тиков. Записываем только
+  события: (тик, действие, значение), 9 байт на событие.
+- В заголовке — всё, от чего зависит мир: частота тиков, seed'ы
+  деревьев, облаков и трафика, их количество, режим клеток и пулы с
+  запасом под регулятор плотности (governor.py) — от них зависит, какая
+  доля объектов живёт.
+- В конце файла — число тиков и контрольная сумма мира (world_digest):
+  воспроизведение сверяет, что мир получился бит в бит тем же.
+- Воспроизводить можно в реальном времени или быстрее (replay_ticks
+  просто делает столько тиков, сколько попросили).
+
+Формат (little-endian):
+    заголовок  _HEADER
+    события    _EVENT * N
+    конец      _EVENT с кодом 0 (тик = всего тиков) + _DIGEST
+"""
+
+import struct
+import zlib
+from typing import NamedTuple
+
+import numpy as np
+
+import simulation
+
+MAGIC = b"FLRC"
+VERSION = 4
+
+# magic, версия, тиков в секунду, seed деревьев, seed облаков,
+# деревьев, домов, облаков, флаги (бит 0 — мир из клеток, бит 1 — пулы
+# с запасом под governor.py), самолётов трафика, seed трафика
+_HEADER = struct.Struct("<4sHHIIIIIBII")
+# тик, код действия, значение
+_EVENT = struct.Struct("<IBf")
+# контрольная сумма мира после последнего тика
+_DIGEST = struct.Struct("<I")
+
+_CODE_END = 0
+
+# действия -> коды в файле (0 — конец записи)
+ACTION_CODES = {
+    # рули самолёта — идут в симуляцию
+    "yaw": 1,
+    "pitch": 2,
+    "roll": 3,
+    "speed": 4,
+    "reset": 5,
+    # камера и время суток — только отрисовка
+    "orbit_yaw": 6,
+    "orbit_pitch": 7,
+    "zoom": 8,
+    "time_of_day": 9,
+    # плотность мира (governor.py) — тоже в симуляцию
+    "density": 10,
+}
+_ACTIONS = {code: action for action, code in ACTION_CODES.items()}
+
+# действия, которые меняют мир (остальные — только вид)
+SIM_ACTIONS = frozenset(("yaw", "pitch", "roll", "speed", "reset", "density"))
+
+
+class RecordingHeader(NamedTuple):
+    sim_rate: int
+    scenery_seed: int
+    cloud_seed: int
+    tree_count: int
+    house_count: int
+    cloud_count: int
+    chunks: bool
+    fleet_count: int = 0
+    fleet_seed: int = 77
+    pooled: bool = False        # пулы созданы через governor.pool_size(.., True)
+
+
+class Recording(NamedTuple):
+    header: RecordingHeader
+    events: list                # [(тик, действие, значение), ...]
+    ticks: int                  # сколько тиков всего
+    digest: int                 # world_digest() после последнего тика
+
+
+# открытая запись (None — не пишем)
+_file = None
+
+# воспроизведение: запись, позиция в событиях
+_replay: Recording | None = None
+_replay_pos: int = 0
+
+
+def world_digest() -> int:
+    """
+    CRC32 состояния мира из последнего снимка симуляции: смещение мира,
+    поза самолёта, живые деревья и облака (с номерами слотов) и трафик.
+    """
+    snap = simulation.latest_snapshot()
+    crc = zlib.crc32(np.array([snap.world_x, snap.world_z, snap.origin_x, snap.origin_z,
+                               *snap.plane],
+                              dtype=np.float64).tobytes())
+    # номер поколения расстановки (SceneryState.version) — счётчик процесса,
+    # а не состояние мира, в сумму не входит; живой набор (slots) входит —
+    # плотность меняется тиком симуляции и лежит в записи
+    s, c = snap.scenery, snap.clouds
+    for a in (s.x, s.y, s.z, s.scale, s.kind, s.slots,
+              c.x, c.z, c.size, c.height, c.slots, *snap.fleet):
+        crc = zlib.crc32(np.ascontiguousarray(a).tobytes(), crc)
+    return crc
+
+
+# --------- запись ---------
+
+
+def start_recording(path: str, header: RecordingHeader) -> None:
+    global _file
+    _file = open(path, "wb")
+    _file.write(_HEADER.pack(
+        MAGIC, VERSION, header.sim_rate,
+        header.scenery_seed, header.cloud_seed,
+        header.tree_count, header.house_count, header.cloud_count,
+        (1 if header.chunks else 0) | (2 if header.pooled else 0),
+        header.fleet_count, header.fleet_seed,
+    ))
+
+
+def recording() -> bool:
+    return _file is not None
+
+
+def record_event(tick: int, action: str, value: float = 0.0) -> None:
+    """Записать событие (без записи — ничего не делает)."""
+    if _file is not None:
+        _file.write(_EVENT.pack(tick, ACTION_CODES[action], value))
+
+
+def stop_recording() -> None:
+    """Дописать конец (число тиков и контрольную сумму) и закрыть файл."""
+    global _file
+    if _file is None:
+        return
+    _file.write(_EVENT.pack(simulation.current_tick(), _CODE_END, 0.0))
+    _file.write(_DIGEST.pack(world_digest()))
+    _file.close()
+    _file = None
+
+
+def load_recording(path: str) -> Recording:
+    """Прочитать запись; обрезанный или испорченный файл — ValueError."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path}: не запись полёта (короче заголовка)")
+    magic, version, *fields, flags, fleet_count, fleet_seed = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: не запись полёта (или другая версия)")
+    header = RecordingHeader(*fields, bool(flags & 1), fleet_count, fleet_seed, bool(flags & 2))
+
+    events = []
+    offset = _HEADER.size
+    while True:
+        if offset + _EVENT.size > len(data):
+            raise ValueError(f"{path}: запись обрывается (нет конца)")
+        tick, code, value = _EVENT.unpack_from(data, offset)
+        offset += _EVENT.size
+        if code == _CODE_END:
+            if offset + _DIGEST.size > len(data):
+                raise ValueError(f"{path}: запись обрывается (нет контрольной суммы)")
+            (digest,) = _DIGEST.unpack_from(data, offset)
+            return Recording(header, events, tick, digest)
+        if code not in _ACTIONS:
+            raise ValueError(f"{path}: неизвестное действие {code} на тике {tick}")
+        events.append((tick, _ACTIONS[code], value))
+
+
+# --------- воспроизведение ---------
+
+
+def start_replay(rec: Recording) -> None:
+    """Мир и симуляция уже созданы с параметрами rec.header."""
+    global _replay, _replay_pos
+    _replay = rec
+    _replay_pos = 0
+
+
+def replaying() -> bool:
+    return _replay is not None
+
+
+def replay_done() -> bool:
+    return _replay is None or simulation.current_tick() >= _replay.ticks
+
+
+def replay_ticks(count: int) -> list:
+    """
+    Сделать до count тиков по записи. Рули уходят в симуляцию ровно на
+    тех тиках, где были записаны; события вида (камера, время суток)
+    возвращаются списком (действие, значение) — их применяет main.py.
+    """
+    global _replay_pos
+    view_events = []
+    events = _replay.events
+    for _ in range(count):
+        tick = simulation.current_tick()
+        if tick >= _replay.ticks:
+            break
+        while _replay_pos < len(events) and events[_replay_pos][0] <= tick:
+            _, action, value = events[_replay_pos]
+            _replay_pos += 1
+            if action in SIM_ACTIONS:
+                simulation.post_input(action, value)
+            else:
+                view_events.append((action, value))
+        simulation.step()
+    return view_events
+
+
+def replay_matches() -> bool:
+    """Совпал ли мир после воспроизведения с записанным."""
+    return world_digest() == _replay.digest
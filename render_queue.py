@@ -0,0 +1,151 @@
+# render_queue.py
+"""
+Очередь отрисовки: подсистемы не рисуют сразу, а сдают элементы —
+материал, расстояние от камеры и функцию с одним draw call'ом (меш,
+экземпляры или матрица уже в её аргументах). В конце кадра execute()
+сортирует элементы и рисует их, переключая состояние как можно реже.
+
+- Материал — имя и setup(): всё состояние, от которого зависит рисование
+  (программа, blend, свет, текстура), через glstate. Регистрируется один
+  раз модулем-владельцем (register_material), как слушатели переноса
+  начала отсчёта. Порядок материалов больше не зафиксирован порядком
+  вызовов в main.display(), поэтому setup не полагается на то, что
+  осталось от соседей.
+- Непрозрачное: группа материала целиком, группы — по ближайшему своему
+  элементу, внутри группы — от ближних к дальним. Тогда ранний тест
+  глубины отбрасывает закрытые пиксели до освещения и текстур. Земля
+  закрыта почти всем остальным и сдаётся с depth = inf — последней.
+- Полупрозрачное (материал transparent=True): после всего непрозрачного,
+  от дальних к ближним; материал переключается по мере надобности.
+- STATS — за последний кадр: draw call'ы (элементы), переключения
+  материала и сколько их было бы в порядке сдачи (unsorted_changes).
+- Каждая подряд идущая группа материала — своя стадия профайлера
+  "draw.<материал>": сдача (submit_*) только готовит элементы, а время
+  GL тратится здесь.
+"""
+
+import math
+from itertools import groupby
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from profiler import span
+
+# за последний execute(): элементов (= draw call'ов), переключений
+# материала, сколько переключений было бы без сортировки
+STATS = {"draw_calls": 0, "opaque": 0, "transparent": 0,
+         "state_changes": 0, "unsorted_changes": 0}
+
+
+class Material(NamedTuple):
+    setup: Callable[[], None]
+    transparent: bool
+
+
+class DrawItem(NamedTuple):
+    material: str
+    depth: float
+    draw: Callable
+    args: tuple
+
+
+_materials: dict[str, Material] = {}
+
+# элементы кадра в порядке сдачи
+_items: list[DrawItem] = []
+
+
+def register_material(name: str, setup: Callable[[], None], transparent: bool = False) -> None:
+    """Материал name: setup() выставляет его состояние целиком."""
+    _materials[name] = Material(setup, transparent)
+
+
+def submit(material: str, depth: float, draw: Callable, *args) -> None:
+    """
+    Сдать элемент: draw(*args) рисует его (один draw call) в состоянии
+    материала material. depth — расстояние от камеры (nearest_depth и т.п.).
+    """
+    _items.append(DrawItem(material, depth, draw, args))
+
+
+def clear() -> None:
+    """Выбросить несданное (кадр прерван)."""
+    _items.clear()
+
+
+def execute() -> None:
+    """Отсортировать элементы кадра и нарисовать их; очередь пустеет."""
+    opaque = [item for item in _items if not _materials[item.material].transparent]
+    transparent = [item for item in _items if _materials[item.material].transparent]
+
+    # группа материала встаёт туда, где её ближайший элемент
+    nearest: dict[str, float] = {}
+    for item in opaque:
+        nearest[item.material] = min(nearest.get(item.material, math.inf), item.depth)
+    opaque.sort(key=lambda item: (nearest[item.material], item.material, item.depth))
+    # от дальних к ближним; sort устойчивый — равные остаются в порядке сдачи
+    transparent.sort(key=lambda item: -item.depth)
+
+    changes = 0
+    for material, run in groupby(opaque + transparent, key=lambda item: item.material):
+        with span("draw." + material):
+            _materials[material].setup()
+            for item in run:
+                item.draw(*item.args)
+        changes += 1
+
+    STATS.update(
+        draw_calls=len(_items),
+        opaque=len(opaque),
+        transparent=len(transparent),
+        state_changes=changes,
+        unsorted_changes=_count_changes(_items),
+    )
+    _items.clear()
+
+
+def _count_changes(items: list[DrawItem]) -> int:
+    changes = 0
+    current = None
+    for item in items:
+        if item.material != current:
+            current = item.material
+            changes += 1
+    return changes
+
+
+# --------- расстояния для depth ---------
+
+
+def distance(eye, point) -> float:
+    """От камеры eye до точки (локальные координаты); без камеры — 0."""
+    if eye is None:
+        return 0.0
+    return math.dist(eye, point)
+
+
+def _distances(points: np.ndarray, eye) -> np.ndarray:
+    offsets = np.asarray(points, dtype=np.float32)[:, 0:3] - np.asarray(eye, dtype=np.float32)
+    return np.sqrt(np.einsum("ij,ij->i", offsets, offsets))
+
+
+def nearest_depth(points: np.ndarray, eye) -> float:
+    """До ближайшей из точек points (N, 3+: экземпляры тоже годятся)."""
+    if eye is None or len(points) == 0:
+        return 0.0
+    return float(_distances(points, eye).min())
+
+
+def front_to_back(points: np.ndarray, eye) -> np.ndarray:
+    """Строки points (экземпляры и т.п.) от ближних к камере к дальним."""
+    if eye is None or len(points) < 2:
+        return points
+    return points[np.argsort(_distances(points, eye), kind="stable")]
+
+
+def farthest_depth(points: np.ndarray, eye) -> float:
+    """До самой дальней из точек points — глубина полупрозрачной пачки."""
+    if eye is None or len(points) == 0:
+        return 0.0
+    return float(_distances(points, eye).max())
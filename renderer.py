@@ -0,0 +1,237 @@
+# renderer.py
+"""
+Программируемый конвейер (core profile) на basic.vert / basic.frag.
+
+- Никакого фиксированного конвейера: матрицы считает transforms.py,
+  камера отдаёт view/projection (вместо gluLookAt/gluPerspective).
+- Общие для кадра данные (view, projection, камера, свет) лежат в одном
+  uniform buffer (блок Frame) и заливаются один раз за кадр.
+- Свет попиксельный, позиция светила — lighting.get_sun_position().
+- Всё рисуется из VBO: земля, деревья и дома (инстансинг), самолёт и
+  трафик (инстансинг с поворотом), светило, облака (инстансинг, полупрозрачные).
+- Порядок — через render_queue: материал здесь — набор uniform'ов
+  (_set_material) и blend, непрозрачное от ближних к дальним (земля —
+  последней), облака после всего.
+"""
+
+import math
+
+import numpy as np
+from OpenGL.GL import *
+
+import glstate
+import instancing
+import render_queue
+from clouds import cloud_instances
+from fleet import traffic_instances
+from lighting import (
+    LIGHT_MODEL_AMBIENT,
+    get_light_body_color,
+    get_light_params,
+    get_sun_position,
+    sun_visible,
+)
+from meshes import (
+    ATTRIB_INSTANCE,
+    ATTRIB_INSTANCE_COLOR,
+    ATTRIB_INSTANCE_ROTATION,
+    VERTEX_FLOATS,
+    Mesh,
+    get_mesh,
+    sphere_geometry,
+)
+from scenery import instance_batches
+from terrain import GROUND_COLOR, ground_grid, ground_indices
+from transforms import identity, translate
+
+# точка привязки uniform-блока Frame
+FRAME_BINDING = 0
+
+# std140: 2 x mat4 + 4 x vec4 = 48 float
+_FRAME_FLOATS = 48
+
+_program = None
+_vao = None
+_frame_ubo = None
+_frame_data = np.zeros(_FRAME_FLOATS, dtype=np.float32)
+_uniforms: dict[str, int] = {}
+
+_IDENTITY = identity()
+
+# сетка земли меняется каждый кадр (рельеф под самолётом)
+_ground_mesh: Mesh | None = None
+
+
+def init_renderer(program) -> None:
+    """Вызывается один раз после создания контекста и шейдерной программы."""
+    global _program, _vao, _frame_ubo
+
+    _program = program
+
+    # в core profile без VAO рисовать нельзя; одного на всё хватает
+    _vao = glGenVertexArrays(1)
+
+    _frame_ubo = glGenBuffers(1)
+    glBindBuffer(GL_UNIFORM_BUFFER, _frame_ubo)
+    glBufferData(GL_UNIFORM_BUFFER, _frame_data.nbytes, None, GL_DYNAMIC_DRAW)
+    glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+    block = glGetUniformBlockIndex(program, "Frame")
+    glUniformBlockBinding(program, block, FRAME_BINDING)
+    glBindBufferBase(GL_UNIFORM_BUFFER, FRAME_BINDING, _frame_ubo)
+
+    for name in ("model", "matAmbient", "matDiffuse", "matSpecular",
+                 "shininess", "alpha", "unlit"):
+        _uniforms[name] = glGetUniformLocation(program, name)
+
+    glstate.enable(GL_DEPTH_TEST)
+    glstate.disable(GL_CULL_FACE)
+
+
+def _update_ground(yaw: float) -> Mesh:
+    """Пересобираем вершины сетки земли под текущее положение самолёта."""
+    global _ground_mesh
+
+    positions, normals, _ = ground_grid(yaw)
+    vertices = np.empty((len(positions), VERTEX_FLOATS), dtype=np.float32)
+    vertices[:, 0:3] = positions
+    vertices[:, 3:6] = normals
+    vertices[:, 6:9] = [c / 255.0 for c in GROUND_COLOR]
+
+    if _ground_mesh is None:
+        _ground_mesh = Mesh(vertices, ground_indices())
+    else:
+        _ground_mesh.update_vertices(vertices)
+    return _ground_mesh
+
+
+def _sphere_geometry():
+    return sphere_geometry((1.0, 1.0, 1.0), radius=10.0, slices=24, stacks=24)
+
+
+def _upload_frame(camera, sun_pos, ambient, diffuse) -> None:
+    """Один glBufferSubData на кадр: всё, что общее для всех объектов."""
+    data = _frame_data
+    data[0:16] = camera.view_matrix().T.ravel()
+    data[16:32] = camera.projection_matrix().T.ravel()
+    data[32:35] = camera.eye_position()
+    data[36:39] = sun_pos
+    data[40:43] = diffuse[:3]
+    data[44:47] = [a + b for a, b in zip(ambient[:3], LIGHT_MODEL_AMBIENT[:3])]
+
+    glBindBuffer(GL_UNIFORM_BUFFER, _frame_ubo)
+    glBufferSubData(GL_UNIFORM_BUFFER, 0, data.nbytes, data)
+    glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+
+def _set_material(diffuse=(1.0, 1.0, 1.0), ambient=(1.0, 1.0, 1.0),
+                  specular=(0.0, 0.0, 0.0), shininess=32.0,
+                  alpha=1.0, unlit=False) -> None:
+    glUniform3f(_uniforms["matDiffuse"], *diffuse)
+    glUniform3f(_uniforms["matAmbient"], *ambient)
+    glUniform3f(_uniforms["matSpecular"], *specular)
+    glUniform1f(_uniforms["shininess"], shininess)
+    glUniform1f(_uniforms["alpha"], alpha)
+    glUniform1i(_uniforms["unlit"], 1 if unlit else 0)
+
+
+def _draw_mesh(mesh, model) -> None:
+    glUniformMatrix4fv(_uniforms["model"], 1, GL_TRUE, model)
+    mesh.bind_attribs()
+    mesh.draw_bound()
+    mesh.unbind_attribs()
+
+
+def _draw_instanced(mesh, instances) -> None:
+    if len(instances) == 0:
+        return
+    glUniformMatrix4fv(_uniforms["model"], 1, GL_TRUE, _IDENTITY)
+    mesh.bind_attribs()
+    instancing.bind_instances(instances)
+    mesh.draw_instanced(len(instances))
+    instancing.unbind_instances()
+    mesh.unbind_attribs()
+
+
+def _setup_lit() -> None:
+    glstate.disable(GL_BLEND)
+    _set_material()
+
+
+def _setup_plane() -> None:
+    glstate.disable(GL_BLEND)
+    _set_material(specular=(0.3, 0.3, 0.3))
+
+
+def _setup_sun() -> None:
+    glstate.disable(GL_BLEND)
+    _set_material(diffuse=get_light_body_color(), unlit=True)
+
+
+def _setup_clouds() -> None:
+    glstate.enable(GL_BLEND)
+    glstate.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    _set_material(alpha=0.8, unlit=True)
+
+
+render_queue.register_material("core.lit", _setup_lit)
+render_queue.register_material("core.plane", _setup_plane)
+render_queue.register_material("core.sun", _setup_sun)
+render_queue.register_material("core.clouds", _setup_clouds, transparent=True)
+
+
+def draw_frame(camera, airplane, yaw: float = 0.0) -> None:
+    """Рисуем весь кадр через basic.vert / basic.frag (без glutSwapBuffers)."""
+    _, ambient, diffuse, _, clear_color = get_light_params()
+    sun_pos = get_sun_position()
+
+    glstate.clear_color(*clear_color)
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+    _upload_frame(camera, sun_pos, ambient, diffuse)
+    frustum = camera.frustum()
+
+    glstate.use_program(_program)
+    glBindVertexArray(_vao)
+
+    # значения «выключенных» инстансных атрибутов для обычных мешей
+    glVertexAttrib4f(ATTRIB_INSTANCE, 0.0, 0.0, 0.0, 1.0)
+    glVertexAttrib3f(ATTRIB_INSTANCE_COLOR, 1.0, 1.0, 1.0)
+    glVertexAttrib3f(ATTRIB_INSTANCE_ROTATION, 0.0, 0.0, 0.0)
+
+    eye = camera.eye_position()
+
+    # === земля: закрыта почти всем остальным — последней из непрозрачного ===
+    render_queue.submit("core.lit", math.inf, _draw_mesh, _update_ground(yaw), _IDENTITY)
+
+    # === деревья и дома (дальние — упрощённым мешем, импосторов здесь нет) ===
+    for mesh, instances in instance_batches(frustum, eye):
+        instances = render_queue.front_to_back(instances, eye)
+        render_queue.submit("core.lit", render_queue.nearest_depth(instances, eye),
+                            _draw_instanced, mesh, instances)
+
+    # === самолёт и трафик (одним draw call) ===
+    if airplane is not None:
+        render_queue.submit("core.plane", render_queue.distance(eye, airplane.get_position()),
+                            _draw_mesh, airplane.mesh, airplane.model_matrix())
+        traffic = render_queue.front_to_back(traffic_instances(frustum), eye)
+        if len(traffic):
+            render_queue.submit("core.plane", render_queue.nearest_depth(traffic, eye),
+                                _draw_instanced, airplane.mesh, traffic)
+
+    # === солнце / луна (меш собран один раз; вне пирамиды — не рисуем) ===
+    if sun_visible(frustum):
+        render_queue.submit("core.sun", render_queue.distance(eye, sun_pos),
+                            _draw_mesh, get_mesh("sun", _sphere_geometry), translate(*sun_pos))
+
+    # === облака (полупрозрачные — последними, от дальних к ближним) ===
+    mesh, instances = cloud_instances(frustum, eye)
+    if len(instances):
+        render_queue.submit("core.clouds", render_queue.farthest_depth(instances, eye),
+                            _draw_instanced, mesh, instances)
+
+    render_queue.execute()
+    glstate.disable(GL_BLEND)
+
+    # программу оставляем: в core profile другой всё равно нет
+    glBindVertexArray(0)
@@ -8,69 +8,173 @@
   она визуально ехала под самолётом.
 - update_scenery() реализует «беговую дорожку»: объекты, которые
   слишком далеко, перекидываем вперёд по курсу самолёта.
+- Все объекты лежат в непрерывных NumPy-массивах (struct-of-arrays):
+  SCENERY_X, SCENERY_Z, SCENERY_SCALE, SCENERY_KIND. Беговая дорожка
+  считается одним векторным проходом, без цикла по объектам.
+- Высота земли под объектом (SCENERY_Y) считается один раз при появлении.
+- Режим streaming (init_scenery(streaming=True)): вместо беговой дорожки
+  мир собирается из детерминированных клеток chunks.py — тот же лес на
+  том же месте, плотность не ограничена размером пула.
+- Рисуем через аппаратный инстансинг (один draw call на все деревья и
+  один на все дома); immediate-mode остаётся запасным путём.
+- Уровни детализации (LOD) по расстоянию до камеры: полный меш,
+  упрощённый и импостор — квадрат с картинкой из атласа (impostors.py).
+  Уровень выбирается векторно для всех объектов сразу; у границ уровней
+  есть зона залипания (LOD_HYSTERESIS), чтобы объекты не мигали.
+- Координаты отсчитаны от плавающего начала terrain.ORIGIN; при его
+  переносе массивы сдвигаются на месте (_on_rebase).
+- Если симуляция идёт в отдельном потоке (simulation.py), массивы меняет
+  она, а рисуем мы неизменяемый снимок (scenery_state / set_render_state).
+- SCENERY_VERSION растёт при каждой перестановке объектов — по нему
+  shadows.py понимает, что карту теней пора перерисовать.
+- Столкновения: центры объектов лежат в пространственном хэше
+  (spatial.py, абсолютные координаты), который обновляется вместе с
+  массивами — перестановка беговой дорожки перекладывает только
+  переставленные объекты. sphere_contacts / box_contacts проверяют
+  сразу много самолётов против коробок объектов (_BOX_*), не перебирая
+  все объекты.
+- В кадре объекты сдаются в render_queue (submit_scenery): пачки
+  инстансинга от ближних к дальним; draw_scenery рисует сразу —
+  для карт теней.
+- Живая доля пула (set_live_fraction, её двигает governor.py): живут
+  слоты SCENERY_LIVE, и только они стоят: беговая дорожка и хэш
+  столкновений работают с живыми, снимок (scenery_state) сжат до живых
+  (slots — их номера в пуле). Меньше плотность — меньше работы. Объект
+  умирает, уходя за спину, а оживает по REVIVE_PER_TICK за тик впереди
+  по курсу — там же, где появлялся бы и так, без вспышек на виду.
+  Доля меняется тиком симуляции (действие "density"), поэтому живой
+  набор — часть мира и входит в сумму записи полёта.
 """
 
-import random
 import math
+from typing import NamedTuple
 
+import numpy as np
 from OpenGL.GL import *
 
-from terrain import terrain_height_world, get_world_offset
-
-TREES: list[tuple[float, float, float]] = []
-HOUSES: list[tuple[float, float, float]] = []
+import glstate
+import impostors
+import instancing
+import render_queue
+from chunks import KIND_HOUSE, KIND_TREE, ChunkCache, chunks_in_radius
+from frustum import record, spheres_visible
+from meshes import cube_geometry, cylinder_geometry, draw_unit_cube, get_mesh, merge_geometry
+from spatial import SpatialHash
+from terrain import (
+    get_origin,
+    get_render_offset,
+    get_world_offset,
+    get_world_position,
+    register_rebase_listener,
+    terrain_height_world,
+)
+
+# struct-of-arrays: i-й объект = (SCENERY_X[i], SCENERY_Z[i], SCENERY_SCALE[i], SCENERY_KIND[i])
+SCENERY_X = np.zeros(0, dtype=np.float64)
+SCENERY_Z = np.zeros(0, dtype=np.float64)
+SCENERY_Y = np.zeros(0, dtype=np.float32)  # высота земли под объектом
+SCENERY_SCALE = np.zeros(0, dtype=np.float32)
+SCENERY_KIND = np.zeros(0, dtype=np.int8)
+SCENERY_LIVE = np.zeros(0, dtype=bool)  # живые (рисуются) — см. set_live_fraction
+
+# номер «поколения» расстановки: +1 при любой перестановке объектов
+SCENERY_VERSION = 0
 
 SCENERY_RADIUS_MIN = 40.0
 SCENERY_RADIUS_MAX = 160.0
 FRONT_ARC_DEG = 70.0
 
+# сколько мёртвых слотов оживает за тик, когда живая доля выросла
+REVIVE_PER_TICK = 2
 
-def _draw_unit_cube():
-    glBegin(GL_QUADS)
-
-    # Front
-    glNormal3f(0, 0, 1)
-    glVertex3f(-0.5, -0.5, 0.5)
-    glVertex3f(0.5, -0.5, 0.5)
-    glVertex3f(0.5, 0.5, 0.5)
-    glVertex3f(-0.5, 0.5, 0.5)
-
-    # Back
-    glNormal3f(0, 0, -1)
-    glVertex3f(0.5, -0.5, -0.5)
-    glVertex3f(-0.5, -0.5, -0.5)
-    glVertex3f(-0.5, 0.5, -0.5)
-    glVertex3f(0.5, 0.5, -0.5)
-
-    # Left
-    glNormal3f(-1, 0, 0)
-    glVertex3f(-0.5, -0.5, -0.5)
-    glVertex3f(-0.5, -0.5, 0.5)
-    glVertex3f(-0.5, 0.5, 0.5)
-    glVertex3f(-0.5, 0.5, -0.5)
-
-    # Right
-    glNormal3f(1, 0, 0)
-    glVertex3f(0.5, -0.5, 0.5)
-    glVertex3f(0.5, -0.5, -0.5)
-    glVertex3f(0.5, 0.5, -0.5)
-    glVertex3f(0.5, 0.5, 0.5)
-
-    # Top
-    glNormal3f(0, 1, 0)
-    glVertex3f(-0.5, 0.5, 0.5)
-    glVertex3f(0.5, 0.5, 0.5)
-    glVertex3f(0.5, 0.5, -0.5)
-    glVertex3f(-0.5, 0.5, -0.5)
-
-    # Bottom
-    glNormal3f(0, -1, 0)
-    glVertex3f(-0.5, -0.5, -0.5)
-    glVertex3f(0.5, -0.5, -0.5)
-    glVertex3f(0.5, -0.5, 0.5)
-    glVertex3f(-0.5, -0.5, 0.5)
 
-    glEnd()
+class SceneryState(NamedTuple):
+    """Снимок живых объектов (только для чтения) — то, что рисуем."""
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    scale: np.ndarray
+    kind: np.ndarray
+    slots: np.ndarray           # номер слота пула у каждой строки
+    pool: int                   # размер пула
+    version: int = 0
+
+
+# снимок, который рисуем (None — рисуем живые массивы SCENERY_*)
+_render_state: SceneryState | None = None
+
+# генератор случайных чисел для расстановки (пересоздаётся в init_scenery)
+_rng = np.random.default_rng(1234)
+
+# потоковый мир из клеток (None — обычная беговая дорожка)
+_chunk_cache: ChunkCache | None = None
+_active_chunks: list[tuple[int, int]] = []
+
+# живая доля пула и «очередь» слота на жизнь в [0, 1): слот живой, если
+# его ранг меньше доли (ранги равномерны внутри каждого вида / клетки)
+_live_fraction = 1.0
+_rank = np.zeros(0, dtype=np.float32)
+# сколько слотов живёт при этой доле (пока живых меньше — оживляем)
+_live_target = 0
+# флаги загруженных клеток: решаются при загрузке и дальше не меняются
+_chunk_live: dict[tuple[int, int], np.ndarray] = {}
+
+# False — всегда рисовать по-старому, через immediate mode
+USE_INSTANCING = True
+
+# False — все объекты полным мешем, без LOD
+USE_LOD = True
+
+# уровни детализации
+LOD_FULL = 0
+LOD_SIMPLE = 1
+LOD_IMPOSTOR = 2
+
+# дальше какого расстояния от камеры объект переходит на следующий уровень
+LOD_DISTANCES = (140.0, 240.0)
+# зона залипания: граница сдвигается на эту долю в сторону текущего уровня
+LOD_HYSTERESIS = 0.08
+
+# уровень каждого слота пула в прошлом кадре (индексы — как в массивах SCENERY_*)
+_lod_level = np.zeros(0, dtype=np.int8)
+
+# сколько объектов нарисовано на каждом уровне в последнем кадре
+LOD_STATS = {"full": 0, "simple": 0, "impostor": 0}
+
+TRUNK_COLOR = (0.38, 0.26, 0.15)
+CROWN_COLOR = (0.05, 0.45, 0.15)
+WALL_COLOR = (0.75, 0.7, 0.65)
+ROOF_COLOR = (0.45, 0.15, 0.12)
+
+# ограничивающая сфера вида (в единицах scale): центр над землёй и радиус
+_BOUND_CENTER_Y = np.array([1.7, 0.75], dtype=np.float32)
+_BOUND_RADIUS = np.array([1.9, 3.6], dtype=np.float32)
+
+# коробка вида для столкновений (в единицах scale): полуширина по x/z,
+# низ и верх относительно земли под объектом (стены дома наполовину в земле)
+_BOX_HALF = np.array([0.8, 2.0], dtype=np.float32)
+_BOX_BOTTOM = np.array([0.0, -1.5], dtype=np.float32)
+_BOX_TOP = np.array([3.34, 3.0], dtype=np.float32)
+
+# хэш центров объектов для столкновений: размер клетки (м) и самая
+# широкая коробка в нём — на столько расширяем каждый запрос
+SCENERY_CELL = 16.0
+_grid = SpatialHash(SCENERY_CELL)
+_grid_margin = 0.0
+
+
+class Contacts(NamedTuple):
+    """Пересечения: запрос query[k] задевает объект item[k] вида kind[k]."""
+    query: np.ndarray
+    item: np.ndarray
+    kind: np.ndarray
+
+
+# цвет-множитель экземпляра для каждого вида
+_KIND_TINT = {
+    KIND_TREE: (1.0, 1.0, 1.0),
+    KIND_HOUSE: (1.0, 1.0, 1.0),
+}
 
 
 def _draw_cylinder(radius=0.5, height=1.0, slices=12):
@@ -88,255 +192,595 @@ def _draw_cylinder(radius=0.5, height=1.0, slices=12):
     glEnd()
 
 
-def _random_point_in_ring_world(
+def _random_points_in_ring(
+    rng: np.random.Generator,
     cx: float, cz: float,
-    r_min: float, r_max: float
-) -> tuple[float, float]:
-    """Случайная точка в кольце вокруг (cx, cz)."""
-    angle = random.uniform(0.0, 2.0 * math.pi)
-    r = math.sqrt(random.uniform(r_min * r_min, r_max * r_max))
-    x = cx + math.sin(angle) * r
-    z = cz + math.cos(angle) * r
-    return x, z
+    r_min: float, r_max: float,
+    count: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """count случайных точек в кольце вокруг (cx, cz), равномерно по площади."""
+    angle = rng.uniform(0.0, 2.0 * math.pi, count)
+    r = np.sqrt(rng.uniform(r_min * r_min, r_max * r_max, count))
+    return cx + np.sin(angle) * r, cz + np.cos(angle) * r
+
 
+def init_scenery(tree_count: int = 260, house_count: int = 12, seed: int = 1234,
+                 streaming: bool = False):
+    """
+    Генерируем начальное наполнение вокруг самолёта.
+    streaming = True — мир из клеток (seed = seed мира), счётчики не нужны.
+    """
+    global SCENERY_X, SCENERY_Z, SCENERY_Y, SCENERY_SCALE, SCENERY_KIND, _rng
+    global _chunk_cache, _active_chunks, SCENERY_VERSION, SCENERY_LIVE, _rank, _live_target
 
-def init_scenery():
-    """Генерируем начальное наполнение вокруг самолёта."""
-    global TREES, HOUSES
+    _rng = np.random.default_rng(seed)
+    SCENERY_VERSION += 1
 
-    random.seed(1234)
-    TREES = []
-    HOUSES = []
+    if streaming:
+        _chunk_cache = ChunkCache(seed)
+        _active_chunks = []
+        _chunk_live.clear()
+        _update_chunks()
+        return
+    _chunk_cache = None
 
     plane_x, plane_z = get_world_offset()
 
-    tree_count = 260
-    for _ in range(tree_count):
-        x, z = _random_point_in_ring_world(
-            plane_x, plane_z,
-            SCENERY_RADIUS_MIN, SCENERY_RADIUS_MAX
-        )
-        scale = random.uniform(0.8, 1.6)
-        TREES.append((x, z, scale))
-
-    house_count = 12
-    for _ in range(house_count):
-        x, z = _random_point_in_ring_world(
-            plane_x, plane_z,
-            SCENERY_RADIUS_MIN + 20.0, SCENERY_RADIUS_MAX
-        )
-        scale = random.uniform(1.2, 1.8)
-        HOUSES.append((x, z, scale))
+    tree_x, tree_z = _random_points_in_ring(
+        _rng, plane_x, plane_z,
+        SCENERY_RADIUS_MIN, SCENERY_RADIUS_MAX,
+        tree_count
+    )
+    tree_scale = _rng.uniform(0.8, 1.6, tree_count)
+
+    house_x, house_z = _random_points_in_ring(
+        _rng, plane_x, plane_z,
+        SCENERY_RADIUS_MIN + 20.0, SCENERY_RADIUS_MAX,
+        house_count
+    )
+    house_scale = _rng.uniform(1.2, 1.8, house_count)
+
+    SCENERY_X = np.concatenate([tree_x, house_x])
+    SCENERY_Z = np.concatenate([tree_z, house_z])
+    SCENERY_Y = _ground_heights(SCENERY_X, SCENERY_Z)
+    SCENERY_SCALE = np.concatenate([tree_scale, house_scale]).astype(np.float32)
+    SCENERY_KIND = np.concatenate([
+        np.full(tree_count, KIND_TREE, dtype=np.int8),
+        np.full(house_count, KIND_HOUSE, dtype=np.int8),
+    ])
+    _rank = np.concatenate([_ranks(tree_count), _ranks(house_count)])
+    SCENERY_LIVE = _rank < _live_fraction
+    _live_target = int(np.count_nonzero(SCENERY_LIVE))
+    _reindex()
+
+
+def _ranks(count: int) -> np.ndarray:
+    """Ранги count слотов: 0, 1/count, 2/count, ..."""
+    return (np.arange(count) / max(count, 1)).astype(np.float32)
+
+
+def set_live_fraction(fraction: float) -> None:
+    """
+    Какая доля пула должна жить. Действует не сразу: слот умирает, когда
+    беговая дорожка его переставляет, оживает — по REVIVE_PER_TICK за
+    update_scenery (в клетках — решается при загрузке клетки).
+    """
+    global _live_fraction, _live_target
+    _live_fraction = float(fraction)
+    _live_target = int(np.count_nonzero(_rank < _live_fraction))
 
 
-def _draw_tree(world_x: float, world_z: float, scale: float):
-    y = terrain_height_world(world_x, world_z)
+def live_counts() -> dict[str, int]:
+    """Сколько деревьев и домов сейчас живые (в том, что рисуется) и размер пула."""
+    state = _drawn_state()
+    return {
+        "trees": int(np.count_nonzero(state.kind == KIND_TREE)),
+        "houses": int(np.count_nonzero(state.kind == KIND_HOUSE)),
+        "pool": state.pool,
+    }
 
-    glPushMatrix()
-    glTranslatef(world_x, y, world_z)
-    glScalef(scale, scale, scale)
 
-    # ствол
-    glColor3f(0.38, 0.26, 0.15)
-    _draw_cylinder(radius=0.12, height=1.5, slices=10)
+def _live_state() -> SceneryState:
+    """Живые объекты — копиями массивов (мёртвые слоты не копируем)."""
+    slots = np.flatnonzero(SCENERY_LIVE)
+    return SceneryState(SCENERY_X[slots], SCENERY_Y[slots], SCENERY_Z[slots],
+                        SCENERY_SCALE[slots], SCENERY_KIND[slots], slots,
+                        len(SCENERY_LIVE), SCENERY_VERSION)
 
-    # крона
-    glTranslatef(0.0, 1.5, 0.0)
-    glColor3f(0.05, 0.45, 0.15)
-    glScalef(1.6, 1.6, 1.6)
-    _draw_unit_cube()
-    glTranslatef(0.0, 0.8, 0.0)
-    glScalef(0.7, 0.7, 0.7)
-    _draw_unit_cube()
 
-    glPopMatrix()
+def scenery_state() -> SceneryState:
+    """Снимок живых объектов, защищённый от записи."""
+    state = _live_state()
+    for a in state[:6]:
+        a.flags.writeable = False
+    return state
 
 
-def _draw_house(world_x: float, world_z: float, scale: float):
-    y = terrain_height_world(world_x, world_z)
+def set_render_state(state: SceneryState | None) -> None:
+    """Что рисовать: снимок из потока симуляции или None — живые массивы."""
+    global _render_state
+    _render_state = state
 
-    glPushMatrix()
-    glTranslatef(world_x, y, world_z)
-    glScalef(scale, scale, scale)
 
-    glColor3f(0.75, 0.7, 0.65)
-    glScalef(4.0, 3.0, 4.0)
-    _draw_unit_cube()
+def _drawn_state() -> SceneryState:
+    if _render_state is not None:
+        return _render_state
+    return _live_state()
 
-    glTranslatef(0.0, 0.7, 0.0)
-    glScalef(1.0, 0.6, 1.0)
-    glColor3f(0.45, 0.15, 0.12)
-    _draw_unit_cube()
 
-    glPopMatrix()
+def scenery_version() -> int:
+    """Поколение расстановки, которая сейчас рисуется."""
+    if _render_state is not None:
+        return _render_state.version
+    return SCENERY_VERSION
 
 
-def update_scenery(plane_yaw_deg: float):
-    """Обновляем позиции объектов (беговая дорожка)."""
-    global TREES, HOUSES
+def _ground_heights(xs: np.ndarray, zs: np.ndarray) -> np.ndarray:
+    """Высота земли под каждой точкой (считаем только при появлении объекта)."""
+    return terrain_height_world(xs, zs).astype(np.float32)
 
-    plane_x, plane_z = get_world_offset()
-    yaw_rad = math.radians(plane_yaw_deg)
-    front_arc_rad = math.radians(FRONT_ARC_DEG)
 
-    def respawn_in_front() -> tuple[float, float]:
-        angle = yaw_rad + random.uniform(-front_arc_rad, front_arc_rad)
-        r = random.uniform(SCENERY_RADIUS_MIN, SCENERY_RADIUS_MAX)
-        x = plane_x + math.sin(angle) * r
-        z = plane_z + math.cos(angle) * r
-        return x, z
-
-    # деревья
-    new_trees: list[tuple[float, float, float]] = []
-    for (tx, tz, scale) in TREES:
-        dx = tx - plane_x
-        dz = tz - plane_z
-        dist2 = dx * dx + dz * dz
-        if dist2 > (SCENERY_RADIUS_MAX * SCENERY_RADIUS_MAX):
-            nx, nz = respawn_in_front()
-            new_trees.append((nx, nz, scale))
-        else:
-            new_trees.append((tx, tz, scale))
-    TREES = new_trees
-
-    # дома
-    new_houses: list[tuple[float, float, float]] = []
-    for (hx, hz, scale) in HOUSES:
-        dx = hx - plane_x
-        dz = hz - plane_z
-        dist2 = dx * dx + dz * dz
-        if dist2 > (SCENERY_RADIUS_MAX * SCENERY_RADIUS_MAX):
-            nx, nz = respawn_in_front()
-            new_houses.append((nx, nz, scale))
-        else:
-            new_houses.append((hx, hz, scale))
-    HOUSES = new_houses
+def _visible_mask(state: SceneryState, frustum) -> np.ndarray:
+    """
+    Какие объекты попадают в пирамиду видимости (векторно, для всех
+    сразу). frustum = None — отсечения нет, видны все.
+    """
+    if frustum is None:
+        visible = np.ones(len(state.x), dtype=bool)
+    else:
+        wx, wz = get_render_offset()
+        scale = state.scale
+        visible = spheres_visible(
+            frustum,
+            state.x - wx,
+            state.y + _BOUND_CENTER_Y[state.kind] * scale,
+            state.z - wz,
+            _BOUND_RADIUS[state.kind] * scale,
+        )
 
+    drawn = int(np.count_nonzero(visible))
+    record("scenery", drawn, len(visible) - drawn)
+    return visible
 
-# --------- тени для деревьев и домов ---------
 
+def _iter_kind(state: SceneryState, kind: int, visible: np.ndarray):
+    """(x, y, z, scale) видимых объектов вида kind — уже как питоновские float."""
+    mask = (state.kind == kind) & visible
+    return zip(
+        state.x[mask].tolist(),
+        state.y[mask].tolist(),
+        state.z[mask].tolist(),
+        state.scale[mask].tolist(),
+    )
 
-def _make_shadow_matrix(plane, light_pos):
-    """
-    Матрица проекции тени на плоскость plane от точечного источника light_pos.
-    plane: (A,B,C,D) для Ax+By+Cz+D=0
-    light_pos: (Lx, Ly, Lz)
-    """
-    A, B, C, D = plane
-    Lx, Ly, Lz = light_pos
-    Lw = 1.0
 
-    dot = A * Lx + B * Ly + C * Lz + D * Lw
+# --------- меши для инстансинга ---------
+
+
+def _tree_geometry():
+    """Дерево целиком: ствол + два куба кроны (как в _draw_tree)."""
+    return merge_geometry(
+        cylinder_geometry(TRUNK_COLOR, radius=0.12, height=1.5, slices=10),
+        cube_geometry(CROWN_COLOR, center=(0.0, 1.5, 0.0), size=(1.6, 1.6, 1.6)),
+        cube_geometry(CROWN_COLOR, center=(0.0, 2.78, 0.0), size=(1.12, 1.12, 1.12)),
+    )
+
 
-    mat = [0.0] * 16
+def _house_geometry():
+    """Домик: стены + крыша (как в _draw_house)."""
+    return merge_geometry(
+        cube_geometry(WALL_COLOR, size=(4.0, 3.0, 4.0)),
+        cube_geometry(ROOF_COLOR, center=(0.0, 2.1, 0.0), size=(4.0, 1.8, 4.0)),
+    )
 
-    mat[0] = dot - Lx * A
-    mat[4] = -Lx * B
-    mat[8] = -Lx * C
-    mat[12] = -Lx * D
 
-    mat[1] = -Ly * A
-    mat[5] = dot - Ly * B
-    mat[9] = -Ly * C
-    mat[13] = -Ly * D
+def _tree_simple_geometry():
+    """Дерево издалека: четырёхгранный ствол и одна коробка кроны."""
+    return merge_geometry(
+        cylinder_geometry(TRUNK_COLOR, radius=0.12, height=1.5, slices=4),
+        cube_geometry(CROWN_COLOR, center=(0.0, 1.85, 0.0), size=(1.45, 2.3, 1.45)),
+    )
 
-    mat[2] = -Lz * A
-    mat[6] = -Lz * B
-    mat[10] = dot - Lz * C
-    mat[14] = -Lz * D
 
-    mat[3] = -Lw * A
-    mat[7] = -Lw * B
-    mat[11] = -Lw * C
-    mat[15] = dot - Lw * D
+# вид -> имена и сборщики мешей (полный, упрощённый); дом и так из двух
+# коробок, упрощать в нём нечего
+_KIND_MESHES = {
+    KIND_TREE: (("tree", _tree_geometry), ("tree_simple", _tree_simple_geometry)),
+    KIND_HOUSE: (("house", _house_geometry), ("house", _house_geometry)),
+}
 
-    return (GLfloat * 16)(*mat)
 
+def _kind_mesh(kind: int, level: int):
+    name, build = _KIND_MESHES[kind][min(level, LOD_SIMPLE)]
+    return get_mesh(name, build)
+
+
+def init_impostors() -> bool:
+    """Запекаем атлас импосторов на старте (контекст OpenGL уже есть)."""
+    if not (USE_INSTANCING and impostors.available()):
+        return False
+    for kind in _KIND_MESHES:
+        impostors.prepare(_kind_mesh(kind, LOD_FULL))
+    return True
+
+
+def select_lod(state: SceneryState, eye) -> np.ndarray:
+    """
+    Уровень детализации каждого объекта по расстоянию от камеры eye
+    (локальные координаты), векторно. Граница между уровнями k и k + 1
+    для объекта, который уже дальше k, ближе на LOD_HYSTERESIS, для
+    остальных — дальше: объект на границе не прыгает туда-обратно.
+    """
+    global _lod_level
+
+    count = len(state.x)
+    if eye is None or not USE_LOD:
+        return np.zeros(count, dtype=np.int8)
+
+    wx, wz = get_render_offset()
+    dist = np.sqrt((state.x - wx - eye[0]) ** 2
+                   + (state.y - eye[1]) ** 2
+                   + (state.z - wz - eye[2]) ** 2)
+
+    # прошлые уровни — по слотам: живой набор мог смениться; пул
+    # поменялся целиком (клетки) — прошлых уровней нет
+    if len(_lod_level) == state.pool:
+        previous = _lod_level[state.slots]
+    else:
+        previous = None
+        _lod_level = np.zeros(state.pool, dtype=np.int8)
+
+    level = np.zeros(count, dtype=np.int8)
+    for k, edge in enumerate(LOD_DISTANCES):
+        if previous is None:
+            bound = edge
+        else:
+            bound = np.where(previous > k,
+                             edge * (1.0 - LOD_HYSTERESIS),
+                             edge * (1.0 + LOD_HYSTERESIS))
+        level += dist > bound
+
+    _lod_level[state.slots] = level
+    return level
 
-def _draw_tree_shadow(world_x: float, world_z: float, scale: float):
-    """Геометрия дерева без цветов — для тени."""
-    y = terrain_height_world(world_x, world_z)
 
+def lod_batches(frustum=None, eye=None, use_impostors: bool = False) -> tuple[list, list]:
+    """
+    Пачки для инстансной отрисовки: (меши, импосторы), в каждой — пары
+    (меш, экземпляры), по одной на вид и уровень. У импосторов меш — тот,
+    чья картинка в атласе. Координаты экземпляров уже локальные (минус
+    WORLD_OFFSET), объекты вне пирамиды frustum отброшены.
+    eye = None — всё полным мешем; use_impostors = False — вместо
+    импосторов упрощённый меш.
+    """
+    state = _drawn_state()
+    wx, wz = get_render_offset()
+    visible = _visible_mask(state, frustum)
+    level = select_lod(state, eye)
+    if not use_impostors:
+        level = np.minimum(level, LOD_SIMPLE)
+
+    mesh_batches = []
+    impostor_batches = []
+    for kind in _KIND_MESHES:
+        of_kind = (state.kind == kind) & visible
+        for lod in (LOD_FULL, LOD_SIMPLE, LOD_IMPOSTOR):
+            mask = of_kind & (level == lod)
+            if not mask.any():
+                continue
+            instances = instancing.make_instances(
+                state.x[mask] - wx,
+                state.y[mask],
+                state.z[mask] - wz,
+                state.scale[mask],
+                _KIND_TINT[kind],
+            )
+            if lod == LOD_IMPOSTOR:
+                impostor_batches.append((_kind_mesh(kind, LOD_FULL), instances))
+            else:
+                mesh_batches.append((_kind_mesh(kind, lod), instances))
+
+    if eye is not None and USE_LOD:
+        drawn = level[visible]
+        LOD_STATS["full"] = int(np.count_nonzero(drawn == LOD_FULL))
+        LOD_STATS["simple"] = int(np.count_nonzero(drawn == LOD_SIMPLE))
+        LOD_STATS["impostor"] = int(np.count_nonzero(drawn == LOD_IMPOSTOR))
+    return mesh_batches, impostor_batches
+
+
+def instance_batches(frustum=None, eye=None) -> list:
+    """Пары (меш, экземпляры) без импосторов (дальние — упрощённым мешем)."""
+    return lod_batches(frustum, eye)[0]
+
+
+def _draw_tree(world_x: float, y: float, world_z: float, scale: float):
     glPushMatrix()
     glTranslatef(world_x, y, world_z)
     glScalef(scale, scale, scale)
 
+    # ствол
+    glstate.color(*TRUNK_COLOR)
     _draw_cylinder(radius=0.12, height=1.5, slices=10)
+
+    # крона
     glTranslatef(0.0, 1.5, 0.0)
+    glstate.color(*CROWN_COLOR)
     glScalef(1.6, 1.6, 1.6)
-    _draw_unit_cube()
+    draw_unit_cube()
     glTranslatef(0.0, 0.8, 0.0)
     glScalef(0.7, 0.7, 0.7)
-    _draw_unit_cube()
+    draw_unit_cube()
 
     glPopMatrix()
 
 
-def _draw_house_shadow(world_x: float, world_z: float, scale: float):
-    """Геометрия домика без цветов — для тени."""
-    y = terrain_height_world(world_x, world_z)
-
+def _draw_house(world_x: float, y: float, world_z: float, scale: float):
     glPushMatrix()
     glTranslatef(world_x, y, world_z)
     glScalef(scale, scale, scale)
 
+    glstate.color(*WALL_COLOR)
     glScalef(4.0, 3.0, 4.0)
-    _draw_unit_cube()
+    draw_unit_cube()
+
     glTranslatef(0.0, 0.7, 0.0)
     glScalef(1.0, 0.6, 1.0)
-    _draw_unit_cube()
+    glstate.color(*ROOF_COLOR)
+    draw_unit_cube()
 
     glPopMatrix()
 
 
-def draw_scenery_shadows(light_pos: tuple[float, float, float]):
+def _update_chunks() -> np.ndarray:
+    """
+    Потоковый режим: держим загруженными клетки в радиусе SCENERY_RADIUS_MAX.
+    Массивы пересобираются, только когда набор клеток поменялся.
+    Возвращает индексы изменившихся объектов (все — если пересобрали).
     """
-    Рисуем тени деревьев и домиков на землю (y=0) от точечного источника light_pos.
+    global SCENERY_X, SCENERY_Z, SCENERY_Y, SCENERY_SCALE, SCENERY_KIND
+    global _active_chunks, SCENERY_VERSION, SCENERY_LIVE
+
+    # клетки — в абсолютных координатах, массивы — от начала отсчёта
+    plane_x, plane_z = get_world_position()
+    keys = chunks_in_radius(plane_x, plane_z, SCENERY_RADIUS_MAX)
+    if keys == _active_chunks:
+        return np.zeros(0, dtype=np.intp)
+    _active_chunks = keys
+
+    origin_x, origin_z = get_origin()
+    loaded = [_chunk_cache.get(key) for key in keys]
+    SCENERY_X = np.concatenate([c.x for c in loaded]) - origin_x
+    SCENERY_Y = np.concatenate([c.y for c in loaded])
+    SCENERY_Z = np.concatenate([c.z for c in loaded]) - origin_z
+    SCENERY_SCALE = np.concatenate([c.scale for c in loaded])
+    SCENERY_KIND = np.concatenate([c.kind for c in loaded])
+
+    # живые — по доле на момент загрузки клетки; уже видимые клетки не трогаем
+    for key in set(_chunk_live) - set(keys):
+        del _chunk_live[key]
+    for key, chunk in zip(keys, loaded):
+        if key not in _chunk_live:
+            _chunk_live[key] = _ranks(len(chunk.x)) < _live_fraction
+    SCENERY_LIVE = np.concatenate([_chunk_live[key] for key in keys])
+    SCENERY_VERSION += 1
+    _reindex()
+
+    return np.arange(len(SCENERY_X))
+
+
+def update_scenery(plane_yaw_deg: float) -> np.ndarray:
     """
-    wx, wz = get_world_offset()
+    Обновляем позиции живых объектов (беговая дорожка).
+    Всё одним векторным проходом: считаем расстояния до самолёта,
+    выбираем слишком далёкие и разом переставляем их в передний сектор.
+    Далёкие сверх живой доли не переставляем, а гасим; недостающие
+    оживают там же, впереди (по REVIVE_PER_TICK за вызов).
+    Возвращает индексы изменившихся слотов.
+    В потоковом режиме вместо этого подгружаем/выгружаем клетки.
+    """
+    global SCENERY_VERSION
 
-    plane = (0.0, 1.0, 0.0, 0.0)  # y = 0
-    shadow_mat = _make_shadow_matrix(plane, light_pos)
+    if _chunk_cache is not None:
+        return _update_chunks()
 
-    glPushAttrib(GL_ENABLE_BIT | GL_CURRENT_BIT | GL_LIGHTING_BIT)
-    glDisable(GL_LIGHTING)
-    glDisable(GL_TEXTURE_2D)
+    plane_x, plane_z = get_world_offset()
 
-    glEnable(GL_BLEND)
-    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    live = np.flatnonzero(SCENERY_LIVE)
+    dx = SCENERY_X[live] - plane_x
+    dz = SCENERY_Z[live] - plane_z
+    far = live[dx * dx + dz * dz > (SCENERY_RADIUS_MAX * SCENERY_RADIUS_MAX)]
+
+    # ушли за спину: в пределах живой доли — вперёд, сверх неё — гаснут
+    keep = _rank[far] < _live_fraction
+    dying = far[~keep]
+    idx = far[keep]
+    # живых меньше, чем велит доля, — оживляем по рангу, по нескольку за раз
+    if len(live) - len(dying) < _live_target:
+        dead = np.flatnonzero(~SCENERY_LIVE & (_rank < _live_fraction))
+        reviving = dead[np.argsort(_rank[dead], kind="stable")[:REVIVE_PER_TICK]]
+        SCENERY_LIVE[reviving] = True
+        idx = np.concatenate([idx, reviving])
+    SCENERY_LIVE[dying] = False
+
+    count = idx.size
+    if count == 0 and len(dying) == 0:
+        return idx
 
-    glPushMatrix()
-    glMultMatrixf(shadow_mat)
+    yaw_rad = math.radians(plane_yaw_deg)
+    front_arc_rad = math.radians(FRONT_ARC_DEG)
 
-    # учитываем смещение мира
-    glTranslatef(-wx, 0.0, -wz)
+    angle = yaw_rad + _rng.uniform(-front_arc_rad, front_arc_rad, count)
+    r = _rng.uniform(SCENERY_RADIUS_MIN, SCENERY_RADIUS_MAX, count)
+    SCENERY_X[idx] = plane_x + np.sin(angle) * r
+    SCENERY_Z[idx] = plane_z + np.cos(angle) * r
+    SCENERY_Y[idx] = _ground_heights(SCENERY_X[idx], SCENERY_Z[idx])
+    SCENERY_VERSION += 1
+    _reindex(idx, dying)
 
-    # один общий цвет для всех теней
-    glColor4f(0.0, 0.0, 0.0, 0.45)
+    return np.concatenate([idx, dying])
 
-    for (x, z, scale) in TREES:
-        _draw_tree_shadow(x, z, scale)
 
-    for (x, z, scale) in HOUSES:
-        _draw_house_shadow(x, z, scale)
+# --------- столкновения ---------
+
+
+def _reindex(indices: np.ndarray | None = None, removed: np.ndarray | None = None) -> None:
+    """
+    Хэш столкновений за массивами (в нём только живые): indices —
+    переставленные или ожившие объекты (перекладываем только их), removed —
+    умершие, None — весь набор сменился.
+    """
+    global _grid_margin
+
+    origin_x, origin_z = get_origin()
+    if indices is None:
+        _grid.rebuild(SCENERY_X + origin_x, SCENERY_Z + origin_z, SCENERY_LIVE)
+        half = _BOX_HALF[SCENERY_KIND] * SCENERY_SCALE
+        _grid_margin = float(half.max()) if len(half) else 0.0
+        return
+    if removed is not None:
+        _grid.remove(removed)
+    _grid.move(indices, SCENERY_X[indices] + origin_x, SCENERY_Z[indices] + origin_z)
+    if len(indices):
+        half = _BOX_HALF[SCENERY_KIND[indices]] * SCENERY_SCALE[indices]
+        _grid_margin = max(_grid_margin, float(half.max()))
+
+
+def _candidate_boxes(xs: np.ndarray, zs: np.ndarray, reach,
+                     y_lo: np.ndarray, y_hi: np.ndarray):
+    """
+    Пары (запрос, объект) из хэша и коробки объектов: (lo, hi) — (K, 3)
+    в мировых координатах. xs/zs запросов — мировые, reach — полуразмер
+    по x/z, [y_lo, y_hi] — по высоте: пары, разошедшиеся по высоте
+    (самолёт над лесом — обычный случай), отсеиваем до сборки коробок.
+    """
+    origin_x, origin_z = get_origin()
+    query, item = _grid.candidates(np.asarray(xs) + origin_x, np.asarray(zs) + origin_z,
+                                   np.asarray(reach) + _grid_margin)
+    kind = SCENERY_KIND[item]
+    scale = SCENERY_SCALE[item]
+    ground = SCENERY_Y[item]
+    bottom = ground + _BOX_BOTTOM[kind] * scale
+    top = ground + _BOX_TOP[kind] * scale
+    near = (y_lo[query] <= top) & (y_hi[query] >= bottom)
+    query, item, kind, scale = query[near], item[near], kind[near], scale[near]
+
+    half = _BOX_HALF[kind] * scale
+    lo = np.stack([SCENERY_X[item] - half, bottom[near], SCENERY_Z[item] - half], axis=1)
+    hi = np.stack([SCENERY_X[item] + half, top[near], SCENERY_Z[item] + half], axis=1)
+    return query, item, kind, lo, hi
+
+
+def sphere_contacts(xs, ys, zs, radii) -> Contacts:
+    """
+    Какие сферы (центры в мировых координатах, как SCENERY_X) задевают
+    коробки деревьев и домов. Все сферы — одним векторным проходом;
+    перебираются только объекты из соседних клеток хэша.
+    """
+    xs = np.atleast_1d(np.asarray(xs, dtype=np.float64))
+    centers = np.stack([xs, np.broadcast_to(ys, xs.shape), np.broadcast_to(zs, xs.shape)],
+                       axis=1)
+    radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), xs.shape)
+
+    query, item, kind, lo, hi = _candidate_boxes(
+        centers[:, 0], centers[:, 2], radii, centers[:, 1] - radii, centers[:, 1] + radii)
+    # ближайшая к центру сферы точка коробки — не дальше радиуса
+    c = centers[query]
+    d = c - np.clip(c, lo, hi)
+    hit = np.einsum("ij,ij->i", d, d) <= radii[query] ** 2
+    return Contacts(query[hit], item[hit], kind[hit])
 
-    glPopMatrix()
 
-    glDisable(GL_BLEND)
-    glPopAttrib()
+def box_contacts(mins, maxs) -> Contacts:
+    """Какие коробки (mins/maxs — (N, 3), мировые) пересекают коробки объектов."""
+    mins = np.atleast_2d(np.asarray(mins, dtype=np.float64))
+    maxs = np.atleast_2d(np.asarray(maxs, dtype=np.float64))
+    centers = (mins + maxs) * 0.5
+    reach = (maxs[:, [0, 2]] - mins[:, [0, 2]]).max(axis=1) * 0.5
 
+    query, item, kind, lo, hi = _candidate_boxes(
+        centers[:, 0], centers[:, 2], reach, mins[:, 1], maxs[:, 1])
+    hit = np.all((mins[query] <= hi) & (maxs[query] >= lo), axis=1)
+    return Contacts(query[hit], item[hit], kind[hit])
 
-def draw_scenery():
-    """Отрисовываем деревья и домики с учётом WORLD_OFFSET."""
-    wx, wz = get_world_offset()
+
+# --------- перенос начала отсчёта ---------
+
+
+def _on_rebase(dx: float, dz: float) -> None:
+    """
+    Начало отсчёта переехало на (dx, dz): сдвигаем все объекты разом
+    (хэш в абсолютных координатах — его не трогаем).
+    """
+    SCENERY_X[:] -= dx
+    SCENERY_Z[:] -= dz
+
+
+register_rebase_listener(_on_rebase)
+
+
+def submit_scenery(frustum=None, eye=None) -> None:
+    """
+    Деревья и домики — в render_queue: по элементу на пачку вида и уровня
+    детализации, экземпляры в пачке от ближних к дальним (ранний Z).
+    Без инстансинга — по элементу "lit" на объект.
+    """
+    if USE_INSTANCING and instancing.available():
+        use_impostors = eye is not None and impostors.available()
+        mesh_batches, impostor_batches = lod_batches(frustum, eye, use_impostors)
+        for mesh, instances in mesh_batches:
+            instances = render_queue.front_to_back(instances, eye)
+            render_queue.submit("instanced", render_queue.nearest_depth(instances, eye),
+                                instancing.draw_instanced, mesh, instances)
+        for mesh, instances in impostor_batches:
+            instances = render_queue.front_to_back(instances, eye)
+            render_queue.submit("impostors", render_queue.nearest_depth(instances, eye),
+                                impostors.draw_impostors, mesh, instances, eye)
+        return
+
+    state = _drawn_state()
+    wx, wz = get_render_offset()
+    visible = _visible_mask(state, frustum)
+    for kind, draw in ((KIND_TREE, _draw_tree), (KIND_HOUSE, _draw_house)):
+        for (x, y, z, scale) in _iter_kind(state, kind, visible):
+            point = (x - wx, y, z - wz)
+            render_queue.submit("lit", render_queue.distance(eye, point), draw, *point, scale)
+
+
+def draw_scenery(frustum=None, eye=None):
+    """
+    Отрисовываем деревья и домики сразу, мимо очереди (карты теней, shadows.py),
+    с учётом WORLD_OFFSET.
+    frustum — плоскости Camera.frustum(): невидимые объекты не рисуем.
+    eye — позиция камеры для выбора LOD (None — всё полным мешем).
+    """
+    glstate.disable(GL_BLEND)
+
+    if USE_INSTANCING and instancing.available():
+        # один draw call на вид и уровень детализации
+        use_impostors = eye is not None and impostors.available()
+        mesh_batches, impostor_batches = lod_batches(frustum, eye, use_impostors)
+        for mesh, instances in mesh_batches:
+            instancing.draw_instanced(mesh, instances)
+        for mesh, instances in impostor_batches:
+            impostors.draw_impostors(mesh, instances, eye)
+        # программа остаётся привязанной между пачками, снимаем один раз
+        glstate.use_program(0)
+        return
+
+    glstate.enable(GL_LIGHTING)
+    glstate.disable(GL_TEXTURE_2D)
+
+    state = _drawn_state()
+    wx, wz = get_render_offset()
+    visible = _visible_mask(state, frustum)
 
     glPushMatrix()
     glTranslatef(-wx, 0.0, -wz)
 
-    for (x, z, scale) in TREES:
-        _draw_tree(x, z, scale)
+    for (x, y, z, scale) in _iter_kind(state, KIND_TREE, visible):
+        _draw_tree(x, y, z, scale)
 
-    for (x, z, scale) in HOUSES:
-        _draw_house(x, z, scale)
+    for (x, y, z, scale) in _iter_kind(state, KIND_HOUSE, visible):
+        _draw_house(x, y, z, scale)
 
     glPopMatrix()
@@ -1,5 +1,36 @@
 # shader.py
+"""
+Сборка шейдерных программ.
+
+- Собранная программа кэшируется на диске (glGetProgramBinary):
+  при следующем запуске она грузится через glProgramBinary без
+  компиляции GLSL. Ключ — хэш исходников, привязок атрибутов и строк
+  драйвера (GL_VENDOR / GL_RENDERER / GL_VERSION): другой драйвер или
+  правка шейдера — просто новый файл в кэше.
+- Кэш — только ускорение: драйвер без форматов бинарников, битый или
+  отвергнутый драйвером файл, ошибка записи — тихо собираем из исходников.
+- Каталог кэша — SHADER_CACHE_DIR (переменная окружения
+  FLYING_SHADER_CACHE), пустая строка выключает кэш.
+"""
+
+import hashlib
+import os
+
+import numpy as np
 from OpenGL.GL import *
+from OpenGL.error import GLError
+
+SHADER_CACHE_DIR = os.environ.get(
+    "FLYING_SHADER_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "flying-airplane", "shaders"),
+)
+
+# сколько программ взято из кэша, а сколько собрано из исходников
+CACHE_STATS = {"hits": 0, "misses": 0}
+
+# None — ещё не проверяли, умеет ли драйвер отдавать бинарники
+_binaries_supported: bool | None = None
+
 
 def load_shader(path):
     with open(path, "r") as f:
@@ -16,16 +47,34 @@ def compile_shader(source, shader_type):
 
     return shader
 
-def create_program(vertex_path, fragment_path):
+def create_program(vertex_path, fragment_path, attributes=None):
+    """
+    attributes — необязательный словарь {имя атрибута: номер},
+    номера привязываются до линковки (нужно шейдерам под GLSL 1.20,
+    где нет layout(location = N)).
+    """
     vert_src = load_shader(vertex_path)
     frag_src = load_shader(fragment_path)
 
+    key = _cache_key(vert_src, frag_src, attributes)
+    if key is not None:
+        program = _load_binary(key)
+        if program is not None:
+            CACHE_STATS["hits"] += 1
+            return program
+    CACHE_STATS["misses"] += 1
+
     vert = compile_shader(vert_src, GL_VERTEX_SHADER)
     frag = compile_shader(frag_src, GL_FRAGMENT_SHADER)
 
     program = glCreateProgram()
     glAttachShader(program, vert)
     glAttachShader(program, frag)
+    if attributes:
+        for name, location in attributes.items():
+            glBindAttribLocation(program, location, name)
+    if key is not None:
+        glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
     glLinkProgram(program)
 
     status = glGetProgramiv(program, GL_LINK_STATUS)
@@ -35,4 +84,87 @@ def create_program(vertex_path, fragment_path):
     glDeleteShader(vert)
     glDeleteShader(frag)
 
+    if key is not None:
+        _save_binary(key, program)
     return program
+
+
+# ============================================================
+#                  КЭШ БИНАРНИКОВ ПРОГРАММ
+# ============================================================
+def _cache_key(vert_src, frag_src, attributes) -> str | None:
+    """Имя файла в кэше или None, если кэш выключен / не поддерживается."""
+    global _binaries_supported
+
+    if not SHADER_CACHE_DIR:
+        return None
+    if _binaries_supported is None:
+        try:
+            _binaries_supported = (bool(glProgramBinary)
+                                   and glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0)
+        except GLError:
+            _binaries_supported = False
+    if not _binaries_supported:
+        return None
+
+    h = hashlib.sha256()
+    for part in (vert_src, frag_src, repr(sorted((attributes or {}).items())),
+                 glGetString(GL_VENDOR), glGetString(GL_RENDERER), glGetString(GL_VERSION)):
+        if isinstance(part, str):
+            part = part.encode()
+        h.update(part or b"")
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(SHADER_CACHE_DIR, key + ".bin")
+
+
+def _load_binary(key: str):
+    """Программа из кэша (или None: файла нет, он битый или драйвер не принял)."""
+    try:
+        with open(_cache_path(key), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) <= 4:
+        return None
+
+    # первые 4 байта — формат бинарника (GLenum), дальше — сам бинарник
+    binary_format = int.from_bytes(data[:4], "little")
+    binary = np.frombuffer(data, dtype=np.uint8, offset=4)
+
+    program = glCreateProgram()
+    try:
+        glProgramBinary(program, binary_format, binary, len(binary))
+        linked = glGetProgramiv(program, GL_LINK_STATUS)
+    except GLError:
+        linked = False
+    if not linked:
+        # драйвер обновился или файл испорчен — соберём и перезапишем
+        glDeleteProgram(program)
+        return None
+    return program
+
+
+def _save_binary(key: str, program) -> None:
+    """Бинарник программы — в кэш (атомарно: через временный файл)."""
+    try:
+        length = int(glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH))
+        if length <= 0:
+            return
+        binary = np.empty(length, dtype=np.uint8)
+        written = GLsizei(0)
+        binary_format = GLenum(0)
+        glGetProgramBinary(program, length, written, binary_format, binary)
+
+        os.makedirs(SHADER_CACHE_DIR, exist_ok=True)
+        path = _cache_path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(int(binary_format.value).to_bytes(4, "little"))
+            f.write(binary[:written.value].tobytes())
+        os.replace(tmp, path)
+    except (OSError, GLError) as exc:
+        print(f"[shader] кэш бинарников не записан: {exc}")
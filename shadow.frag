@@ -0,0 +1,27 @@
+#version 120
+
+// Карты глубины с аппаратным сравнением (и сглаживанием 2x2 на
+// GL_LINEAR): 1 — точка освещена, 0 — в тени. Тень забирает долю
+// uStrength прямого света, рассеянный остаётся. Всё, что дальше
+// дальней плоскости карты, сравниваем с ней же — иначе земля под
+// низко летящим самолётом целиком уходила бы в тень.
+
+uniform sampler2D uGround;
+uniform sampler2DShadow uStaticMap;
+uniform sampler2DShadow uPlaneMap;
+uniform float uStrength;
+
+varying vec3 vAmbient;
+varying vec3 vDiffuse;
+varying vec3 vStaticCoord;
+varying vec3 vPlaneCoord;
+
+void main()
+{
+    float lit = shadow2D(uStaticMap, vec3(vStaticCoord.xy, min(vStaticCoord.z, 1.0))).r;
+    // карта самолёта маленькая: вне её квадрата не читаем вовсе
+    if (all(greaterThan(vPlaneCoord.xy, vec2(0.0))) && all(lessThan(vPlaneCoord.xy, vec2(1.0))))
+        lit *= shadow2D(uPlaneMap, vec3(vPlaneCoord.xy, min(vPlaneCoord.z, 1.0))).r;
+    vec3 light = vAmbient + vDiffuse * (1.0 - uStrength * (1.0 - lit));
+    gl_FragColor = vec4(min(light, 1.0), 1.0) * texture2D(uGround, gl_TexCoord[0].st);
+}
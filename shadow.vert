@@ -0,0 +1,33 @@
+#version 120
+
+// Земля с тенями: освещение по вершинам — как у фиксированного конвейера
+// (GL_LIGHT0, GL_COLOR_MATERIAL, GL_MODULATE), плюс координаты вершины
+// в двух картах теней. Вершины — в локальных координатах, матрицы
+// переводят их сразу в [0, 1] по x, y и глубине карты.
+
+uniform mat4 uStaticMatrix;
+uniform mat4 uPlaneMatrix;
+
+varying vec3 vAmbient;
+varying vec3 vDiffuse;
+varying vec3 vStaticCoord;
+varying vec3 vPlaneCoord;
+
+void main()
+{
+    vec4 eyePos = gl_ModelViewMatrix * gl_Vertex;
+    vec3 normal = normalize(gl_NormalMatrix * gl_Normal);
+
+    vec3 lightDir = normalize(gl_LightSource[0].position.xyz - eyePos.xyz);
+    float diff = max(dot(normal, lightDir), 0.0);
+
+    vec3 base = gl_Color.rgb;
+    vAmbient = base * (gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb);
+    vDiffuse = base * gl_LightSource[0].diffuse.rgb * diff;
+
+    vStaticCoord = (uStaticMatrix * gl_Vertex).xyz;
+    vPlaneCoord = (uPlaneMatrix * gl_Vertex).xyz;
+
+    gl_TexCoord[0] = gl_MultiTexCoord0;
+    gl_Position = ftransform();
+}
@@ -0,0 +1,354 @@
+# shadows.py
+"""
+Тени по карте глубины (shadow mapping) вместо плоской проекции на y = 0.
+
+- Карта глубины рисуется из светила (lighting.get_sun_position()) в FBO
+  с текстурой GL_DEPTH_COMPONENT; разрешение задаётся в init_shadows().
+- Свет считаем направленным (солнце далеко), проекция ортографическая.
+- Карт две:
+    * статическая (SHADOW_MAP_SIZE) — земля, деревья и дома в квадрате
+      2 * SHADOW_RADIUS вокруг точки, привязанной к АБСОЛЮТНЫМ координатам.
+      Перерисовывается, только если сменилось время суток, самолёт ушёл
+      от центра карты дальше SHADOW_RECENTER или переставились объекты
+      (scenery.scenery_version(); не чаще раза в SHADOW_REFRESH_FRAMES
+      кадров — новые объекты появляются далеко впереди).
+      Перенос начала отсчёта карту не портит;
+    * карта самолёта (SHADOW_PLANE_MAP_SIZE) — маленький квадрат вокруг
+      него; перерисовывается, только если поменялась поза самолёта
+      (в ровном полёте она постоянна — мир едет под ним).
+- Приёмник — земля: между bind_receiver() и unbind_receiver() она
+  рисуется шейдером shadow.vert / shadow.frag — тот же свет по вершинам
+  и текстура, что у фиксированного конвейера, но прямой свет в тени
+  ослаблен на SHADOW_STRENGTH. Отдельного прохода по экрану нет.
+- Только для фиксированного конвейера (main.display); если FBO или
+  шейдер недоступны, init_shadows() вернёт False и теней просто нет.
+"""
+
+import math
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.error import GLError
+
+import glstate
+from frustum import frustum_planes
+from lighting import get_sun_position
+from scenery import draw_scenery, scenery_version
+from shader import create_program
+from terrain import get_render_offset, get_render_origin, ground_grid, ground_indices
+from transforms import gl_matrix, look_at, orthographic
+
+SHADOW_MAP_SIZE = 2048
+SHADOW_PLANE_MAP_SIZE = 512
+
+# полуразмер статической карты и насколько от её центра можно улететь
+SHADOW_RADIUS = 260.0
+SHADOW_RECENTER = 60.0
+
+# полуразмер карты самолёта (размах крыльев с масштабом x2 — около 26)
+SHADOW_PLANE_RADIUS = 16.0
+
+# откуда «смотрит» свет: расстояние от центра карты вдоль направления на светило
+SHADOW_LIGHT_DISTANCE = 600.0
+SHADOW_PLANE_LIGHT_DISTANCE = 100.0
+
+# переставленные объекты догоняем не чаще, чем раз в столько кадров
+SHADOW_REFRESH_FRAMES = 15
+
+# какую долю прямого света забирает тень (рассеянный остаётся)
+SHADOW_STRENGTH = 0.7
+
+# сдвиг глубины при записи карты — против «теневых прыщей» (shadow acne)
+SHADOW_OFFSET_FACTOR = 2.0
+SHADOW_OFFSET_UNITS = 4.0
+
+# текстурные блоки карт (0-й — под текстуру земли и кэш glstate)
+STATIC_MAP_UNIT = 1
+PLANE_MAP_UNIT = 2
+
+# [-1, 1] -> [0, 1] по всем трём осям
+_BIAS = np.array([
+    [0.5, 0.0, 0.0, 0.5],
+    [0.0, 0.5, 0.0, 0.5],
+    [0.0, 0.0, 0.5, 0.5],
+    [0.0, 0.0, 0.0, 1.0],
+], dtype=np.float32)
+
+# сколько раз перерисованы карты (для HUD и benchmark.py)
+STATS = {"static_renders": 0, "plane_renders": 0}
+
+
+class ShadowMap:
+    """Текстура глубины size x size и FBO, в который её рисуем."""
+
+    def __init__(self, size: int, unit: int):
+        self.size = size
+        self.unit = unit
+
+        # текстуру настраиваем на своём блоке: кэш glstate следит за 0-м
+        glActiveTexture(GL_TEXTURE0 + unit)
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_DEPTH_COMPONENT24, size, size, 0,
+                     GL_DEPTH_COMPONENT, GL_FLOAT, None)
+        # GL_LINEAR + сравнение — аппаратное сглаживание края по 4 texel
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        # за краем карты глубина 1.0 — «ничего не заслоняет»
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_BORDER)
+        glTexParameterfv(GL_TEXTURE_2D, GL_TEXTURE_BORDER_COLOR, (1.0, 1.0, 1.0, 1.0))
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_COMPARE_MODE, GL_COMPARE_REF_TO_TEXTURE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_COMPARE_FUNC, GL_LEQUAL)
+        glActiveTexture(GL_TEXTURE0)
+
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT,
+                               GL_TEXTURE_2D, self.texture, 0)
+        # цвета нет — только глубина
+        glDrawBuffer(GL_NONE)
+        glReadBuffer(GL_NONE)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            self.delete()
+            raise RuntimeError(f"FBO карты теней неполный: 0x{int(status):x}")
+
+    def delete(self) -> None:
+        glDeleteFramebuffers(1, [self.fbo])
+        glDeleteTextures([self.texture])
+
+
+_program = None
+_uniforms: dict[str, int] = {}
+
+_static_map: ShadowMap | None = None
+_plane_map: ShadowMap | None = None
+
+# центр статической карты в абсолютных координатах (x, z) и для какого
+# направления света, какого поколения объектов и на каком кадре она нарисована
+_static_center: tuple[float, float] | None = None
+_static_light: tuple | None = None
+_static_version: int = -1
+_static_frame: int = 0
+_frame: int = 0
+
+# поза самолёта (матрица модели) и свет, под которые нарисована его карта
+_plane_key: tuple | None = None
+
+# матрицы «локальные координаты -> координаты карты» на этот кадр
+_static_matrix = np.identity(4, dtype=np.float32)
+_plane_matrix = np.identity(4, dtype=np.float32)
+
+
+def init_shadows(size: int = SHADOW_MAP_SIZE,
+                 plane_size: int = SHADOW_PLANE_MAP_SIZE) -> bool:
+    """
+    Создаём карты теней (повторный вызов — пересоздаёт под новый размер).
+    Контекст OpenGL уже должен быть. False — тени недоступны.
+    """
+    global _program, _static_map, _plane_map
+
+    release_shadows()
+
+    if not bool(glGenFramebuffers):
+        print("[shadows] отключены: нет framebuffer object")
+        return False
+
+    try:
+        if _program is None:
+            _program = create_program("shadow.vert", "shadow.frag")
+            for name in ("uStaticMatrix", "uPlaneMatrix", "uGround",
+                         "uStaticMap", "uPlaneMap", "uStrength"):
+                _uniforms[name] = glGetUniformLocation(_program, name)
+        _static_map = ShadowMap(size, STATIC_MAP_UNIT)
+        _plane_map = ShadowMap(plane_size, PLANE_MAP_UNIT)
+    except (RuntimeError, GLError) as exc:
+        print(f"[shadows] отключены: {exc}")
+        release_shadows()
+        return False
+
+    glPolygonOffset(SHADOW_OFFSET_FACTOR, SHADOW_OFFSET_UNITS)
+    return True
+
+
+def release_shadows() -> None:
+    """Удаляем карты (например, перед сменой разрешения)."""
+    global _static_map, _plane_map, _static_center, _plane_key
+
+    for shadow_map in (_static_map, _plane_map):
+        if shadow_map is not None:
+            shadow_map.delete()
+    _static_map = None
+    _plane_map = None
+    _static_center = None
+    _plane_key = None
+
+
+def available() -> bool:
+    return _static_map is not None
+
+
+def _light_direction() -> np.ndarray:
+    """Единичный вектор на светило (свет направленный — берём только направление)."""
+    sun = np.asarray(get_sun_position(), dtype=np.float64)
+    return sun / np.linalg.norm(sun)
+
+
+def _light_view(target, direction: np.ndarray, distance: float) -> np.ndarray:
+    """Вид из светила на target; при свете строго сверху «верх» карты — ось z."""
+    up = (0.0, 0.0, 1.0) if abs(direction[1]) > 0.99 else (0.0, 1.0, 0.0)
+    target = np.asarray(target, dtype=np.float64)
+    return look_at(target + direction * distance, target, up)
+
+
+def _render_depth(shadow_map: ShadowMap, projection: np.ndarray,
+                  view: np.ndarray, draw) -> None:
+    """Рисуем draw() в карту глубины с матрицами света; вид кадра не трогаем."""
+    viewport = glGetIntegerv(GL_VIEWPORT)
+    # кадр может рисоваться не в окно, а в FBO (dynres.py) — вернём его же
+    framebuffer = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+
+    glBindFramebuffer(GL_FRAMEBUFFER, shadow_map.fbo)
+    glViewport(0, 0, shadow_map.size, shadow_map.size)
+    glClear(GL_DEPTH_BUFFER_BIT)
+    glstate.enable(GL_POLYGON_OFFSET_FILL)
+
+    glMatrixMode(GL_PROJECTION)
+    glPushMatrix()
+    glLoadMatrixf(gl_matrix(projection))
+    glMatrixMode(GL_MODELVIEW)
+    glPushMatrix()
+    glLoadMatrixf(gl_matrix(view))
+
+    draw()
+
+    glMatrixMode(GL_PROJECTION)
+    glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
+    glPopMatrix()
+
+    glstate.disable(GL_POLYGON_OFFSET_FILL)
+    glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+    glViewport(*viewport)
+
+
+def _draw_ground_depth(yaw_deg: float) -> None:
+    """Только геометрия земли — без текстуры и нормалей."""
+    positions, _, _ = ground_grid(yaw_deg)
+    indices = ground_indices()
+
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, positions)
+    glDrawElements(GL_TRIANGLES, len(indices), GL_UNSIGNED_INT, indices)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+
+def _static_dirty(plane_abs, light) -> bool:
+    """Пора ли перерисовать статическую карту."""
+    if _static_center is None or light != _static_light:
+        return True
+    if math.hypot(plane_abs[0] - _static_center[0],
+                  plane_abs[1] - _static_center[1]) > SHADOW_RECENTER:
+        return True
+    return (scenery_version() != _static_version
+            and _frame - _static_frame >= SHADOW_REFRESH_FRAMES)
+
+
+def update_shadows(airplane, yaw_deg: float = 0.0) -> bool:
+    """
+    Раз в кадр, до отрисовки земли: перерисовываем карты, если нужно, и
+    считаем матрицы для приёмника. Возвращает True, если статическая
+    карта перерисована в этом кадре.
+    """
+    global _static_center, _static_light, _static_version, _static_frame
+    global _frame, _plane_key, _static_matrix, _plane_matrix
+
+    if _static_map is None:
+        return False
+    _frame += 1
+
+    direction = _light_direction()
+    light = tuple(direction.tolist())
+
+    # всё считаем в локальных координатах кадра (самолёт около нуля),
+    # центр карты храним в абсолютных — переносы начала ему не страшны
+    wx, wz = get_render_offset()
+    ox, oz = get_render_origin()
+    plane_abs = (ox + wx, oz + wz)
+
+    rendered = False
+    if _static_dirty(plane_abs, light):
+        _static_center = plane_abs
+        _static_light = light
+        _static_version = scenery_version()
+        _static_frame = _frame
+        rendered = True
+
+    center = (_static_center[0] - plane_abs[0], 0.0, _static_center[1] - plane_abs[1])
+    view = _light_view(center, direction, SHADOW_LIGHT_DISTANCE)
+    depth = SHADOW_RADIUS + 50.0
+    projection = orthographic(-SHADOW_RADIUS, SHADOW_RADIUS,
+                              -SHADOW_RADIUS, SHADOW_RADIUS,
+                              SHADOW_LIGHT_DISTANCE - depth,
+                              SHADOW_LIGHT_DISTANCE + depth)
+    view_proj = projection @ view
+
+    if rendered:
+        def draw_static():
+            glstate.disable(GL_LIGHTING)
+            glstate.disable(GL_TEXTURE_2D)
+            _draw_ground_depth(yaw_deg)
+            draw_scenery(frustum_planes(view_proj))
+
+        _render_depth(_static_map, projection, view, draw_static)
+        STATS["static_renders"] += 1
+    _static_matrix = _BIAS @ view_proj
+
+    if airplane is not None:
+        model = airplane.model_matrix()
+        key = (model.tobytes(), light)
+        view = _light_view(model[0:3, 3], direction, SHADOW_PLANE_LIGHT_DISTANCE)
+        projection = orthographic(-SHADOW_PLANE_RADIUS, SHADOW_PLANE_RADIUS,
+                                  -SHADOW_PLANE_RADIUS, SHADOW_PLANE_RADIUS,
+                                  SHADOW_PLANE_LIGHT_DISTANCE - SHADOW_PLANE_RADIUS,
+                                  SHADOW_PLANE_LIGHT_DISTANCE + SHADOW_PLANE_RADIUS)
+        if key != _plane_key:
+            _render_depth(_plane_map, projection, view, airplane.draw)
+            _plane_key = key
+            STATS["plane_renders"] += 1
+        _plane_matrix = _BIAS @ projection @ view
+
+    return rendered
+
+
+def bind_receiver() -> bool:
+    """
+    Следующая draw_ground_mesh() рисуется шейдером shadow.vert / shadow.frag:
+    тот же свет и текстура, но с тенями. После неё — unbind_receiver().
+    False — теней нет, земля рисуется как обычно.
+    """
+    if _static_map is None:
+        return False
+
+    glActiveTexture(GL_TEXTURE0 + STATIC_MAP_UNIT)
+    glBindTexture(GL_TEXTURE_2D, _static_map.texture)
+    glActiveTexture(GL_TEXTURE0 + PLANE_MAP_UNIT)
+    glBindTexture(GL_TEXTURE_2D, _plane_map.texture)
+    glActiveTexture(GL_TEXTURE0)
+
+    glstate.use_program(_program)
+    glUniformMatrix4fv(_uniforms["uStaticMatrix"], 1, GL_TRUE, _static_matrix)
+    glUniformMatrix4fv(_uniforms["uPlaneMatrix"], 1, GL_TRUE, _plane_matrix)
+    glUniform1i(_uniforms["uGround"], 0)
+    glUniform1i(_uniforms["uStaticMap"], STATIC_MAP_UNIT)
+    glUniform1i(_uniforms["uPlaneMap"], PLANE_MAP_UNIT)
+    glUniform1f(_uniforms["uStrength"], SHADOW_STRENGTH)
+    return True
+
+
+def unbind_receiver() -> None:
+    """Обратно к фиксированному конвейеру."""
+    glstate.use_program(0)
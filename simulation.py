@@ -0,0 +1,303 @@
+# simulation.py
+"""
+Симуляция с фиксированным шагом, отдельно от отрисовки.
+
+- Самолёты (игрок и трафик, fleet.py), беговая дорожка деревьев и
+  облака обновляются ровно
+  SIM_RATE раз в секунду (dt всегда SIM_DT), независимо от FPS.
+- Можно крутить в отдельном потоке (start_simulation) — тогда тяжёлый
+  кадр не тормозит симуляцию и наоборот; или шагать из idle()
+  (advance_simulation) — тоже фиксированными шагами с накопителем.
+- После каждого тика публикуется неизменяемый снимок Snapshot; хранятся
+  два последних. present() ставит отрисовку на снимки: мир и самолёт
+  интерполируются между ними, деревья и облака берутся из последнего.
+- Ввод (рули самолёта и плотность мира от governor.py) не трогает мир
+  напрямую, а копится в очереди и применяется в начале ближайшего тика
+  (post_input).
+- В конце тика все самолёты флота проверяются на касание деревьев и
+  домов (scenery.sphere_contacts); результат — last_contacts().
+"""
+
+import copy
+import ctypes
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+import clouds
+import fleet
+import governor
+import recording
+import scenery
+import terrain
+
+SIM_RATE = 120
+SIM_DT = 1.0 / SIM_RATE
+
+# сколько тиков максимум догоняем за раз (иначе «спираль смерти»)
+MAX_CATCHUP_TICKS = 8
+
+
+class Snapshot(NamedTuple):
+    """Состояние мира после тика. Все поля только для чтения."""
+    tick: int
+    published: float                 # time.perf_counter() публикации
+    world_x: float                   # смещение мира от начала отсчёта
+    world_z: float
+    origin_x: float                  # начало отсчёта (terrain.ORIGIN)
+    origin_z: float
+    plane: tuple                     # (y, yaw, pitch, roll, speed)
+    scenery: scenery.SceneryState
+    clouds: clouds.CloudState
+    fleet: fleet.FleetState          # трафик (без самолёта игрока)
+
+
+# самолёт, которым владеет симуляция (со своей копией флота; отрисовка
+# видит только снимки)
+_airplane = None
+_tick: int = 0
+
+# очередь ввода: (действие, значение), разбирается в начале тика
+_inputs: deque = deque()
+
+# два последних снимка: (предыдущий, последний) — меняются одной ссылкой
+_snapshots: tuple[Snapshot, Snapshot] | None = None
+
+_thread: threading.Thread | None = None
+_stop = threading.Event()
+_accumulator: float = 0.0
+
+# касания самолётов (номера слотов флота) с объектами за последний тик
+_contacts: scenery.Contacts | None = None
+
+# счётчики для HUD: тиков всего, пропущено (не успели догнать),
+# касаний в последнем тике
+SIM_STATS = {"ticks": 0, "dropped": 0, "tick_ms": 0.0, "contacts": 0}
+
+
+def apply_input(airplane, action: str, value: float = 0.0) -> None:
+    """Применить одно действие управления к самолёту (или плотность мира)."""
+    if action == "yaw":
+        airplane.change_yaw(value)
+    elif action == "pitch":
+        airplane.change_pitch(value)
+    elif action == "roll":
+        airplane.change_roll(value)
+    elif action == "speed":
+        airplane.change_speed(value)
+    elif action == "reset":
+        airplane.reset_orientation()
+    elif action == "density":
+        governor.apply_density(value)
+    else:
+        raise ValueError(f"неизвестное действие: {action}")
+
+
+def init_simulation(airplane) -> None:
+    """
+    Симуляция получает свою копию самолёта вместе с флотом (меш общий),
+    дальше двигает только её. Первый снимок публикуется сразу.
+    """
+    global _airplane, _tick, _snapshots, _accumulator
+    _airplane = copy.copy(airplane)
+    _tick = 0
+    _accumulator = 0.0
+    _inputs.clear()
+    SIM_STATS.update(ticks=0, dropped=0, tick_ms=0.0, contacts=0)
+
+    first = _make_snapshot(scenery.scenery_state(), clouds.cloud_state())
+    _snapshots = (first, first)
+
+
+def post_input(action: str, value: float = 0.0) -> None:
+    """
+    Положить действие в очередь (можно из любого потока).
+    Значение сразу округляем до float32 — как оно ляжет в запись
+    (recording.py), иначе воспроизведение разойдётся с полётом.
+    """
+    _inputs.append((action, ctypes.c_float(value).value))
+
+
+def current_tick() -> int:
+    """Сколько тиков сделано с init_simulation()."""
+    return _tick
+
+
+def latest_snapshot() -> Snapshot:
+    return _snapshots[1]
+
+
+def _make_snapshot(scenery_state, cloud_state) -> Snapshot:
+    a = _airplane
+    wx, wz = terrain.get_world_offset()
+    ox, oz = terrain.get_origin()
+    return Snapshot(
+        _tick, time.perf_counter(), wx, wz, ox, oz,
+        (a.y, a.yaw, a.pitch, a.roll, a.speed),
+        scenery_state, cloud_state, fleet.traffic_state(a.fleet),
+    )
+
+
+def step() -> Snapshot:
+    """Один тик симуляции фиксированной длины SIM_DT."""
+    global _tick, _snapshots
+
+    started = time.perf_counter()
+    while _inputs:
+        action, value = _inputs.popleft()
+        recording.record_event(_tick, action, value)
+        apply_input(_airplane, action, value)
+
+    # игрок и весь трафик — одним векторным шагом
+    _airplane.fleet.update(SIM_DT)
+    respawned = scenery.update_scenery(_airplane.yaw)
+    respawned_clouds = clouds.update_clouds(_airplane.yaw)
+    _check_contacts()
+    _tick += 1
+
+    # массивы копируем, только если что-то переставилось или начало
+    # отсчёта переехало (тогда сдвинулись все координаты)
+    previous = _snapshots[1]
+    rebased = terrain.get_origin() != (previous.origin_x, previous.origin_z)
+    scenery_state = (scenery.scenery_state() if len(respawned) or rebased
+                     else previous.scenery)
+    cloud_state = (clouds.cloud_state() if len(respawned_clouds) or rebased
+                   else previous.clouds)
+    snapshot = _make_snapshot(scenery_state, cloud_state)
+
+    # публикация — одно присваивание, читатель видит либо старую пару, либо новую
+    _snapshots = (previous, snapshot)
+
+    SIM_STATS["ticks"] += 1
+    SIM_STATS["tick_ms"] = (time.perf_counter() - started) * 1000.0
+    return snapshot
+
+
+def _check_contacts() -> None:
+    """Сферы всех самолётов флота против деревьев и домов (через хэш)."""
+    global _contacts
+    xs, ys, zs = _airplane.fleet.world_positions()
+    _contacts = scenery.sphere_contacts(xs, ys, zs, fleet.AIRCRAFT_RADIUS)
+    SIM_STATS["contacts"] = len(_contacts.query)
+
+
+def last_contacts() -> scenery.Contacts | None:
+    """Касания за последний тик: query — слот флота, item — номер объекта."""
+    return _contacts
+
+
+def advance_simulation(dt: float) -> int:
+    """
+    Без потока: накопить dt реального времени и сделать столько целых
+    тиков, сколько влезло. Возвращает число тиков.
+    """
+    global _accumulator
+    _accumulator += dt
+    ticks = 0
+    while _accumulator >= SIM_DT:
+        if ticks == MAX_CATCHUP_TICKS:
+            SIM_STATS["dropped"] += int(_accumulator / SIM_DT)
+            _accumulator = 0.0
+            break
+        step()
+        _accumulator -= SIM_DT
+        ticks += 1
+    return ticks
+
+
+def _run() -> None:
+    next_tick = time.perf_counter()
+    while not _stop.is_set():
+        now = time.perf_counter()
+        if now < next_tick:
+            _stop.wait(next_tick - now)
+            continue
+
+        ticks = 0
+        while now >= next_tick and ticks < MAX_CATCHUP_TICKS:
+            step()
+            next_tick += SIM_DT
+            ticks += 1
+
+        # совсем отстали — не догоняем, а пропускаем
+        if now >= next_tick:
+            SIM_STATS["dropped"] += int((now - next_tick) / SIM_DT) + 1
+            next_tick = now + SIM_DT
+
+
+def start_simulation() -> None:
+    """Запустить тики в фоновом потоке (daemon — не держит выход)."""
+    global _thread
+    if _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="simulation", daemon=True)
+    _thread.start()
+
+
+def stop_simulation() -> None:
+    """Остановить поток и вернуть отрисовку на живые массивы."""
+    global _thread
+    if _thread is not None:
+        _stop.set()
+        _thread.join()
+        _thread = None
+    terrain.set_render_offset(None)
+    scenery.set_render_state(None)
+    clouds.set_render_state(None)
+    fleet.set_render_state(None)
+
+
+def _lerp_angle(a: float, b: float, t: float) -> float:
+    """Интерполяция угла в градусах по кратчайшей дуге (359 -> 1 через 0)."""
+    delta = (b - a + 180.0) % 360.0 - 180.0
+    return (a + delta * t) % 360.0
+
+
+def present(airplane) -> float:
+    """
+    Поставить отрисовку на интерполяцию двух последних снимков:
+    render offset мира, снимки деревьев и облаков, трафик, поза самолёта airplane
+    (самолёт отрисовки, не симуляции). Возвращает коэффициент alpha.
+    """
+    if _snapshots is None:
+        return 1.0
+    previous, latest = _snapshots
+
+    # сколько прошло с последнего тика, в долях тика
+    alpha = (time.perf_counter() - latest.published) / SIM_DT
+    alpha = min(max(alpha, 0.0), 1.0)
+    # рисуем на тик позади: между предыдущим и последним снимком
+    t = alpha if previous is not latest else 1.0
+
+    # между снимками могло переехать начало отсчёта: интерполируем
+    # абсолютные позиции и считаем смещение от начала последнего снимка
+    dx = (latest.origin_x - previous.origin_x) + (latest.world_x - previous.world_x)
+    dz = (latest.origin_z - previous.origin_z) + (latest.world_z - previous.world_z)
+    terrain.set_render_offset(
+        (latest.world_x - dx * (1.0 - t), latest.world_z - dz * (1.0 - t)),
+        (latest.origin_x, latest.origin_z),
+    )
+    scenery.set_render_state(latest.scenery)
+    clouds.set_render_state(latest.clouds)
+    fleet.set_render_state(fleet.lerp_state(previous.fleet, latest.fleet, t))
+
+    y0, yaw0, pitch0, roll0, _ = previous.plane
+    y1, yaw1, pitch1, roll1, speed = latest.plane
+    airplane.y = y0 + (y1 - y0) * t
+    airplane.yaw = _lerp_angle(yaw0, yaw1, t)
+    airplane.pitch = pitch0 + (pitch1 - pitch0) * t
+    airplane.roll = roll0 + (roll1 - roll0) * t
+    airplane.speed = speed
+    return t
+
+
+def running() -> bool:
+    """Крутится ли симуляция в своём потоке."""
+    return _thread is not None
+
+
+def active() -> bool:
+    """Инициализирована ли симуляция с фиксированным шагом."""
+    return _snapshots is not None
@@ -0,0 +1,163 @@
+# spatial.py
+"""
+Пространственный хэш на плоскости XZ: кто стоит рядом с точкой.
+
+- Мир разбит на клетки cell_size x cell_size; клетка — ключ словаря,
+  значение — множество номеров объектов, чей центр в ней лежит.
+- Поддерживается пошагово: move() перекладывает только переставленные
+  объекты (беговая дорожка переставляет единицы за тик), remove()
+  вынимает умершие, rebuild() — пакетно, когда сменился весь набор
+  (init, новые клетки chunks.py). Вынутый объект возвращается move().
+- candidates() отвечает сразу на много запросов: для каждого — объекты
+  в клетках, которые задевает квадрат ±reach вокруг точки. Стоимость
+  зависит от числа запросов и задетых клеток, а не от числа объектов.
+- Координаты — любые, лишь бы одни и те же у объектов и запросов
+  (scenery.py отдаёт абсолютные: переносы начала отсчёта хэш не трогают).
+"""
+
+import numpy as np
+
+_EMPTY = np.zeros(0, dtype=np.intp)
+
+
+def _cell_keys(ix: np.ndarray, iz: np.ndarray) -> np.ndarray:
+    """
+    Номер клетки (ix, iz) одним int64 — ключ словаря: ix в старших 32
+    битах, iz — в младших (сдвиг и маска, без переполнения умножения).
+    """
+    return (ix << 32) | (iz & 0xFFFFFFFF)
+
+
+class SpatialHash:
+    """Однородная сетка над объектами 0..n-1 (по их центрам)."""
+
+    def __init__(self, cell_size: float):
+        self.cell_size = float(cell_size)
+        self._cells: dict[int, set[int]] = {}
+        # номера объектов клетки массивом — собираются при первом запросе
+        self._arrays: dict[int, np.ndarray] = {}
+        # клетка каждого объекта (по номеру объекта) и лежит ли он в хэше;
+        # ключи занимают весь int64, поэтому «вынут» — отдельной маской
+        self._item_keys = np.zeros(0, dtype=np.int64)
+        self._present = np.zeros(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._item_keys)
+
+    def _keys(self, xs, zs) -> np.ndarray:
+        ix = np.floor(np.asarray(xs) / self.cell_size).astype(np.int64)
+        iz = np.floor(np.asarray(zs) / self.cell_size).astype(np.int64)
+        return _cell_keys(ix, iz)
+
+    def rebuild(self, xs: np.ndarray, zs: np.ndarray, present: np.ndarray | None = None) -> None:
+        """
+        Заново разложить все объекты (номер объекта = индекс в xs/zs);
+        present — маска тех, кто в хэше (None — все).
+        """
+        keys = self._keys(xs, zs)
+        if present is None:
+            present = np.ones(len(keys), dtype=bool)
+        inside = np.flatnonzero(present)
+        self._item_keys = keys
+        self._present = np.array(present, dtype=bool)
+        self._arrays = {}
+        if len(inside) == 0:
+            self._cells = {}
+            return
+        order = inside[np.argsort(keys[inside], kind="stable")]
+        uniq, starts = np.unique(keys[order], return_index=True)
+        bounds = np.append(starts, len(order)).tolist()
+        items = order.tolist()
+        self._cells = {
+            key: set(items[bounds[k]:bounds[k + 1]])
+            for k, key in enumerate(uniq.tolist())
+        }
+
+    def move(self, indices: np.ndarray, xs: np.ndarray, zs: np.ndarray) -> None:
+        """Объекты indices переехали в (xs, zs): перекладываем только их."""
+        if len(indices) == 0:
+            return
+        new_keys = self._keys(xs, zs)
+        old_keys = self._item_keys[indices]
+        was_present = self._present[indices]
+        # вынутый объект возвращается, даже если ключ клетки тот же
+        changed = np.flatnonzero((new_keys != old_keys) | ~was_present)
+        cells = self._cells
+        for i, old, new, present in zip(indices[changed].tolist(),
+                                        old_keys[changed].tolist(),
+                                        new_keys[changed].tolist(),
+                                        was_present[changed].tolist()):
+            if present:
+                self._discard(i, old)
+            cells.setdefault(new, set()).add(i)
+            self._arrays.pop(new, None)
+        self._item_keys[indices] = new_keys
+        self._present[indices] = True
+
+    def remove(self, indices: np.ndarray) -> None:
+        """Вынуть объекты indices (в запросы больше не попадают)."""
+        indices = indices[self._present[indices]]
+        for i, old in zip(indices.tolist(), self._item_keys[indices].tolist()):
+            self._discard(i, old)
+        self._present[indices] = False
+
+    def _discard(self, item: int, key: int) -> None:
+        bucket = self._cells[key]
+        bucket.discard(item)
+        if not bucket:
+            del self._cells[key]
+        self._arrays.pop(key, None)
+
+    def _cell_items(self, key: int) -> np.ndarray:
+        items = self._arrays.get(key)
+        if items is None:
+            bucket = self._cells.get(key)
+            items = (np.fromiter(bucket, dtype=np.intp, count=len(bucket))
+                     if bucket else _EMPTY)
+            self._arrays[key] = items
+        return items
+
+    def candidates(self, xs, zs, reach) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Кандидаты для запросов (xs[q], zs[q]): объекты из клеток, которые
+        задевает квадрат ±reach[q]. Возвращает пары (номер запроса, номер
+        объекта), без повторов; проверка формы — у вызывающего.
+        """
+        xs = np.atleast_1d(np.asarray(xs, dtype=np.float64))
+        zs = np.atleast_1d(np.asarray(zs, dtype=np.float64))
+        if len(xs) == 0 or not self._cells:
+            return _EMPTY, _EMPTY
+        reach = np.broadcast_to(np.asarray(reach, dtype=np.float64), xs.shape)
+
+        size = self.cell_size
+        x0 = np.floor((xs - reach) / size).astype(np.int64)
+        x1 = np.floor((xs + reach) / size).astype(np.int64)
+        z0 = np.floor((zs - reach) / size).astype(np.int64)
+        z1 = np.floor((zs + reach) / size).astype(np.int64)
+
+        # все клетки каждого запроса: прямоугольник до span_x x span_z
+        span_x = int((x1 - x0).max()) + 1
+        span_z = int((z1 - z0).max()) + 1
+        ox, oz = np.meshgrid(np.arange(span_x), np.arange(span_z), indexing="ij")
+        cx = x0[:, None] + ox.ravel()[None, :]
+        cz = z0[:, None] + oz.ravel()[None, :]
+        inside = (cx <= x1[:, None]) & (cz <= z1[:, None])
+        queries = np.broadcast_to(np.arange(len(xs))[:, None], cx.shape)[inside]
+        keys = _cell_keys(cx[inside], cz[inside])
+
+        # словарь спрашиваем один раз на клетку, сколько бы запросов её ни задело
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(uniq) + 1)).tolist()
+
+        query_parts, item_parts = [], []
+        for k, key in enumerate(uniq.tolist()):
+            if key not in self._cells:
+                continue
+            items = self._cell_items(key)
+            qs = queries[order[bounds[k]:bounds[k + 1]]]
+            query_parts.append(np.repeat(qs, len(items)))
+            item_parts.append(np.tile(items, len(qs)))
+        if not query_parts:
+            return _EMPTY, _EMPTY
+        return np.concatenate(query_parts), np.concatenate(item_parts)
@@ -2,7 +2,7 @@
 """
 Лёгкая "бесконечная" земля:
 
-- Геометрия: один квадрат (plane) вокруг самолёта в ЛОКАЛЬНЫХ координатах.
+- Геометрия: квадратная сетка вокруг самолёта в ЛОКАЛЬНЫХ координатах.
 - Самолёт живёт около (0, 0), камера смотрит на него.
 - WORLD_OFFSET_X/Z хранят, насколько далеко "улетел" самолёт по миру.
 - Текстура земли считается из МИРОВЫХ координат (x_world, z_world),
@@ -10,20 +10,100 @@
 - Квадрат земли дополнительно сдвигаем НАЗАД по курсу самолёта,
   чтобы деревья/домики впереди не вылезали из текстуры.
 
-Высота земли = 0.0 везде (плоская поверхность).
+Рельеф — процедурная карта высот:
+
+- Мир разбит на тайлы TILE_SIZE x TILE_SIZE; высоты тайла (TILE_RES x TILE_RES
+  узлов) генерируются векторным шумом (fBm из value noise) целиком.
+- Тайлы лежат в LRU-кэше на TILE_CACHE_SIZE штук.
+- terrain_height_world(xs, zs) принимает и числа, и целые массивы
+  координат: билинейная выборка по тайлам делается пакетно, так что
+  тысячи объектов ставятся на землю одним вызовом.
+
+Симуляция может идти в отдельном потоке (simulation.py): WORLD_OFFSET
+двигает она, а кадр рисуется под «render offset» — смещением,
+интерполированным между её тиками (set_render_offset).
+
+Плавающее начало координат (floating origin):
+
+- «Мировые» координаты (WORLD_OFFSET, деревья, облака) отсчитываются от
+  ORIGIN_X/Z, а не от настоящего нуля — иначе за долгий полёт числа
+  растут и float32 на видеокарте начинает дрожать.
+- Когда WORLD_OFFSET уходит дальше REBASE_THRESHOLD, начало переносится
+  на кратное REBASE_QUANTUM, и все подписчики (register_rebase_listener)
+  одним векторным проходом сдвигают свои координаты.
+- Абсолютная позиция (get_world_position, float64) нужна для всего, что
+  должно быть одинаковым на том же месте: рельеф, клетки chunks.py.
+- Квант кратен шагу сетки земли, тайлу, клетке и периоду текстуры,
+  поэтому после переноса ни рельеф, ни узор травы не сдвигаются.
 """
 
+import math
+import threading
+from collections import OrderedDict
 from typing import Tuple
 
+import numpy as np
 from OpenGL.GL import *
 
+import glstate
+import render_queue
+
 WORLD_OFFSET_X: float = 0.0
 WORLD_OFFSET_Z: float = 0.0
 
+# абсолютные координаты начала отсчёта «мировых» (всегда кратны кванту)
+ORIGIN_X: float = 0.0
+ORIGIN_Z: float = 0.0
+
+# когда переносить начало и на какой шаг (кратно 6.25, 20, 64 и 128)
+REBASE_THRESHOLD = 4096.0
+REBASE_QUANTUM = 3200.0
+
+# частота узора травы: texcoord = мировая координата / GROUND_TEX_SCALE
+GROUND_TEX_SCALE = 20.0
+
 # Размер квадрата земли вокруг самолёта.
 HALF_SIZE = 200.0  # не трогаем, как просил
 
+# Цвет травы (R, G, B)
+GROUND_COLOR = (22, 171, 61)
+
+# На сколько сдвигаем квадрат земли назад по курсу самолёта
+GROUND_BACK_OFFSET = 40.0
+
+# Число клеток сетки земли на сторону
+GROUND_GRID = 64
+
+# Рельеф
+TERRAIN_SEED = 7
+TERRAIN_AMPLITUDE = 18.0     # высоты в диапазоне [0, TERRAIN_AMPLITUDE]
+TERRAIN_FEATURE_SIZE = 220.0  # размер самых крупных холмов
+TERRAIN_OCTAVES = 4
+
+# Тайлы карты высот
+TILE_SIZE = 128.0
+TILE_RES = 33                 # узлов на сторону (шаг TILE_SIZE / 32)
+TILE_CACHE_SIZE = 64
+
+_tile_cache: OrderedDict[tuple[int, int], np.ndarray] = OrderedDict()
+# кэш тайлов общий для потока симуляции и потока отрисовки
+_tile_lock = threading.Lock()
+
+# смещение мира, под которое рисуется кадр (None — текущее WORLD_OFFSET),
+# и начало отсчёта, от которого оно отсчитано
+_render_offset: Tuple[float, float] | None = None
+_render_origin: Tuple[float, float] | None = None
+
+# кого звать при переносе начала: fn(dx, dz)
+_rebase_listeners: list = []
+
 _ground_texture_id: int | None = None
+_ground_indices: np.ndarray | None = None
+
+# последняя собранная сетка земли: за кадр её просят несколько раз
+# (земля, приёмник теней, карта теней) — считаем один
+_grid_key: tuple | None = None
+_grid: tuple | None = None
 
 
 def move_world(dx: float, dz: float) -> None:
@@ -35,20 +115,232 @@ def move_world(dx: float, dz: float) -> None:
     WORLD_OFFSET_X += dx
     WORLD_OFFSET_Z += dz
 
+    if max(abs(WORLD_OFFSET_X), abs(WORLD_OFFSET_Z)) > REBASE_THRESHOLD:
+        rebase_origin()
+
 
 def get_world_offset() -> Tuple[float, float]:
-    """Возвращаем 'мировые координаты' самолёта."""
+    """Возвращаем 'мировые координаты' самолёта (от ORIGIN)."""
     return WORLD_OFFSET_X, WORLD_OFFSET_Z
 
 
-def terrain_height(x: float, z: float) -> float:
-    """Плоская земля, просто 0.0."""
-    return 0.0
+def get_origin() -> Tuple[float, float]:
+    return ORIGIN_X, ORIGIN_Z
+
+
+def get_world_position() -> Tuple[float, float]:
+    """Абсолютная позиция самолёта (float64) — для рельефа и клеток."""
+    return ORIGIN_X + WORLD_OFFSET_X, ORIGIN_Z + WORLD_OFFSET_Z
 
 
-def terrain_height_world(wx: float, wz: float) -> float:
-    """Плоская земля, просто 0.0."""
-    return 0.0
+def register_rebase_listener(listener) -> None:
+    """listener(dx, dz) вызывается при переносе начала: вычесть dx/dz из координат."""
+    if listener not in _rebase_listeners:
+        _rebase_listeners.append(listener)
+
+
+def rebase_origin() -> Tuple[float, float]:
+    """
+    Перенести начало отсчёта поближе к самолёту (шагом REBASE_QUANTUM).
+    Возвращает сдвиг (dx, dz), на который уменьшились все мировые координаты.
+    """
+    global ORIGIN_X, ORIGIN_Z, WORLD_OFFSET_X, WORLD_OFFSET_Z
+
+    dx = round(WORLD_OFFSET_X / REBASE_QUANTUM) * REBASE_QUANTUM
+    dz = round(WORLD_OFFSET_Z / REBASE_QUANTUM) * REBASE_QUANTUM
+    if dx == 0.0 and dz == 0.0:
+        return 0.0, 0.0
+
+    ORIGIN_X += dx
+    ORIGIN_Z += dz
+    WORLD_OFFSET_X -= dx
+    WORLD_OFFSET_Z -= dz
+    for listener in _rebase_listeners:
+        listener(dx, dz)
+    return dx, dz
+
+
+def reset_world() -> None:
+    """Самолёт снова в абсолютном нуле (новый полёт, запись/воспроизведение)."""
+    global ORIGIN_X, ORIGIN_Z, WORLD_OFFSET_X, WORLD_OFFSET_Z
+    ORIGIN_X = ORIGIN_Z = 0.0
+    WORLD_OFFSET_X = WORLD_OFFSET_Z = 0.0
+
+
+def set_render_offset(offset: Tuple[float, float] | None,
+                      origin: Tuple[float, float] | None = None) -> None:
+    """
+    Под какое смещение мира рисовать кадр (None — под текущее).
+    origin — от какого начала оно отсчитано (по умолчанию текущее ORIGIN).
+    """
+    global _render_offset, _render_origin
+    _render_offset = offset
+    _render_origin = origin
+
+
+def get_render_offset() -> Tuple[float, float]:
+    """Смещение мира для отрисовки: интерполированное или текущее."""
+    if _render_offset is not None:
+        return _render_offset
+    return WORLD_OFFSET_X, WORLD_OFFSET_Z
+
+
+def get_render_origin() -> Tuple[float, float]:
+    """Начало отсчёта, под которое рисуется кадр."""
+    if _render_origin is not None:
+        return _render_origin
+    return ORIGIN_X, ORIGIN_Z
+
+
+def _hash01(ix: np.ndarray, iz: np.ndarray, seed: int) -> np.ndarray:
+    """Псевдослучайное число в [0, 1) для каждого узла целочисленной решётки."""
+    h = (ix.astype(np.uint32) * np.uint32(374761393)
+         + iz.astype(np.uint32) * np.uint32(668265263)
+         + np.uint32(seed * 2654435761 & 0xFFFFFFFF))
+    h = (h ^ (h >> np.uint32(13))) * np.uint32(1274126177)
+    h = h ^ (h >> np.uint32(16))
+    return h.astype(np.float64) / 4294967296.0
+
+
+def _value_noise(x: np.ndarray, z: np.ndarray, seed: int) -> np.ndarray:
+    """Гладкий value noise в [-1, 1]."""
+    x0 = np.floor(x)
+    z0 = np.floor(z)
+    fx = x - x0
+    fz = z - z0
+    ix = x0.astype(np.int64)
+    iz = z0.astype(np.int64)
+
+    # smoothstep, чтобы не было изломов на границах ячеек
+    ux = fx * fx * (3.0 - 2.0 * fx)
+    uz = fz * fz * (3.0 - 2.0 * fz)
+
+    n00 = _hash01(ix, iz, seed)
+    n10 = _hash01(ix + 1, iz, seed)
+    n01 = _hash01(ix, iz + 1, seed)
+    n11 = _hash01(ix + 1, iz + 1, seed)
+
+    nx0 = n00 + (n10 - n00) * ux
+    nx1 = n01 + (n11 - n01) * ux
+    return (nx0 + (nx1 - nx0) * uz) * 2.0 - 1.0
+
+
+def _fbm(x: np.ndarray, z: np.ndarray) -> np.ndarray:
+    """Сумма октав шума: крупные холмы + мелкие неровности, результат в [-1, 1]."""
+    total = np.zeros_like(x)
+    amp = 1.0
+    norm = 0.0
+    freq = 1.0 / TERRAIN_FEATURE_SIZE
+    for octave in range(TERRAIN_OCTAVES):
+        total += amp * _value_noise(x * freq, z * freq, TERRAIN_SEED + octave)
+        norm += amp
+        amp *= 0.5
+        freq *= 2.0
+    return total / norm
+
+
+def _generate_tile(tx: int, tz: int) -> np.ndarray:
+    """Высоты узлов тайла (TILE_RES x TILE_RES), индексы [ix, iz]."""
+    coords = np.linspace(0.0, TILE_SIZE, TILE_RES)
+    xs, zs = np.meshgrid(tx * TILE_SIZE + coords, tz * TILE_SIZE + coords, indexing="ij")
+    heights = (_fbm(xs, zs) * 0.5 + 0.5) * TERRAIN_AMPLITUDE
+    return heights.astype(np.float32)
+
+
+def _get_tile(tx: int, tz: int) -> np.ndarray:
+    """Тайл из LRU-кэша (генерируем при промахе, старые выкидываем)."""
+    key = (tx, tz)
+    with _tile_lock:
+        tile = _tile_cache.get(key)
+        if tile is not None:
+            _tile_cache.move_to_end(key)
+            return tile
+
+        tile = _generate_tile(tx, tz)
+        _tile_cache[key] = tile
+        if len(_tile_cache) > TILE_CACHE_SIZE:
+            _tile_cache.popitem(last=False)
+        return tile
+
+
+def terrain_height_absolute(ax, az):
+    """
+    Высота земли в абсолютных точках. ax/az — числа или массивы одной формы;
+    для чисел возвращается float, для массивов — массив высот.
+    Билинейная выборка из кэшированных тайлов, пакетно по тайлам.
+    """
+    xs = np.asarray(ax, dtype=np.float64)
+    zs = np.asarray(az, dtype=np.float64)
+    scalar = xs.ndim == 0 and zs.ndim == 0
+    xs, zs = np.broadcast_arrays(xs, zs)
+    shape = xs.shape
+    xs = xs.ravel()
+    zs = zs.ravel()
+
+    tx = np.floor(xs / TILE_SIZE).astype(np.int64)
+    tz = np.floor(zs / TILE_SIZE).astype(np.int64)
+
+    # координаты внутри тайла в узлах сетки
+    step = TILE_SIZE / (TILE_RES - 1)
+    u = (xs - tx * TILE_SIZE) / step
+    v = (zs - tz * TILE_SIZE) / step
+    iu = np.clip(np.floor(u).astype(np.int64), 0, TILE_RES - 2)
+    iv = np.clip(np.floor(v).astype(np.int64), 0, TILE_RES - 2)
+    fu = u - iu
+    fv = v - iv
+
+    # группируем точки по тайлам: один проход на каждый тайл
+    keys = (tx + 2 ** 31) * 2 ** 32 + (tz + 2 ** 31)
+    uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(uniq) + 1))
+
+    heights = np.empty(len(xs), dtype=np.float64)
+    for k, (ktx, ktz) in enumerate(zip(tx[first].tolist(), tz[first].tolist())):
+        sel = order[bounds[k]:bounds[k + 1]]
+        tile = _get_tile(ktx, ktz)
+        i = iu[sel]
+        j = iv[sel]
+        a = fu[sel]
+        b = fv[sel]
+        h0 = tile[i, j] + (tile[i + 1, j] - tile[i, j]) * a
+        h1 = tile[i, j + 1] + (tile[i + 1, j + 1] - tile[i, j + 1]) * a
+        heights[sel] = h0 + (h1 - h0) * b
+
+    if scalar:
+        return float(heights[0])
+    return heights.reshape(shape)
+
+
+def terrain_height_noise(ax, az) -> np.ndarray:
+    """
+    Высота земли в абсолютных точках прямо по шуму, без тайлов: для
+    тысяч точек, разбросанных на километры (трафик, fleet.py), — тайлы
+    под ними только вытесняли бы из кэша нужные самолёту и деревьям.
+    От билинейной выборки terrain_height_absolute отличается на доли метра.
+    """
+    xs = np.asarray(ax, dtype=np.float64)
+    zs = np.asarray(az, dtype=np.float64)
+    return (_fbm(xs, zs) * 0.5 + 0.5) * TERRAIN_AMPLITUDE
+
+
+def terrain_height_world(wx, wz):
+    """Высота земли в мировых точках (от текущего ORIGIN)."""
+    return terrain_height_absolute(np.asarray(wx) + ORIGIN_X,
+                                   np.asarray(wz) + ORIGIN_Z)
+
+
+def terrain_height(x, z):
+    """Высота земли в ЛОКАЛЬНЫХ координатах (относительно самолёта)."""
+    return terrain_height_absolute(np.asarray(x) + (ORIGIN_X + WORLD_OFFSET_X),
+                                   np.asarray(z) + (ORIGIN_Z + WORLD_OFFSET_Z))
+
+
+def ground_offset(yaw_deg: float) -> Tuple[float, float]:
+    """Сдвиг квадрата земли назад по направлению yaw самолёта."""
+    yaw_rad = math.radians(yaw_deg)
+    return (-math.sin(yaw_rad) * GROUND_BACK_OFFSET,
+            -math.cos(yaw_rad) * GROUND_BACK_OFFSET)
 
 
 def _create_checker_texture(size: int = 64) -> int:
@@ -56,14 +348,11 @@ def _create_checker_texture(size: int = 64) -> int:
     Создаём простую текстуру ярко-зелёной травы в памяти.
     Сплошной салатовый цвет.
     """
-    import numpy as np
-
     image = np.zeros((size, size, 3), dtype=np.uint8)
 
     # САЛАТОВЫЙ (яркий зелёный)
     # можешь поиграть: (120, 255, 80), (100, 255, 0) и т.п.
-    bright = (22, 171, 61)  # R, G, B
-    image[:, :] = bright
+    image[:, :] = GROUND_COLOR
 
     tex_id = glGenTextures(1)
     glBindTexture(GL_TEXTURE_2D, tex_id)
@@ -101,65 +390,109 @@ def init_terrain() -> None:
     _ground_texture_id = _create_checker_texture()
 
 
-def draw_terrain(yaw_deg: float = 0.0) -> None:
-    """
-    Рисуем одну текстурированную плоскость вокруг самолёта.
+def ground_indices() -> np.ndarray:
+    """Индексы треугольников сетки земли (одни и те же каждый кадр)."""
+    global _ground_indices
+
+    if _ground_indices is None:
+        n = GROUND_GRID + 1
+        i = (np.arange(GROUND_GRID)[:, None] * n + np.arange(GROUND_GRID)[None, :]).ravel()
+        _ground_indices = np.stack(
+            [i, i + 1, i + n + 1, i, i + n + 1, i + n], axis=1
+        ).ravel().astype(np.uint32)
+    return _ground_indices
+
 
-    Геометрия квадрата задаётся в ЛОКАЛЬНЫХ координатах [-HALF_SIZE, HALF_SIZE],
-    но:
-      - сам квадрат сдвигаем НАЗАД по курсу самолёта (yaw_deg),
-      - координаты текстуры считаем из МИРОВЫХ координат:
-            x_world = x_local + WORLD_OFFSET_X + offset_x
-            z_world = z_local + WORLD_OFFSET_Z + offset_z
+def ground_grid(yaw_deg: float = 0.0):
     """
-    global _ground_texture_id
+    Сетка земли вокруг самолёта: (позиции, нормали, мировые xz) — массивы
+    ((GROUND_GRID + 1)^2, 3/3/2). Позиции локальные, узлы привязаны к мировой
+    решётке с шагом клетки, поэтому рельеф не «плывёт» при полёте.
+    Мировые xz отсчитаны от начала отсчёта кадра — они небольшие и
+    годятся в float32 (координаты текстуры).
+    Пока смещение и узел центра те же, возвращаются те же массивы —
+    менять их нельзя.
+    """
+    global _grid_key, _grid
 
-    if _ground_texture_id is None:
-        return
+    wx, wz = get_render_offset()
+    ox, oz = get_render_origin()
+    offset_x, offset_z = ground_offset(yaw_deg)
 
-    import math
+    step = 2.0 * HALF_SIZE / GROUND_GRID
+    center_x = round((wx + offset_x) / step) * step
+    center_z = round((wz + offset_z) / step) * step
 
-    wx, wz = get_world_offset()
-    size = HALF_SIZE
+    key = (wx, wz, ox, oz, center_x, center_z)
+    if key == _grid_key:
+        return _grid
 
-    # сдвиг земли назад по направлению yaw самолёта
-    yaw_rad = math.radians(yaw_deg)
-    OFFSET = 40.0  # как у тебя сейчас
+    line = np.linspace(-HALF_SIZE, HALF_SIZE, GROUND_GRID + 1)
+    xs_w, zs_w = np.meshgrid(center_x + line, center_z + line, indexing="ij")
+    heights = terrain_height_absolute(xs_w + ox, zs_w + oz)
 
-    offset_x = -math.sin(yaw_rad) * OFFSET
-    offset_z = -math.cos(yaw_rad) * OFFSET
+    # нормали по конечным разностям высот
+    dh_dx, dh_dz = np.gradient(heights, step)
+    normals = np.stack([-dh_dx, np.ones_like(heights), -dh_dz], axis=-1)
+    normals /= np.linalg.norm(normals, axis=-1, keepdims=True)
 
-    glEnable(GL_TEXTURE_2D)
-    glBindTexture(GL_TEXTURE_2D, _ground_texture_id)
+    positions = np.stack([xs_w - wx, heights, zs_w - wz], axis=-1)
+    world_xz = np.stack([xs_w, zs_w], axis=-1)
 
-    glPushMatrix()
+    _grid_key = key
+    _grid = (positions.reshape(-1, 3).astype(np.float32),
+             normals.reshape(-1, 3).astype(np.float32),
+             world_xz.reshape(-1, 2))
+    return _grid
 
-    # Земля живёт в ЛОКАЛЬНЫХ координатах самолёта, смещаем только назад по yaw
-    glTranslatef(offset_x, 0.0, offset_z)
 
-    tex_scale = 20.0  # влияет на "частоту" узора / ощущение скорости
+def _setup_material() -> None:
+    """
+    Материал "terrain" очереди: фиксированный конвейер, свет, текстура
+    земли, без blend. Шейдер теней (shadows.bind_receiver) привязывается
+    уже поверх — в самом элементе.
+    """
+    glstate.use_program(0)
+    glstate.enable(GL_LIGHTING)
+    glstate.disable(GL_BLEND)
+    glstate.enable(GL_TEXTURE_2D)
+    glstate.bind_texture(GL_TEXTURE_2D, _ground_texture_id)
 
-    glBegin(GL_QUADS)
+    # GL_MODULATE умножает текстуру на текущий цвет — ставим белый явно,
+    # иначе земля перекрашивается в цвет последней нарисованной детали
+    glstate.color(1.0, 1.0, 1.0)
 
-    glNormal3f(0.0, 1.0, 0.0)
 
-    corners = [
-        (-size, -size),
-        (size, -size),
-        (size, size),
-        (-size, size),
-    ]
+render_queue.register_material("terrain", _setup_material)
 
-    for x_local, z_local in corners:
-        xw = x_local + wx + offset_x
-        zw = z_local + wz + offset_z
 
-        glTexCoord2f(xw / tex_scale, zw / tex_scale)
-        glVertex3f(x_local, 0.0, z_local)
+def draw_ground_mesh(yaw_deg: float = 0.0) -> None:
+    """
+    Текстурированная сетка с рельефом вокруг самолёта (состояние —
+    материал "terrain" или шейдер теней).
 
-    glEnd()
+    Сетка задаётся в ЛОКАЛЬНЫХ координатах вокруг самолёта, но:
+      - её центр сдвинут НАЗАД по курсу самолёта (yaw_deg),
+      - высоты и координаты текстуры считаем из МИРОВЫХ координат узлов.
+    """
+    if _ground_texture_id is None:
+        return
 
-    glPopMatrix()
+    positions, normals, world_xz = ground_grid(yaw_deg)
 
-    glBindTexture(GL_TEXTURE_2D, 0)
-    glDisable(GL_TEXTURE_2D)
+    # GROUND_TEX_SCALE влияет на "частоту" узора / ощущение скорости
+    texcoords = (world_xz / GROUND_TEX_SCALE).astype(np.float32)
+    indices = ground_indices()
+
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, positions)
+    glNormalPointer(GL_FLOAT, 0, normals)
+    glTexCoordPointer(2, GL_FLOAT, 0, texcoords)
+
+    glDrawElements(GL_TRIANGLES, len(indices), GL_UNSIGNED_INT, indices)
+
+    glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
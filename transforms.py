@@ -0,0 +1,100 @@
+# transforms.py
+"""
+Матрицы 4x4 на NumPy вместо gluPerspective / gluLookAt / glRotatef.
+
+- Все матрицы — float32, в «математическом» виде (вектор-столбец справа):
+      world = M @ [x, y, z, 1]
+- OpenGL ждёт матрицы по столбцам, поэтому в glLoadMatrixf отдаём M.T
+  (см. gl_matrix), а в glUniformMatrix4fv — сам M с transpose=GL_TRUE.
+"""
+
+import math
+
+import numpy as np
+
+
+def identity() -> np.ndarray:
+    return np.identity(4, dtype=np.float32)
+
+
+def translate(x: float, y: float, z: float) -> np.ndarray:
+    m = identity()
+    m[0:3, 3] = (x, y, z)
+    return m
+
+
+def scale(sx: float, sy: float, sz: float) -> np.ndarray:
+    return np.diag(np.array([sx, sy, sz, 1.0], dtype=np.float32))
+
+
+def rotate_x(deg: float) -> np.ndarray:
+    c, s = math.cos(math.radians(deg)), math.sin(math.radians(deg))
+    m = identity()
+    m[1, 1], m[1, 2] = c, -s
+    m[2, 1], m[2, 2] = s, c
+    return m
+
+
+def rotate_y(deg: float) -> np.ndarray:
+    c, s = math.cos(math.radians(deg)), math.sin(math.radians(deg))
+    m = identity()
+    m[0, 0], m[0, 2] = c, s
+    m[2, 0], m[2, 2] = -s, c
+    return m
+
+
+def rotate_z(deg: float) -> np.ndarray:
+    c, s = math.cos(math.radians(deg)), math.sin(math.radians(deg))
+    m = identity()
+    m[0, 0], m[0, 1] = c, -s
+    m[1, 0], m[1, 1] = s, c
+    return m
+
+
+def perspective(fovy_deg: float, aspect: float, near: float, far: float) -> np.ndarray:
+    """То же, что gluPerspective."""
+    f = 1.0 / math.tan(math.radians(fovy_deg) * 0.5)
+    m = np.zeros((4, 4), dtype=np.float32)
+    m[0, 0] = f / aspect
+    m[1, 1] = f
+    m[2, 2] = (far + near) / (near - far)
+    m[2, 3] = 2.0 * far * near / (near - far)
+    m[3, 2] = -1.0
+    return m
+
+
+def orthographic(left: float, right: float, bottom: float, top: float,
+                 near: float, far: float) -> np.ndarray:
+    """То же, что glOrtho."""
+    m = identity()
+    m[0, 0] = 2.0 / (right - left)
+    m[1, 1] = 2.0 / (top - bottom)
+    m[2, 2] = -2.0 / (far - near)
+    m[0, 3] = -(right + left) / (right - left)
+    m[1, 3] = -(top + bottom) / (top - bottom)
+    m[2, 3] = -(far + near) / (far - near)
+    return m
+
+
+def look_at(eye, target, up=(0.0, 1.0, 0.0)) -> np.ndarray:
+    """То же, что gluLookAt."""
+    eye = np.asarray(eye, dtype=np.float64)
+    f = np.asarray(target, dtype=np.float64) - eye
+    f /= np.linalg.norm(f)
+    s = np.cross(f, np.asarray(up, dtype=np.float64))
+    n = np.linalg.norm(s)
+    # взгляд строго вдоль up (pitch = ±90°): берём любую ось вбок
+    s = s / n if n > 1e-12 else np.array([1.0, 0.0, 0.0])
+    u = np.cross(s, f)
+
+    m = identity()
+    m[0, 0:3] = s
+    m[1, 0:3] = u
+    m[2, 0:3] = -f
+    m[0:3, 3] = (-s @ eye, -u @ eye, f @ eye)
+    return m
+
+
+def gl_matrix(m: np.ndarray) -> np.ndarray:
+    """Матрица в порядке «по столбцам» — для glLoadMatrixf / glMultMatrixf."""
+    return np.ascontiguousarray(m.T, dtype=np.float32)